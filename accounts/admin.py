@@ -1,19 +1,30 @@
-from django.contrib import admin
+from collections import defaultdict
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from django.utils.html import format_html
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from . import tasks
 from .models import (
     User, RailwaySettings, 
+    Organization, Membership,
     Template, TemplateService,
-    Project, ProjectService
+    Project, ProjectService, ServiceDependency,
+    ArchivedTemplate, ArchivedProject,
+    BackgroundTask
 )
 
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ('email', 'username', 'is_staff', 'is_active', 'date_joined')
-    list_filter = ('is_staff', 'is_active', 'date_joined')
+    list_display = ('email', 'username', 'plan', 'is_staff', 'is_active', 'date_joined')
+    list_filter = ('plan', 'is_staff', 'is_active', 'date_joined')
     search_fields = ('email', 'username')
     ordering = ('-date_joined',)
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ('Plan', {'fields': ('plan',)}),
+    )
 
 
 @admin.register(RailwaySettings)
@@ -42,11 +53,54 @@ class RailwaySettingsAdmin(admin.ModelAdmin):
     )
 
 
+# =============================================================================
+# ORGANIZATION ADMIN
+# =============================================================================
+
+class UnscopedAdminMixin:
+    """
+    Show every organization's rows, not only those of the staff user's
+    active organization (tenant models' ``objects`` is scoped to it)
+    """
+    
+    def get_queryset(self, request):
+        manager = getattr(self.model, 'unscoped', self.model._default_manager)
+        queryset = manager.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        related_model = db_field.remote_field.model
+        if 'queryset' not in kwargs and hasattr(related_model, 'unscoped'):
+            kwargs['queryset'] = related_model.unscoped.all()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class MembershipInline(admin.TabularInline):
+    model = Membership
+    extra = 0
+    raw_id_fields = ('user',)
+    readonly_fields = ('created_at',)
+
+
+@admin.register(Organization)
+class OrganizationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'owner', 'is_personal', 'database', 'created_at')
+    list_filter = ('is_personal', 'database', 'created_at')
+    search_fields = ('name', 'slug', 'owner__email')
+    readonly_fields = ('created_at', 'database')
+    raw_id_fields = ('owner',)
+    list_select_related = ('owner',)
+    inlines = [MembershipInline]
+
+
 # =============================================================================
 # TEMPLATE ADMIN
 # =============================================================================
 
-class TemplateServiceInline(admin.TabularInline):
+class TemplateServiceInline(UnscopedAdminMixin, admin.TabularInline):
     model = TemplateService
     extra = 0
     readonly_fields = ('created_at', 'updated_at')
@@ -54,19 +108,20 @@ class TemplateServiceInline(admin.TabularInline):
 
 
 @admin.register(Template)
-class TemplateAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'services_count', 'is_published', 'is_active', 'created_at')
+class TemplateAdmin(UnscopedAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'organization', 'user', 'services_count', 'is_published', 'is_active', 'created_at')
     list_filter = ('is_active', 'is_published', 'created_at', 'user')
-    search_fields = ('name', 'user__email', 'description')
+    search_fields = ('name', 'user__email', 'organization__name', 'description')
     readonly_fields = ('created_at', 'updated_at', 'services_count')
-    raw_id_fields = ('user',)
+    raw_id_fields = ('organization', 'user')
+    list_select_related = ('organization', 'user')
     inlines = [TemplateServiceInline]
     
     actions = ['publish_templates']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('user', 'name', 'description')
+            'fields': ('organization', 'user', 'name', 'description')
         }),
         ('Status', {
             'fields': ('is_active', 'is_published')
@@ -85,25 +140,52 @@ class TemplateAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(services_total=Count('services'))
+    
     def services_count(self, obj):
-        return obj.services.count()
+        return obj.services_total
     services_count.short_description = 'Services'
+    services_count.admin_order_field = 'services_total'
     
     def publish_templates(self, request, queryset):
-        for template in queryset:
-            if not template.is_published:
-                template.publish()
-        self.message_user(request, f"{queryset.count()} template(s) published successfully.")
+        # Tasks run with one organization active, so they find the templates
+        # on that organization's database: one task per organization
+        by_organization = defaultdict(list)
+        for template_id, organization_id in queryset.filter(is_published=False).values_list('id', 'organization_id'):
+            by_organization[organization_id].append(template_id)
+        if not by_organization:
+            self.message_user(request, 'The selected templates are already published.', level=messages.WARNING)
+            return
+        organizations = Organization.objects.in_bulk([pk for pk in by_organization if pk is not None])
+        links = []
+        for organization_id, template_ids in by_organization.items():
+            organization = organizations.get(organization_id)
+            task = tasks.enqueue(
+                'Publish templates',
+                tasks.publish_templates,
+                template_ids,
+                total=len(template_ids),
+                user=request.user,
+                organization=organization
+            )
+            links.append((reverse('admin:accounts_backgroundtask_change', args=[task.pk]), organization or 'no organization'))
+        self.message_user(request, format_html(
+            'Publishing {} template(s) in the background. Track progress: {}.',
+            sum(len(template_ids) for template_ids in by_organization.values()),
+            format_html_join(', ', '<a href="{}">{}</a>', links)
+        ))
     publish_templates.short_description = "Publish selected templates"
 
 
 @admin.register(TemplateService)
-class TemplateServiceAdmin(admin.ModelAdmin):
+class TemplateServiceAdmin(UnscopedAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'service_id', 'template', 'image', 'cpu', 'memory', 'created_at')
     list_filter = ('created_at', 'template__user')
     search_fields = ('name', 'service_id', 'image', 'template__name')
     readonly_fields = ('created_at', 'updated_at')
     raw_id_fields = ('template',)
+    list_select_related = ('template__user',)
     
     fieldsets = (
         ('Basic Information', {
@@ -134,25 +216,34 @@ class TemplateServiceAdmin(admin.ModelAdmin):
 # PROJECT ADMIN
 # =============================================================================
 
-class ProjectServiceInline(admin.TabularInline):
+class ProjectServiceInline(UnscopedAdminMixin, admin.TabularInline):
     model = ProjectService
     extra = 0
     readonly_fields = ('created_at', 'updated_at', 'railway_service_id', 'status', 'public_url')
     fields = ('service_id', 'name', 'image', 'status', 'railway_service_id', 'public_url')
 
 
+class ServiceDependencyInline(UnscopedAdminMixin, admin.TabularInline):
+    model = ServiceDependency
+    fk_name = 'service'
+    extra = 0
+    raw_id_fields = ('depends_on',)
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'source_template', 'status_badge', 'services_count', 'railway_project_id', 'deployed_at')
+class ProjectAdmin(UnscopedAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'organization', 'user', 'source_template', 'status_badge', 'services_count', 'railway_project_id', 'deployed_at')
     list_filter = ('status', 'is_active', 'created_at', 'user')
-    search_fields = ('name', 'user__email', 'railway_project_id', 'description')
+    search_fields = ('name', 'user__email', 'organization__name', 'railway_project_id', 'description')
     readonly_fields = ('created_at', 'updated_at', 'services_count', 'deployed_at')
-    raw_id_fields = ('user', 'source_template')
+    raw_id_fields = ('organization', 'user', 'source_template')
+    list_select_related = ('organization', 'user', 'source_template__user')
     inlines = [ProjectServiceInline]
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('user', 'name', 'description', 'source_template')
+            'fields': ('organization', 'user', 'name', 'description', 'source_template')
         }),
         ('Status', {
             'fields': ('status', 'is_active', 'deployed_at')
@@ -171,9 +262,13 @@ class ProjectAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(services_total=Count('services'))
+    
     def services_count(self, obj):
-        return obj.services.count()
+        return obj.services_total
     services_count.short_description = 'Services'
+    services_count.admin_order_field = 'services_total'
     
     def status_badge(self, obj):
         colors = {
@@ -193,12 +288,14 @@ class ProjectAdmin(admin.ModelAdmin):
 
 
 @admin.register(ProjectService)
-class ProjectServiceAdmin(admin.ModelAdmin):
+class ProjectServiceAdmin(UnscopedAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'service_id', 'project', 'status_badge', 'image', 'railway_service_id', 'public_url_link')
     list_filter = ('status', 'created_at', 'project__user')
     search_fields = ('name', 'service_id', 'image', 'project__name', 'railway_service_id')
     readonly_fields = ('created_at', 'updated_at', 'deployed_at')
     raw_id_fields = ('project', 'source_service')
+    list_select_related = ('project__user',)
+    inlines = [ServiceDependencyInline]
     
     fieldsets = (
         ('Basic Information', {
@@ -252,3 +349,82 @@ class ProjectServiceAdmin(admin.ModelAdmin):
             return format_html('<a href="{}" target="_blank">{}</a>', obj.public_url, obj.public_url[:30] + '...')
         return '-'
     public_url_link.short_description = 'Public URL'
+
+
+# =============================================================================
+# ARCHIVE ADMIN
+# =============================================================================
+
+class ArchiveAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'original_id', 'services_count', 'deleted_at', 'archived_at')
+    list_filter = ('archived_at',)
+    search_fields = ('name', 'user__email')
+    list_select_related = ('user',)
+    readonly_fields = ('original_id', 'user', 'name', 'data', 'deleted_at', 'archived_at')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def services_count(self, obj):
+        return len(obj.data.get('services', []))
+    services_count.short_description = 'Services'
+
+
+admin.site.register(ArchivedTemplate, ArchiveAdmin)
+admin.site.register(ArchivedProject, ArchiveAdmin)
+
+
+# =============================================================================
+# BACKGROUND TASK ADMIN
+# =============================================================================
+
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'user', 'status_badge', 'progress_bar', 'priority', 'attempts',
+        'lease_owner', 'created_at', 'finished_at'
+    )
+    list_filter = ('status', 'name', 'created_at')
+    search_fields = ('name', 'user__email', 'message', 'lease_owner')
+    list_select_related = ('user',)
+    readonly_fields = (
+        'name', 'user', 'organization', 'status', 'progress_bar', 'total', 'done', 'message',
+        'func', 'args', 'priority', 'attempts', 'max_attempts', 'run_after',
+        'lease_owner', 'lease_expires_at', 'created_at', 'started_at', 'finished_at'
+    )
+    fields = readonly_fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def status_badge(self, obj):
+        colors = {
+            'pending': '#6b7280',
+            'running': '#3b82f6',
+            'completed': '#10b981',
+            'failed': '#ef4444',
+        }
+        color = colors.get(obj.status, '#6b7280')
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px;">{}</span>',
+            color,
+            obj.get_status_display()
+        )
+    status_badge.short_description = 'Status'
+    
+    def progress_bar(self, obj):
+        return format_html(
+            '<div style="width: 120px; background: #e5e7eb; border-radius: 3px;">'
+            '<div style="width: {}%; background: #10b981; height: 8px; border-radius: 3px;"></div>'
+            '</div><small>{} / {}</small>',
+            obj.progress,
+            obj.done,
+            obj.total
+        )
+    progress_bar.short_description = 'Progress'
@@ -0,0 +1,114 @@
+"""
+Move soft-deleted (is_active=False) Templates and Projects out of the hot tables.
+
+Each batch runs in its own short transaction: the inactive rows and their
+services are snapshotted into ArchivedTemplate/ArchivedProject (unless
+purging) and then deleted, which cascades to the service rows.
+
+Organizations moved to their own database (accounts.routers) keep their
+rows there; ``archive_inactive`` goes through every tenant database, while
+the archive tables stay in ``default``.
+"""
+import time
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models import Q
+
+from .models import (
+    ArchivedProject, ArchivedTemplate,
+    Project, ProjectService,
+    Template, TemplateService
+)
+from .routers import tenant_databases
+from .transfer import PROJECT_FIELDS, PROJECT_SERVICE_FIELDS, SERVICE_FIELDS, TEMPLATE_FIELDS
+
+# kind -> (model, archive model, fields, service model, service FK, service fields)
+ARCHIVE_SPECS = {
+    'template': (Template, ArchivedTemplate, TEMPLATE_FIELDS, TemplateService, 'template', SERVICE_FIELDS),
+    'project': (Project, ArchivedProject, PROJECT_FIELDS, ProjectService, 'project', PROJECT_SERVICE_FIELDS),
+}
+
+
+def archive_batch(kind, batch_size=100, purge=False, deleted_before=None, ids=None, database=None):
+    """
+    Archive (or with ``purge`` just delete) up to ``batch_size`` inactive rows.
+
+    ``deleted_before`` limits the batch to rows soft-deleted before that time
+    (rows without ``deleted_at`` always qualify); ``ids`` restricts it to
+    specific rows. ``database`` defaults to the active organization's.
+    Returns the number of rows removed from the hot table.
+    """
+    model, archive_model, fields, service_model, service_fk, service_fields = ARCHIVE_SPECS[kind]
+    database = database or router.db_for_write(model)
+    archive_database = router.db_for_write(archive_model)
+
+    with transaction.atomic(using=database), transaction.atomic(using=archive_database):
+        rows = model.unscoped.using(database).filter(is_active=False)
+        if ids is not None:
+            rows = rows.filter(pk__in=ids)
+        if deleted_before is not None:
+            rows = rows.filter(Q(deleted_at__lte=deleted_before) | Q(deleted_at__isnull=True))
+        batch = list(
+            rows.select_for_update(skip_locked=True)
+            .order_by('pk')
+            .values('id', 'user_id', 'deleted_at', *fields)[:batch_size]
+        )
+        if not batch:
+            return 0
+        batch_ids = [row['id'] for row in batch]
+
+        if not purge:
+            services = defaultdict(list)
+            service_rows = (
+                service_model.unscoped.using(database)
+                .filter(**{f'{service_fk}_id__in': batch_ids})
+                .order_by('pk')
+                .values(f'{service_fk}_id', *service_fields)
+            )
+            for service in service_rows.iterator():
+                services[service.pop(f'{service_fk}_id')].append(service)
+
+            archive_model.objects.using(archive_database).bulk_create([
+                archive_model(
+                    original_id=row['id'],
+                    user_id=row['user_id'],
+                    name=row['name'],
+                    deleted_at=row['deleted_at'],
+                    data={
+                        **{field: row[field] for field in fields},
+                        'services': services[row['id']],
+                    }
+                )
+                for row in batch
+            ])
+
+        model.unscoped.using(database).filter(pk__in=batch_ids, is_active=False).delete()
+    return len(batch)
+
+
+def archive_inactive(kind, batch_size=100, purge=False, deleted_before=None,
+                     pause=0.0, max_batches=None, on_batch=None):
+    """
+    Archive inactive rows batch by batch until none are left, on every
+    tenant database.
+
+    Sleeps ``pause`` seconds between batches so the job can run alongside
+    live traffic. ``on_batch(count)`` is called after each batch;
+    ``max_batches`` applies per database. Returns the total number of rows
+    processed.
+    """
+    total = 0
+    for database in tenant_databases():
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = archive_batch(kind, batch_size, purge, deleted_before, database=database)
+            if not count:
+                break
+            total += count
+            batches += 1
+            if on_batch:
+                on_batch(count)
+            if pause:
+                time.sleep(pause)
+    return total
@@ -0,0 +1,105 @@
+"""
+zlib codec with preset dictionaries for JSON blobs (see fields.CompressedJSONField).
+
+Stored format:
+
+    b'\\x00' + <dictionary id byte> + <raw deflate stream>   compressed
+    b'{...}' / b'[...]' / ...                                plain UTF-8 JSON
+
+Plain JSON never starts with a NUL byte, so both formats (and rows written
+before compression was enabled) decode without a flag column. Dictionary IDs
+are baked into every compressed value: never change an existing entry in
+DICTIONARIES, add a new ID instead.
+"""
+import json
+import zlib
+from collections import Counter
+
+MARKER = b'\x00'
+
+# Substrings that recur in env-var payloads and Railway serializedConfig
+# (most frequent last: zlib prefers matches near the end of the dictionary)
+DEFAULT_DICTIONARY = (
+    b'"serviceDomains":{},"tcpProxies":{}'
+    b'"registryCredentials":{"username":"","password":""}'
+    b'"limitOverride":{"containers":{"cpu":8,"memoryBytes":8589934592}}'
+    b'"workspaceId":null,"templateId":null,"environmentId":null,"projectId":null'
+    b'"input":{"serializedConfig":{"services":{"service_1":{"name":"'
+    b'"source":{"image":"docker.io/library/","deploy":{'
+    b'"networking":{'
+    b'"AWS_ACCESS_KEY_ID":"","AWS_SECRET_ACCESS_KEY":"","AWS_REGION":"us-east-1",'
+    b'"S3_BUCKET":"","SENTRY_DSN":"https://","SMTP_HOST":"","SMTP_PORT":"587",'
+    b'"EMAIL_HOST_USER":"","EMAIL_HOST_PASSWORD":"","ALLOWED_HOSTS":"*",'
+    b'"JWT_SECRET":"","API_KEY":"","LOG_LEVEL":"info","DEBUG":"false",'
+    b'"PGHOST":"${{Postgres.PGHOST}}","PGPORT":"${{Postgres.PGPORT}}",'
+    b'"PGUSER":"${{Postgres.PGUSER}}","PGPASSWORD":"${{Postgres.PGPASSWORD}}",'
+    b'"PGDATABASE":"${{Postgres.PGDATABASE}}",'
+    b'"REDIS_URL":"redis://default:@redis.railway.internal:6379",'
+    b'"DATABASE_URL":"postgresql://postgres:@postgres.railway.internal:5432/railway",'
+    b'"RAILWAY_PUBLIC_DOMAIN":"${{RAILWAY_PUBLIC_DOMAIN}}",'
+    b'"NODE_ENV":"production","PORT":"8080","HOST":"0.0.0.0",'
+    b'"SECRET_KEY":"","variables":{'
+    b'{"value":"'
+)
+
+DICTIONARIES = {
+    1: DEFAULT_DICTIONARY,
+}
+CURRENT_DICTIONARY = 1
+
+
+def compress(data, dictionary_id=CURRENT_DICTIONARY, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=DICTIONARIES[dictionary_id])
+    return MARKER + bytes([dictionary_id]) + compressor.compress(data) + compressor.flush()
+
+
+def decompress(blob):
+    decompressor = zlib.decompressobj(-15, zdict=DICTIONARIES[blob[1]])
+    return decompressor.decompress(blob[2:]) + decompressor.flush()
+
+
+def dumps(value, encoder=None, min_size=256, enabled=True):
+    """Serialize ``value`` to stored bytes, compressing it when large enough"""
+    data = json.dumps(value, cls=encoder, separators=(',', ':')).encode('utf-8')
+    if not enabled or len(data) < min_size:
+        return data
+    compressed = compress(data)
+    return compressed if len(compressed) < len(data) else data
+
+
+def loads(stored, decoder=None):
+    """Inverse of dumps; also accepts plain JSON as str/bytes/memoryview"""
+    if isinstance(stored, memoryview):
+        stored = stored.tobytes()
+    if isinstance(stored, bytes) and stored[:1] == MARKER:
+        stored = decompress(stored)
+    return json.loads(stored, cls=decoder)
+
+
+def train_dictionary(samples, size=4096, min_length=6):
+    """
+    Build a candidate dictionary from sample JSON payloads (bytes).
+
+    Counts the ``"key":value`` fragments across the samples and
+    packs the most frequent into ``size`` bytes, most frequent last. Register
+    the result under a new ID in DICTIONARIES to use it.
+    """
+    counts = Counter()
+    for sample in samples:
+        text = sample.decode('utf-8', 'replace')
+        for fragment in text.replace('{', ',').replace('}', ',').split(','):
+            fragment = fragment.strip()
+            if len(fragment) >= min_length:
+                counts[fragment] += 1
+
+    chosen = []
+    used = 0
+    for fragment, count in counts.most_common():
+        if count < 2:
+            break
+        encoded = (fragment + ',').encode('utf-8')
+        if used + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded)
+    return b''.join(reversed(chosen))
@@ -0,0 +1,41 @@
+"""
+Authentication decorators that work for async views
+"""
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth.decorators import login_required
+
+
+def async_login_required(function=None, redirect_field_name=REDIRECT_FIELD_NAME, login_url=None):
+    """
+    Equivalent of ``login_required`` for ``async def`` views.
+
+    The user is resolved with ``request.auser()`` so no sync DB access happens
+    on the event loop, and ``request.user`` is replaced by the resolved user
+    so the view can use it directly. Sync views fall back to ``login_required``.
+    """
+    def decorator(view_func):
+        if not iscoroutinefunction(view_func):
+            return login_required(
+                view_func,
+                redirect_field_name=redirect_field_name,
+                login_url=login_url
+            )
+
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            user = await request.auser()
+            if user.is_authenticated:
+                request.user = user
+                return await view_func(request, *args, **kwargs)
+
+            from django.contrib.auth.views import redirect_to_login
+            return redirect_to_login(request.get_full_path(), login_url, redirect_field_name)
+
+        return _wrapped_view
+
+    if function:
+        return decorator(function)
+    return decorator
@@ -0,0 +1,79 @@
+"""
+Model fields shared by the accounts models
+"""
+from django import forms
+from django.conf import settings
+from django.db import models
+
+from . import compression
+
+
+class CompressedJSONField(models.BinaryField):
+    """
+    JSON stored as a zlib-compressed blob (with a preset dictionary).
+
+    With the ``JSON_FIELD_COMPRESSION`` setting on, values of at least
+    ``min_size`` bytes of JSON are compressed on write; smaller ones, and
+    everything while the setting is off (the default), are stored as plain
+    JSON bytes. Reads accept both, so turning
+    compression on or off never needs a rewrite. The column is a blob: JSON
+    key lookups in queries are not available. Use ``.defer()`` on listing
+    queries so the blob is only fetched and decompressed on attribute access.
+    """
+
+    description = "JSON (compressed)"
+
+    def __init__(self, *args, encoder=None, decoder=None, min_size=256, **kwargs):
+        self.encoder = encoder
+        self.decoder = decoder
+        self.min_size = min_size
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.encoder is not None:
+            kwargs['encoder'] = self.encoder
+        if self.decoder is not None:
+            kwargs['decoder'] = self.decoder
+        if self.min_size != 256:
+            kwargs['min_size'] = self.min_size
+        if kwargs.get('editable') is True:
+            del kwargs['editable']
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return compression.loads(value, decoder=self.decoder)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return compression.loads(value, decoder=self.decoder)
+        return value
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        return compression.dumps(
+            value,
+            encoder=self.encoder,
+            min_size=self.min_size,
+            enabled=getattr(settings, 'JSON_FIELD_COMPRESSION', False)
+        )
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        return super().get_db_prep_value(value, connection, prepared=True)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.JSONField,
+            'encoder': self.encoder,
+            'decoder': self.decoder,
+            **kwargs,
+        })
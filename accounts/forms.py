@@ -1,13 +1,65 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
+from django.forms.boundfield import BoundField
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Field, Submit, Row, Column
+from .config_schema import TemplateConfigError, validate_template_config
 from .models import RailwaySettings, Template
 
 User = get_user_model()
 
-class CustomUserCreationForm(UserCreationForm):
+
+def post_helper(form_class, layout=None):
+    """
+    Crispy helper for a POST form. Helpers hold no per-request state, so each
+    form class builds one at import and its instances share it.
+    """
+    helper = FormHelper()
+    helper.form_method = 'post'
+    helper.form_class = form_class
+    if layout is not None:
+        helper.layout = layout
+    return helper
+
+
+# Markup of unbound, empty fields, by form class, prefix, ids and field name
+_unbound_field_html = {}
+
+
+class CachedBoundField(BoundField):
+    """A BoundField that renders its widget once per process while unbound and empty"""
+    
+    def __str__(self):
+        if self.form.is_bound or self.value() not in (None, ''):
+            return super().__str__()
+        key = (type(self.form), self.form.prefix, self.form.auto_id, self.form.use_required_attribute, self.name)
+        html = _unbound_field_html.get(key)
+        if html is None:
+            html = _unbound_field_html[key] = super().__str__()
+        return html
+    
+    __html__ = __str__
+
+
+class CachedWidgetsMixin:
+    """
+    Serve the widgets of unbound forms from a per-process cache.
+    
+    Until it is submitted, a form renders the same widget markup on every
+    request: values come from a bound form or an initial value (those still
+    render each time), and errors and the CSRF token sit in the partials
+    around the widgets. Widget attributes must therefore not differ between
+    instances of the form.
+    """
+    
+    def __getitem__(self, name):
+        if name in self.fields and name not in self._bound_fields_cache:
+            self._bound_fields_cache[name] = CachedBoundField(self, self.fields[name], name)
+        return super().__getitem__(name)
+
+
+class CustomUserCreationForm(CachedWidgetsMixin, UserCreationForm):
     email = forms.EmailField(
         required=True,
         widget=forms.EmailInput(attrs={
@@ -20,22 +72,19 @@ class CustomUserCreationForm(UserCreationForm):
         })
     )
     
+    helper = post_helper('auth-form', Layout(
+        Field('email', css_class='form-control'),
+        Field('password1', css_class='form-control'),
+        Field('password2', css_class='form-control'),
+        Submit('submit', 'Sign Up', css_class='btn btn-primary w-100')
+    ))
+    
     class Meta:
         model = User
         fields = ('email', 'password1', 'password2')
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.form_class = 'auth-form'
-        self.helper.layout = Layout(
-            Field('email', css_class='form-control'),
-            Field('password1', css_class='form-control'),
-            Field('password2', css_class='form-control'),
-            Submit('submit', 'Sign Up', css_class='btn btn-primary w-100')
-        )
-        
         self.fields['password1'].widget.attrs.update({
             'class': 'form-control',
             'placeholder': 'Enter password'
@@ -45,7 +94,7 @@ class CustomUserCreationForm(UserCreationForm):
             'placeholder': 'Confirm password'
         })
 
-class CustomAuthenticationForm(AuthenticationForm):
+class CustomAuthenticationForm(CachedWidgetsMixin, AuthenticationForm):
     username = forms.EmailField(
         widget=forms.EmailInput(attrs={
             'class': 'form-control',
@@ -60,21 +109,18 @@ class CustomAuthenticationForm(AuthenticationForm):
         })
     )
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.form_class = 'auth-form'
-        self.helper.layout = Layout(
-            Field('username', css_class='form-control'),
-            Field('password', css_class='form-control'),
-            Submit('submit', 'Sign In', css_class='btn btn-primary w-100')
-        )
+    helper = post_helper('auth-form', Layout(
+        Field('username', css_class='form-control'),
+        Field('password', css_class='form-control'),
+        Submit('submit', 'Sign In', css_class='btn btn-primary w-100')
+    ))
 
 
-class RailwaySettingsForm(forms.ModelForm):
+class RailwaySettingsForm(CachedWidgetsMixin, forms.ModelForm):
     """Form for Railway settings"""
     
+    helper = post_helper('railway-settings-form')
+    
     class Meta:
         model = RailwaySettings
         fields = ['railway_template_id', 'railway_workspace_id', 'railway_token']
@@ -96,9 +142,6 @@ class RailwaySettingsForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.form_class = 'railway-settings-form'
         
         # Make token field optional (users can update other fields without changing token)
         self.fields['railway_token'].required = False
@@ -116,13 +159,23 @@ class RailwaySettingsForm(forms.ModelForm):
                 except RailwaySettings.DoesNotExist:
                     pass
         if commit:
-            instance.save()
+            fields = list(self._meta.fields)
+            if not instance.railway_token:
+                fields.remove('railway_token')
+            # Not instance.save(): an instance built from a stale cached "no
+            # row" must update the user's row rather than insert a second one
+            instance, _ = RailwaySettings.objects.update_or_create(
+                user=instance.user,
+                defaults={field: getattr(instance, field) for field in fields}
+            )
         return instance
 
 
-class TemplateCreationForm(forms.ModelForm):
+class TemplateCreationForm(CachedWidgetsMixin, forms.ModelForm):
     """Form for creating Railway templates"""
     
+    helper = post_helper('template-creation-form')
+    
     class Meta:
         model = Template
         fields = ['name', 'description', 'template_config']
@@ -146,9 +199,6 @@ class TemplateCreationForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.form_class = 'template-creation-form'
         
         # Set initial JSON format if instance exists
         if self.instance and self.instance.pk and self.instance.template_config:
@@ -175,9 +225,11 @@ class TemplateCreationForm(forms.ModelForm):
             except json.JSONDecodeError as e:
                 raise forms.ValidationError(f"Invalid JSON format: {str(e)}")
         
-        # Ensure we have a dict or list
-        if not isinstance(config, (dict, list)):
-            raise forms.ValidationError("Template config must be a valid JSON object or array")
+        # Check the Railway serializedConfig structure now rather than at deploy time
+        try:
+            validate_template_config(config)
+        except TemplateConfigError as e:
+            raise forms.ValidationError(f"Invalid template config at {e}")
         
         return config
     
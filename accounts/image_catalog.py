@@ -0,0 +1,377 @@
+"""
+In-memory catalog of Docker images for the editors' image autocomplete.
+
+The catalog holds every image seen in TemplateService/ProjectService rows
+plus SEED_IMAGES, each with a popularity (the number of services using it;
+seeds start at SEED_WEIGHT). Lookups are prefix matches over sorted arrays:
+
+    keys     sorted lowercase search keys ("postgres:16", "redis", ...)
+    targets  the image each key belongs to (parallel to keys)
+
+An image is reachable under its full name and under its name without the
+registry/namespace, so "redis" also finds "bitnami/redis:7". A query
+``bisect``s to its key range and takes the most popular images out of it
+with a max segment tree over the counts, so a lookup costs
+O(limit * log n) however many keys share the prefix. Results are memoized
+until the next change.
+
+Image names can be private (``acme/secret-billing``), so the shared catalog
+only holds public images: SEED_IMAGES and Docker Hub official images (no
+namespace). Each organization gets its other images from an overlay catalog
+of its own services, and ``suggest`` merges the two.
+
+Each process keeps its own catalogs. They are loaded on first use, gain new
+images as services are saved in this process (accounts.signals), and are
+reloaded from the database once older than IMAGE_CATALOG_MAX_AGE, so other
+processes' saves show up after at most that long.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+
+# Official images every account can pull; they rank above one-off images
+SEED_IMAGES = [
+    'postgres', 'postgres:16', 'postgres:15', 'postgres:16-alpine', 'mysql', 'mysql:8', 'mariadb',
+    'mongo', 'mongo:7', 'redis', 'redis:7', 'redis:7-alpine', 'memcached', 'rabbitmq',
+    'rabbitmq:3-management', 'nginx', 'nginx:latest', 'nginx:alpine', 'httpd', 'caddy', 'traefik',
+    'node', 'node:20', 'node:20-alpine', 'node:22-alpine', 'python', 'python:3.12', 'python:3.12-slim',
+    'python:3.11-slim', 'golang', 'golang:1.22', 'ruby', 'php', 'php:8.3-apache', 'openjdk',
+    'eclipse-temurin:21', 'alpine', 'alpine:latest', 'ubuntu', 'ubuntu:24.04', 'debian',
+    'busybox', 'wordpress', 'ghost', 'n8nio/n8n', 'grafana/grafana', 'prom/prometheus',
+    'minio/minio', 'elasticsearch:8.13.0', 'clickhouse/clickhouse-server', 'meilisearch/meilisearch',
+    'getmeili/meilisearch', 'metabase/metabase', 'directus/directus', 'strapi/strapi',
+    'louislam/uptime-kuma', 'vaultwarden/server', 'pgvector/pgvector:pg16',
+]
+SEED_WEIGHT = 5
+
+# Keys of new images held outside the sorted arrays before they are merged in
+PENDING_LIMIT = 1024
+# Lookup results kept until the next change
+MEMO_SIZE = 10000
+# Organization overlays kept per process; the oldest loaded goes first
+OVERLAY_LIMIT = 1000
+
+
+def image_keys(image):
+    """Search keys for ``image``: the full name and the name without registry/namespace"""
+    lowered = image.lower()
+    keys = {lowered}
+    if '/' in lowered:
+        keys.add(lowered.rsplit('/', 1)[1])
+    return keys
+
+
+def repository(image):
+    """``image`` without its tag (a registry port is not a tag)"""
+    name, _, tag = image.rpartition(':')
+    if not name or '/' in tag:
+        return image
+    return name
+
+
+def is_public(image):
+    """Whether every organization may see ``image`` suggested"""
+    return image in SEED_IMAGES or '/' not in repository(image)
+
+
+def _add_repository_uses(counts):
+    # Repository entries also collect their tags' uses
+    for image, uses in list(counts.items()):
+        base = repository(image)
+        if base != image and base in counts:
+            counts[base] += uses
+    return counts
+
+
+class ImageCatalog:
+    """Popularity-ranked prefix index of image names (thread-safe)"""
+
+    def __init__(self, counts=None, max_age=None):
+        self.lock = threading.Lock()
+        self.max_age = max_age
+        self.counts = {}
+        self.verified = set()
+        self.keys = []
+        self.targets = []
+        self.positions = {}
+        self.tree = []
+        self.size = 0
+        self.pending = []
+        self.memo = {}
+        self.loaded_at = None
+        if counts is not None:
+            self.replace(counts)
+
+    def replace(self, counts):
+        """Swap in a new ``{image: popularity}`` mapping"""
+        with self.lock:
+            self.counts = dict(counts)
+            self.build()
+            self.loaded_at = time.monotonic()
+
+    def build(self):
+        """Rebuild the sorted arrays and the max tree from ``counts`` (lock held)"""
+        pairs = sorted((key, image) for image in self.counts for key in image_keys(image))
+        self.keys = [key for key, _ in pairs]
+        self.targets = [image for _, image in pairs]
+        self.positions = {}
+        for index, image in enumerate(self.targets):
+            self.positions.setdefault(image, []).append(index)
+        self.pending = []
+        self.memo = {}
+
+        # Iterative segment tree; each node holds the key index with the
+        # highest count below it (-1 for none)
+        size = 1
+        while size < len(self.keys):
+            size *= 2
+        scores = [self.counts[image] for image in self.targets] + [-1] * (size - len(self.keys))
+        tree = [-1] * size + list(range(len(self.keys))) + [-1] * (size - len(self.keys))
+        best = [-1] * size + scores
+        for node in range(size - 1, 0, -1):
+            left, right = 2 * node, 2 * node + 1
+            if best[left] >= best[right]:
+                tree[node], best[node] = tree[left], best[left]
+            else:
+                tree[node], best[node] = tree[right], best[right]
+        self.tree = tree
+        self.size = size
+
+    def score(self, index):
+        return self.counts[self.targets[index]] if index >= 0 else -1
+
+    def better(self, a, b):
+        return a if self.score(a) >= self.score(b) else b
+
+    def argmax(self, lo, hi):
+        """Key index with the highest count in ``[lo, hi)``, or -1"""
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = self.better(best, self.tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = self.better(best, self.tree[hi])
+            lo //= 2
+            hi //= 2
+        return best
+
+    def bump(self, image):
+        """Propagate a count change of an indexed image up the tree (lock held)"""
+        for index in self.positions.get(image, ()):
+            node = (index + self.size) // 2
+            while node:
+                self.tree[node] = self.better(self.tree[2 * node], self.tree[2 * node + 1])
+                node //= 2
+
+    def add(self, image, weight=1):
+        """Count one more use of ``image``, inserting it if it is new"""
+        image = (image or '').strip()
+        if not image:
+            return
+        with self.lock:
+            if image in self.counts:
+                self.counts[image] += weight
+                self.bump(image)
+            else:
+                # New images wait in a short list that lookups scan, and
+                # are merged into the arrays once it fills up
+                self.counts[image] = weight
+                self.pending.extend((key, image) for key in image_keys(image))
+                if len(self.pending) > PENDING_LIMIT:
+                    self.build()
+            # Tags count towards their repository entry too, if it has one
+            base = repository(image)
+            if base != image and base in self.counts:
+                self.counts[base] += weight
+                self.bump(base)
+            self.memo = {}
+
+    def mark_verified(self, image):
+        """Remember that ``image`` exists on its registry"""
+        with self.lock:
+            self.verified.add(image)
+
+    def is_verified(self, image):
+        return image in self.verified
+
+    def __contains__(self, image):
+        return image in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def stale(self):
+        return self.loaded_at is None or (
+            self.max_age is not None and time.monotonic() - self.loaded_at > self.max_age
+        )
+
+    def suggest(self, prefix, limit=10):
+        """Up to ``limit`` images matching ``prefix``, most popular first"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        cached = self.memo.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        with self.lock:
+            lo = bisect_left(self.keys, prefix)
+            # Every key in range starts with prefix; the end is the first that sorts past it
+            hi = bisect_left(self.keys, prefix + '\U0010ffff', lo)
+
+            # Best-first walk: pop the top key of a range, split the range around it
+            found = []
+            seen = set()
+            heap = []
+            best = self.argmax(lo, hi)
+            if best >= 0:
+                heap.append((-self.score(best), best, lo, hi))
+            while heap and len(found) < limit:
+                _, index, lo, hi = heapq.heappop(heap)
+                image = self.targets[index]
+                if image not in seen:
+                    seen.add(image)
+                    found.append(image)
+                for sub_lo, sub_hi in ((lo, index), (index + 1, hi)):
+                    if sub_lo < sub_hi:
+                        best = self.argmax(sub_lo, sub_hi)
+                        heapq.heappush(heap, (-self.score(best), best, sub_lo, sub_hi))
+
+            for key, image in self.pending:
+                if image not in seen and key.startswith(prefix):
+                    seen.add(image)
+                    found.append(image)
+            counts = self.counts
+            results = sorted(found, key=lambda image: (-counts[image], len(image), image))[:limit]
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo = {}
+            self.memo[(prefix, limit)] = results
+        return results
+
+
+def _image_uses(queryset):
+    rows = (
+        queryset.exclude(image__isnull=True).exclude(image='')
+        .values('image').annotate(uses=Count('id')).values_list('image', 'uses')
+    )
+    for image, uses in rows:
+        yield image.strip(), uses
+
+
+def load_counts():
+    """
+    ``{image: popularity}`` of the public images in the service tables of
+    every tenant database, and SEED_IMAGES. The catalog is shared by the
+    whole process, so rows are read unscoped whatever organization the
+    loading request is for.
+    """
+    from .models import ProjectService, TemplateService
+    from .routers import tenant_databases
+
+    counts = {image: SEED_WEIGHT for image in SEED_IMAGES}
+    for database in tenant_databases():
+        for model in (TemplateService, ProjectService):
+            for image, uses in _image_uses(model.unscoped.using(database)):
+                if is_public(image):
+                    counts[image] = counts.get(image, 0) + uses
+    return _add_repository_uses(counts)
+
+
+def load_organization_counts(organization):
+    """``{image: popularity}`` of the non-public images ``organization``'s services use"""
+    from .models import ProjectService, TemplateService
+
+    counts = {}
+    for model in (TemplateService, ProjectService):
+        rows = model.unscoped.using(organization.database).filter(**{model.tenant_field: organization})
+        for image, uses in _image_uses(rows):
+            if not is_public(image):
+                counts[image] = counts.get(image, 0) + uses
+    return _add_repository_uses(counts)
+
+
+_catalog = ImageCatalog()
+_catalog.verified.update(SEED_IMAGES)
+_overlays = {}
+_reload_lock = threading.Lock()
+
+
+def get_catalog():
+    """The process-wide catalog of public images, (re)loaded from the database when stale"""
+    if _catalog.stale:
+        with _reload_lock:
+            if _catalog.stale:
+                _catalog.max_age = settings.IMAGE_CATALOG_MAX_AGE
+                _catalog.replace(load_counts())
+    return _catalog
+
+
+async def aget_catalog():
+    """get_catalog for async views; skips the thread hop unless a reload is due"""
+    if _catalog.stale:
+        return await sync_to_async(get_catalog)()
+    return _catalog
+
+
+def get_overlay(organization):
+    """The catalog of ``organization``'s own images, (re)loaded when stale"""
+    overlay = _overlays.get(organization.pk)
+    if overlay is None or overlay.stale:
+        with _reload_lock:
+            overlay = _overlays.get(organization.pk)
+            if overlay is None or overlay.stale:
+                overlay = ImageCatalog(load_organization_counts(organization), settings.IMAGE_CATALOG_MAX_AGE)
+                _overlays.pop(organization.pk, None)
+                _overlays[organization.pk] = overlay
+                while len(_overlays) > OVERLAY_LIMIT:
+                    del _overlays[next(iter(_overlays))]
+    return overlay
+
+
+def suggest(organization, prefix, limit=10):
+    """Up to ``limit`` public or ``organization``'s own images matching ``prefix``"""
+    catalogs = [get_catalog()]
+    if organization is not None:
+        catalogs.append(get_overlay(organization))
+    found = {}
+    for catalog in catalogs:
+        for image in catalog.suggest(prefix, limit):
+            found[image] = found.get(image, 0) + catalog.counts.get(image, 0)
+    return sorted(found, key=lambda image: (-found[image], len(image), image))[:limit]
+
+
+async def asuggest(organization, prefix, limit=10):
+    """suggest for async views; skips the thread hop unless a load is due"""
+    overlay = _overlays.get(organization.pk) if organization is not None else None
+    if _catalog.stale or (organization is not None and (overlay is None or overlay.stale)):
+        return await sync_to_async(suggest)(organization, prefix, limit)
+    return suggest(organization, prefix, limit)
+
+
+def record_image(image, created, organization_id=None):
+    """
+    Add a saved service's image to the catalog it belongs in, if loaded:
+    public images to the shared one, others to ``organization_id``'s overlay.
+
+    Editors autosave the same service over and over, so an update only
+    inserts images the catalog has not seen; use counts are corrected by
+    the next reload.
+    """
+    image = (image or '').strip()
+    if not image:
+        return
+    catalog = _catalog if is_public(image) else _overlays.get(organization_id)
+    if catalog is None or catalog.loaded_at is None:
+        return
+    if created or image not in catalog:
+        catalog.add(image)
@@ -0,0 +1,43 @@
+"""
+Archive or purge soft-deleted templates and projects in throttled batches.
+
+Usage:
+    python manage.py archive_deleted --min-age 3600 --batch-size 200 --pause 0.5
+    python manage.py archive_deleted --purge
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.archival import ARCHIVE_SPECS, archive_inactive
+
+
+class Command(BaseCommand):
+    help = 'Move inactive templates/projects (with their services) to the archive tables, or purge them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(ARCHIVE_SPECS), action='append',
+                            help='Only process this kind (repeatable; default: all)')
+        parser.add_argument('--purge', action='store_true', help='Delete without archiving')
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows per transaction')
+        parser.add_argument('--pause', type=float, default=0.5, help='Seconds to sleep between batches')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches per kind and database')
+        parser.add_argument('--min-age', type=int, default=0,
+                            help='Only rows soft-deleted at least this many seconds ago')
+
+    def handle(self, *args, **options):
+        deleted_before = timezone.now() - timedelta(seconds=options['min_age'])
+        action = 'Purged' if options['purge'] else 'Archived'
+
+        for kind in options['kind'] or sorted(ARCHIVE_SPECS):
+            total = archive_inactive(
+                kind,
+                batch_size=options['batch_size'],
+                purge=options['purge'],
+                deleted_before=deleted_before,
+                pause=options['pause'],
+                max_batches=options['max_batches'],
+                on_batch=lambda count, kind=kind: self.stdout.write(f'  {kind}: {count} row(s)')
+            )
+            self.stdout.write(self.style.SUCCESS(f'{action} {total} {kind}(s)'))
@@ -0,0 +1,35 @@
+"""
+Stream a user's templates, projects and services to NDJSON.
+
+Usage:
+    python manage.py export_account user@example.com -o account.ndjson
+"""
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.transfer import export_user_data
+
+
+class Command(BaseCommand):
+    help = "Export a user's Template/Project graph as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to export')
+        parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per query chunk')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        lines = export_user_data(user, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,41 @@
+"""
+Import an NDJSON export (see export_account) into a user's account.
+
+Usage:
+    python manage.py import_account user@example.com -i account.ndjson
+"""
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.quotas import QuotaExceeded
+from accounts.transfer import TransferError, import_user_data
+
+
+class Command(BaseCommand):
+    help = "Import a Template/Project graph from NDJSON, remapping IDs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user receiving the data')
+        parser.add_argument('-i', '--input', help='Input file (default: stdin)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        try:
+            if options['input']:
+                with open(options['input'], encoding='utf-8') as lines:
+                    counts = import_user_data(user, lines, batch_size=options['batch_size'])
+            else:
+                counts = import_user_data(user, sys.stdin, batch_size=options['batch_size'])
+        except (TransferError, QuotaExceeded) as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{count} {record_type}(s)' for record_type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Imported {summary}'))
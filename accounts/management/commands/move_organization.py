@@ -0,0 +1,38 @@
+"""
+Move an organization's templates and projects to another database (see accounts.sharding).
+
+Usage:
+    TENANT_DATABASES=shard1 python manage.py migrate --database shard1
+    TENANT_DATABASES=shard1 python manage.py move_organization acme shard1
+    TENANT_DATABASES=shard1 python manage.py move_organization acme default
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Organization
+from accounts.sharding import ShardingError, move_organization
+
+
+class Command(BaseCommand):
+    help = "Copy an organization's rows to another database alias and delete them from the current one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', help='Organization slug')
+        parser.add_argument('database', help='Target DATABASES alias')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk_create')
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(slug=options['organization'])
+        except Organization.DoesNotExist:
+            raise CommandError(f"No organization with slug {options['organization']}")
+
+        source = organization.database
+        try:
+            counts = move_organization(organization, options['database'], batch_size=options['batch_size'])
+        except ShardingError as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{count} {record_type}(s)' for record_type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {organization.slug} from {source} to {organization.database}: {summary}'
+        ))
@@ -0,0 +1,25 @@
+"""
+Recompute the usage counters (accounts.usage) from the service tables.
+
+Run after bulk edits that bypass the models, or if the counters drift.
+
+Usage:
+    python manage.py repair_usage
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.usage import recompute_usage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ProjectUsage and UserUsage from ProjectService rows'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        projects, users = recompute_usage()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed usage of {projects} project(s) and {users} user(s) '
+            f'in {time.perf_counter() - start:.2f}s'
+        ))
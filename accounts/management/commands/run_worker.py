@@ -0,0 +1,60 @@
+"""
+Work off the background task queue (accounts.tasks) on this node.
+
+Run as many of these, on as many nodes, as the queue needs; workers claim
+jobs with leases, so no job runs twice at once. Set
+BACKGROUND_TASK_WORKERS=0 on the web processes to leave all jobs to them.
+
+Usage:
+    python manage.py run_worker --threads 4
+    python manage.py run_worker --processes 2 --threads 4
+    python manage.py run_worker --burst
+"""
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.tasks import Worker
+
+
+def serve(threads, name, burst):
+    Worker(threads=threads, name=name, burst=burst).run()
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued background tasks until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads per process')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes (for CPU-bound jobs; forked from this one)')
+        parser.add_argument('--name', default=None, help='Worker name recorded on leases (default: hostname)')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        threads, name, burst = options['threads'], options['name'], options['burst']
+        self.stdout.write(
+            f"Running {options['processes']} process(es) x {threads} thread(s)"
+            f"{' until the queue is empty' if burst else ''}"
+        )
+        if options['processes'] <= 1:
+            serve(threads, name, burst)
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=serve, args=(threads, name, burst), name=f'worker-{index}')
+            for index in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # The children got the SIGINT too and are finishing their jobs
+            for process in processes:
+                process.join()
@@ -0,0 +1,39 @@
+"""
+Copy the default SQLite database into each DATABASE_REPLICAS file.
+
+The replica files stand in for streaming replicas in development; run this
+(e.g. from cron or in a loop) to bring them up to date. Until it runs again
+they lag behind, like a real replica would.
+
+Usage:
+    DATABASE_REPLICAS=replica python manage.py sync_replicas
+"""
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copy db.sqlite3 into the SQLite files of DATABASE_REPLICAS'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No DATABASE_REPLICAS configured')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only copies SQLite databases')
+
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            replica.close()
+            # The online backup API copies a consistent snapshot while other
+            # connections keep writing
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'Synced {alias}'))
@@ -0,0 +1,142 @@
+"""
+Per-request accessors for account data
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from . import replicas, tenancy
+from .models import Organization, RailwaySettings
+
+# Session key of the organization the user switched to (else their personal one)
+ORGANIZATION_SESSION_KEY = 'organization_id'
+
+
+def get_railway_settings(request):
+    if not hasattr(request, '_cached_railway_settings'):
+        user = request.user
+        request._cached_railway_settings = (
+            RailwaySettings.objects.for_user(user) if user.is_authenticated else None
+        )
+    return request._cached_railway_settings
+
+
+class RailwaySettingsMiddleware:
+    """
+    Attach ``request.railway_settings``, resolved on first access only.
+
+    The lookup is memoized for the request and served from the shared cache
+    (see RailwaySettingsManager.for_user), so most navigations run no query.
+    Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.railway_settings = SimpleLazyObject(lambda: get_railway_settings(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.railway_settings = SimpleLazyObject(lambda: get_railway_settings(request))
+        return await self.get_response(request)
+
+
+def get_organization(request):
+    """The organization ``request.user`` is working in"""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    organization_id = request.session.get(ORGANIZATION_SESSION_KEY)
+    if organization_id is not None:
+        organization = Organization.objects.for_member(user).filter(pk=organization_id).first()
+        if organization is not None:
+            return organization
+    return Organization.objects.personal_for(user)
+
+
+class OrganizationMiddleware:
+    """
+    Attach ``request.organization`` and make it the active tenant.
+
+    Tenant managers and accounts.routers.TenantRouter scope every query of
+    the request to it. The lookup needs the user and the session, so under
+    ASGI it runs in a worker thread. Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.organization = get_organization(request)
+        token = tenancy.activate(request.organization)
+        try:
+            return self.get_response(request)
+        finally:
+            tenancy.deactivate(token)
+
+    async def __acall__(self, request):
+        request.organization = await sync_to_async(get_organization)(request)
+        token = tenancy.activate(request.organization)
+        try:
+            return await self.get_response(request)
+        finally:
+            tenancy.deactivate(token)
+
+
+class ReplicaMiddleware:
+    """
+    Read-your-writes for replica reads (see accounts.replicas).
+
+    A request carrying the pin cookie reads from the primary only; a
+    request that wrote anything (re)sets the cookie. Removed from the stack
+    when no DATABASE_REPLICAS are configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = replicas.begin_request(replicas.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state, token = replicas.begin_request(replicas.PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.end_request(token)
+        return self.pin(state, response)
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                replicas.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_templateservice_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Task name', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', help_text='Task status', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0, help_text='Number of items to process')),
+                ('done', models.PositiveIntegerField(default=0, help_text='Number of items processed')),
+                ('message', models.TextField(blank=True, default='', help_text='Result or error message')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, help_text='User who started the task', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='background_tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Background Task',
+                'verbose_name_plural': 'Background Tasks',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
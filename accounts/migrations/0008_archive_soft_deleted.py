@@ -0,0 +1,76 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:18
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(db_index=True, help_text='ID the project had before archival')),
+                ('name', models.CharField(help_text='Project name', max_length=255)),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Project fields and its services')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Project',
+                'verbose_name_plural': 'Archived Projects',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(db_index=True, help_text='ID the template had before archival')),
+                ('name', models.CharField(help_text='Template name', max_length=255)),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Template fields and its services')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Template',
+                'verbose_name_plural': 'Archived Templates',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When the project was soft-deleted', null=True),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When the template was soft-deleted', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', 'is_active'], name='project_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['user', 'is_active'], name='template_user_active_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedproject',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_projects', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtemplate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_templates', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
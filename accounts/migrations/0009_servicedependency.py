@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_archive_soft_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('depends_on', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependents', to='accounts.projectservice')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependencies', to='accounts.projectservice')),
+            ],
+            options={
+                'verbose_name': 'Service Dependency',
+                'verbose_name_plural': 'Service Dependencies',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='servicedependency',
+            constraint=models.CheckConstraint(check=models.Q(('service', models.F('depends_on')), _negated=True), name='service_dependency_not_self'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='servicedependency',
+            unique_together={('service', 'depends_on')},
+        ),
+    ]
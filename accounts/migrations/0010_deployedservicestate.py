@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_servicedependency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeployedServiceState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_id', models.CharField(help_text='Service identifier (e.g., service_1)', max_length=255)),
+                ('railway_service_id', models.CharField(blank=True, help_text='Railway Service ID', max_length=255, null=True)),
+                ('config_hash', models.CharField(help_text='SHA-256 of the deployed service configuration', max_length=64)),
+                ('deployed_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deployed_states', to='accounts.project')),
+            ],
+            options={
+                'verbose_name': 'Deployed Service State',
+                'verbose_name_plural': 'Deployed Service States',
+                'unique_together': {('project', 'service_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Moves Template.template_config and the services' variables to
+# CompressedJSONField: add a blob column, copy rows over in batches, then
+# swap it in for the JSON column. Works the same on SQLite and Postgres.
+# The copy goes through the field, so rows are only compressed when
+# JSON_FIELD_COMPRESSION is on; otherwise they keep their plain JSON.
+
+import accounts.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+COMPRESSED_FIELDS = [
+    ('template', 'template_config', 'Template configuration (JSON)'),
+    ('templateservice', 'variables', 'Environment variables'),
+    ('projectservice', 'variables', 'Environment variables'),
+]
+
+
+def copy_in_batches(model, source, target):
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', source)[:BATCH_SIZE])
+        if not batch:
+            break
+        for obj in batch:
+            setattr(obj, target, getattr(obj, source))
+        model.objects.bulk_update(batch, [target])
+        last_pk = batch[-1].pk
+
+
+def compress_rows(apps, schema_editor):
+    for model_name, field, _ in COMPRESSED_FIELDS:
+        copy_in_batches(apps.get_model('accounts', model_name), field, f'{field}_compressed')
+
+
+def decompress_rows(apps, schema_editor):
+    for model_name, field, _ in COMPRESSED_FIELDS:
+        copy_in_batches(apps.get_model('accounts', model_name), f'{field}_compressed', field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_deployedservicestate'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name=f'{field}_compressed',
+                field=accounts.fields.CompressedJSONField(default=dict, help_text=help_text),
+            )
+            for model_name, field, help_text in COMPRESSED_FIELDS
+        ],
+        migrations.RunPython(compress_rows, decompress_rows),
+        *[
+            operation
+            for model_name, field, help_text in COMPRESSED_FIELDS
+            for operation in (
+                migrations.RemoveField(model_name=model_name, name=field),
+                migrations.RenameField(model_name=model_name, old_name=f'{field}_compressed', new_name=field),
+            )
+        ],
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:42
+#
+# Moves ownership of templates and projects from users to organizations:
+# every user who owns rows gets a personal organization (as
+# OrganizationManager.personal_for creates them) and their rows are
+# assigned to it before the column becomes required.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_personal_organizations(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Organization = apps.get_model('accounts', 'Organization')
+    Membership = apps.get_model('accounts', 'Membership')
+    Template = apps.get_model('accounts', 'Template')
+    Project = apps.get_model('accounts', 'Project')
+
+    owner_ids = set(Template.objects.values_list('user_id', flat=True).distinct())
+    owner_ids |= set(Project.objects.values_list('user_id', flat=True).distinct())
+    for user in User.objects.filter(pk__in=owner_ids).iterator():
+        organization = Organization.objects.create(
+            owner=user,
+            is_personal=True,
+            name=user.email or user.username,
+            slug=f'user-{user.pk}'
+        )
+        Membership.objects.create(organization=organization, user=user, role='owner')
+        Template.objects.filter(user=user).update(organization=organization)
+        Project.objects.filter(user=user).update(organization=organization)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_compress_json_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='user',
+            field=models.ForeignKey(help_text='User who created the project', on_delete=django.db.models.deletion.CASCADE, related_name='projects', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='template',
+            name='user',
+            field=models.ForeignKey(help_text='User who created the template', on_delete=django.db.models.deletion.CASCADE, related_name='templates', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='Organization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Organization name', max_length=255)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('is_personal', models.BooleanField(default=False, help_text='Created automatically for a single user')),
+                ('database', models.CharField(default='default', help_text="Database alias holding this organization's templates and projects", max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_organizations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Organization',
+                'verbose_name_plural': 'Organizations',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Membership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('owner', 'Owner'), ('admin', 'Admin'), ('member', 'Member')], default='member', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to=settings.AUTH_USER_MODEL)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='accounts.organization')),
+            ],
+            options={
+                'verbose_name': 'Membership',
+                'verbose_name_plural': 'Memberships',
+            },
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='organization',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='projects', to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='organization',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='templates', to='accounts.organization'),
+        ),
+        migrations.RunPython(create_personal_organizations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='project',
+            name='organization',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projects', to='accounts.organization'),
+        ),
+        migrations.AlterField(
+            model_name='template',
+            name='organization',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='templates', to='accounts.organization'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['organization', 'is_active'], name='project_org_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['organization', 'is_active'], name='template_org_active_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='membership',
+            unique_together={('organization', 'user')},
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:51
+#
+# Turns BackgroundTask into the job queue table. Tasks recorded before
+# could only run on the thread that enqueued them, so any still pending or
+# running are marked failed: no worker can pick them up.
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def fail_unqueued_tasks(apps, schema_editor):
+    BackgroundTask = apps.get_model('accounts', 'BackgroundTask')
+    BackgroundTask.objects.filter(status__in=['pending', 'running']).update(
+        status='failed',
+        message='Interrupted by an upgrade; start the task again.',
+        finished_at=django.utils.timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='args',
+            field=models.JSONField(blank=True, default=list, help_text='Arguments passed to the function after the task'),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of times a worker has started the task'),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='func',
+            field=models.CharField(blank=True, default='', help_text='Dotted path of the function to run', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='The task is handed to another worker if its lease is not renewed by then', null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', help_text='Worker running the task', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='max_attempts',
+            field=models.PositiveSmallIntegerField(default=3, help_text='Attempts before the task is marked failed'),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='organization',
+            field=models.ForeignKey(blank=True, help_text='Organization the task runs in', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='background_tasks', to='accounts.organization'),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='priority',
+            field=models.SmallIntegerField(default=0, help_text='Higher priorities are claimed first'),
+        ),
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time a worker may start the task'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundtask',
+            index=models.Index(fields=['status', '-priority', 'run_after'], name='task_claim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundtask',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='task_lease_idx'),
+        ),
+        migrations.RunPython(fail_unqueued_tasks, migrations.RunPython.noop),
+    ]
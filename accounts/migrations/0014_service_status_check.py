@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectservice',
+            name='next_status_check',
+            field=models.DateTimeField(blank=True, db_index=True, help_text="When core.reconciler checks the service's status next (empty: not polled)", null=True),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:57
+#
+# Usage counters start out filled from the existing services (the same
+# aggregates as accounts.usage.recompute_usage, on this database).
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_usage(apps, schema_editor):
+    ProjectService = apps.get_model('accounts', 'ProjectService')
+    ProjectUsage = apps.get_model('accounts', 'ProjectUsage')
+    UserUsage = apps.get_model('accounts', 'UserUsage')
+
+    users = {}
+    projects = []
+    rows = (
+        ProjectService.objects.values('project_id', 'project__user_id')
+        .annotate(services=Count('pk'), cpu=Sum('cpu'), memory=Sum('memory'))
+        .order_by()
+    )
+    for row in rows:
+        totals = (row['services'], row['cpu'] or 0, row['memory'] or 0)
+        projects.append(ProjectUsage(
+            project_id=row['project_id'], services=totals[0], cpu=totals[1], memory=totals[2]
+        ))
+        previous = users.get(row['project__user_id'], (0, 0, 0))
+        users[row['project__user_id']] = tuple(a + b for a, b in zip(previous, totals))
+    ProjectUsage.objects.bulk_create(projects, batch_size=1000)
+    UserUsage.objects.bulk_create(
+        [UserUsage(user_id=user_id, services=services, cpu=cpu, memory=memory)
+         for user_id, (services, cpu, memory) in users.items()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_service_status_check'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectUsage',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='accounts.project')),
+                ('services', models.IntegerField(default=0, help_text='Number of services')),
+                ('cpu', models.IntegerField(default=0, help_text='Total CPU allocation')),
+                ('memory', models.IntegerField(default=0, help_text='Total memory in GB')),
+            ],
+            options={
+                'verbose_name': 'Project Usage',
+                'verbose_name_plural': 'Project Usage',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserUsage',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('services', models.IntegerField(default=0, help_text='Number of services')),
+                ('cpu', models.IntegerField(default=0, help_text='Total CPU allocation')),
+                ('memory', models.IntegerField(default=0, help_text='Total memory in GB')),
+            ],
+            options={
+                'verbose_name': 'User Usage',
+                'verbose_name_plural': 'User Usage',
+            },
+        ),
+        migrations.RunPython(fill_usage, migrations.RunPython.noop),
+    ]
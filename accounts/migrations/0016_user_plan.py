@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_resource_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='plan',
+            field=models.CharField(choices=[('free', 'Free'), ('pro', 'Pro'), ('enterprise', 'Enterprise')], default='free', help_text="Plan whose limits apply to the user's projects (see accounts.quotas)", max_length=20),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Personal organizations are now created at signup (accounts.signals)
+# instead of on a user's first request; this creates the missing ones for
+# existing users, as OrganizationManager.personal_for does.
+
+from django.db import migrations
+
+
+def create_missing_personal_organizations(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Organization = apps.get_model('accounts', 'Organization')
+    Membership = apps.get_model('accounts', 'Membership')
+
+    users = User.objects.exclude(owned_organizations__is_personal=True)
+    for user in users.iterator():
+        organization = Organization.objects.create(
+            owner=user,
+            is_personal=True,
+            name=user.email or user.username,
+            slug=f'user-{user.pk}'
+        )
+        Membership.objects.create(organization=organization, user=user, role='owner')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_user_plan'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_personal_organizations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Stored template configs no longer carry registry credentials (they are
+# compiled in only when deploying, see accounts.railway_config); strip the
+# ones saved before, from templates and from archived template snapshots.
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def strip_credentials(config):
+    """Remove deploy.registryCredentials from every service; True if anything changed"""
+    services = ((config or {}).get('input') or {}).get('serializedConfig', {}).get('services') or {}
+    changed = False
+    for service in services.values():
+        deploy = service.get('deploy') if isinstance(service, dict) else None
+        if isinstance(deploy, dict) and deploy.pop('registryCredentials', None) is not None:
+            changed = True
+    return changed
+
+
+def strip_in_batches(model, field, get_config):
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', field)[:BATCH_SIZE])
+        if not batch:
+            break
+        changed = [obj for obj in batch if isinstance(get_config(obj), dict) and strip_credentials(get_config(obj))]
+        if changed:
+            model.objects.bulk_update(changed, [field])
+        last_pk = batch[-1].pk
+
+
+def strip_stored_credentials(apps, schema_editor):
+    strip_in_batches(apps.get_model('accounts', 'Template'), 'template_config', lambda obj: obj.template_config)
+    strip_in_batches(
+        apps.get_model('accounts', 'ArchivedTemplate'), 'data',
+        lambda obj: (obj.data or {}).get('template_config')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_personal_organizations'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_stored_credentials, migrations.RunPython.noop),
+    ]
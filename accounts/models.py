@@ -1,16 +1,83 @@
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinLengthValidator
+from django.utils import timezone
+from .fields import CompressedJSONField
+from .quotas import DEFAULT_PLAN, PLANS, enforce, plan_for
+from .tenancy import TenantManager, get_current_organization
 import secrets
 
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    plan = models.CharField(
+        max_length=20,
+        choices=[(key, plan.name) for key, plan in PLANS.items()],
+        default=DEFAULT_PLAN,
+        help_text="Plan whose limits apply to the user's projects (see accounts.quotas)"
+    )
     
     def __str__(self):
         return self.email
 
 
+class RailwaySettingsManager(models.Manager):
+    """Cache-backed lookups of a user's RailwaySettings"""
+    
+    # Cached in place of a row for users who have never saved settings
+    NO_ROW = 'missing'
+    
+    def cache_key(self, user_id):
+        return f'railway_settings:{user_id}'
+    
+    def caching(self):
+        # Saves invalidate the entry in the cache they can reach; a
+        # per-process cache would keep serving other workers the old row
+        return settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+    
+    def for_user(self, user):
+        """
+        Return the user's settings, served from the shared cache when possible
+        (not cached at all without one).
+        
+        Users without a row get an unsaved instance; the row is only created
+        when that instance is saved (RailwaySettingsForm uses update_or_create,
+        so a stale "no row" entry cannot insert a second one).
+        """
+        if not self.caching():
+            return self.filter(user_id=user.pk).first() or self.model(user=user)
+        
+        key = self.cache_key(user.pk)
+        cached = cache.get(key)
+        if cached is None:
+            instance = self.filter(user_id=user.pk).first()
+            cached = self._to_cache(instance)
+            cache.set(key, cached, settings.RAILWAY_SETTINGS_CACHE_TIMEOUT)
+        
+        if cached == self.NO_ROW:
+            instance = self.model(user=user)
+        else:
+            field_names, values = cached
+            instance = self.model.from_db(self.db, field_names, values)
+            instance.user = user
+        return instance
+    
+    def invalidate(self, user_id):
+        cache.delete(self.cache_key(user_id))
+    
+    def _to_cache(self, instance):
+        if instance is None:
+            return self.NO_ROW
+        fields = self.model._meta.concrete_fields
+        return (
+            [field.attname for field in fields],
+            [getattr(instance, field.attname) for field in fields]
+        )
+
+
 class RailwaySettings(models.Model):
     """Store Railway.app credentials for each user"""
     user = models.OneToOneField(
@@ -39,6 +106,8 @@ class RailwaySettings(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = RailwaySettingsManager()
+    
     class Meta:
         verbose_name = "Railway Settings"
         verbose_name_plural = "Railway Settings"
@@ -47,16 +116,138 @@ class RailwaySettings(models.Model):
         return f"Railway Settings for {self.user.email}"
 
 
+# =============================================================================
+# ORGANIZATION - Tenant that owns templates and projects
+# =============================================================================
+
+class OrganizationManager(models.Manager):
+    def personal_for(self, user):
+        """
+        The user's personal organization. It is created at signup
+        (accounts.signals); creating it here covers users from before that.
+        """
+        organization = self.filter(owner=user, is_personal=True).first()
+        if organization is not None:
+            return organization
+        database = router.db_for_write(self.model)
+        try:
+            # The organization never exists without its owner membership
+            with transaction.atomic(using=database):
+                organization, created = self.db_manager(database).get_or_create(
+                    owner=user,
+                    is_personal=True,
+                    defaults={'name': user.email or user.username, 'slug': f'user-{user.pk}'}
+                )
+                if created:
+                    Membership.objects.using(database).create(organization=organization, user=user, role='owner')
+        except IntegrityError:
+            # Created by a concurrent request in the meantime
+            organization = self.db_manager(database).get(owner=user, is_personal=True)
+        return organization
+    
+    def for_member(self, user):
+        return self.filter(memberships__user=user)
+
+
+class Organization(models.Model):
+    """
+    Tenant owning Templates and Projects (and through them, their services).
+    
+    Every user has a personal organization; shared ones have more members.
+    ``database`` is the DATABASES alias holding the organization's rows (see
+    accounts.routers and the move_organization command).
+    """
+    name = models.CharField(
+        max_length=255,
+        help_text="Organization name"
+    )
+    slug = models.SlugField(
+        max_length=100,
+        unique=True
+    )
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='owned_organizations'
+    )
+    is_personal = models.BooleanField(
+        default=False,
+        help_text="Created automatically for a single user"
+    )
+    database = models.CharField(
+        max_length=100,
+        default='default',
+        help_text="Database alias holding this organization's templates and projects"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = OrganizationManager()
+    
+    class Meta:
+        verbose_name = "Organization"
+        verbose_name_plural = "Organizations"
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class Membership(models.Model):
+    """A user's role in an organization"""
+    
+    ROLE_CHOICES = [
+        ('owner', 'Owner'),
+        ('admin', 'Admin'),
+        ('member', 'Member'),
+    ]
+    
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='memberships'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='memberships'
+    )
+    role = models.CharField(
+        max_length=20,
+        choices=ROLE_CHOICES,
+        default='member'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Membership"
+        verbose_name_plural = "Memberships"
+        unique_together = ['organization', 'user']
+    
+    def __str__(self):
+        return f"{self.user.email} in {self.organization.name} ({self.role})"
+
+
+def default_organization(user):
+    """Organization new rows of ``user`` belong to: the active one, else their personal one"""
+    return get_current_organization() or Organization.objects.personal_for(user)
+
+
 # =============================================================================
 # TEMPLATE - Blueprint/Design for deployments
 # =============================================================================
 
 class Template(models.Model):
     """Blueprint/Design for Railway deployments - not actually deployed"""
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='templates'
+    )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='templates'
+        related_name='templates',
+        help_text="User who created the template"
     )
     name = models.CharField(
         max_length=255,
@@ -67,7 +258,7 @@ class Template(models.Model):
         null=True,
         help_text="Template description"
     )
-    template_config = models.JSONField(
+    template_config = CompressedJSONField(
         default=dict,
         help_text="Template configuration (JSON)"
     )
@@ -79,49 +270,94 @@ class Template(models.Model):
         default=False,
         help_text="Whether this template has been published to Railway"
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the template was soft-deleted"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    tenant_field = 'organization'
+    
     class Meta:
         verbose_name = "Template"
         verbose_name_plural = "Templates"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='template_user_active_idx'),
+            models.Index(fields=['organization', 'is_active'], name='template_org_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.user.email}"
     
+    def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization = default_organization(self.user)
+        super().save(*args, **kwargs)
+    
     def publish(self):
-        """Create a Project from this Template"""
-        # Create Project
-        project = Project.objects.create(
-            user=self.user,
-            source_template=self,
-            name=f"{self.name} Deployment",
-            description=f"Deployed from template: {self.name}"
-        )
+        """
+        Create a Project from this Template.
         
-        # Copy all template services to project services
-        for template_service in self.services.all():
-            ProjectService.objects.create(
-                project=project,
-                source_service=template_service,
-                service_id=template_service.service_id,
-                name=template_service.name,
-                image=template_service.image,
-                registry_username=template_service.registry_username,
-                registry_password=template_service.registry_password,
-                cpu=template_service.cpu,
-                memory=template_service.memory,
-                variables=template_service.variables,
-                networking=template_service.networking,
-                position_x=template_service.position_x,
-                position_y=template_service.position_y
+        Raises QuotaExceeded, creating nothing, if the services do not fit
+        the owner's plan.
+        """
+        with transaction.atomic(using=self._state.db), enforce(plan_for(self.user)):
+            # Create Project
+            project = Project.objects.create(
+                organization_id=self.organization_id,
+                user=self.user,
+                source_template=self,
+                name=f"{self.name} Deployment",
+                description=f"Deployed from template: {self.name}"
             )
+            
+            services = list(self.services.all())
+            
+            # Copy all template services to project services in one batch
+            created = ProjectService.objects.bulk_create([
+                ProjectService(
+                    project=project,
+                    source_service=template_service,
+                    service_id=template_service.service_id,
+                    name=template_service.name,
+                    image=template_service.image,
+                    registry_username=template_service.registry_username,
+                    registry_password=template_service.registry_password,
+                    cpu=template_service.cpu,
+                    memory=template_service.memory,
+                    variables=template_service.variables,
+                    networking=template_service.networking,
+                    position_x=template_service.position_x,
+                    position_y=template_service.position_y
+                )
+                for template_service in services
+            ])
+            from .signals import rows_bulk_created
+            rows_bulk_created.send(sender=ProjectService, instances=created)
+            
+            # Keep the stored config in step with the service rows it describes
+            if services:
+                from .railway_config import template_input
+                self.template_config = template_input(self, workspace_id=self.workspace_id)
+            
+            self.is_published = True
+            self.save()
+            
+            return project
         
-        self.is_published = True
-        self.save()
-        
-        return project
+    @property
+    def workspace_id(self):
+        """Railway workspace the template targets (from its config, else the user's settings)"""
+        config = self.template_config if isinstance(self.template_config, dict) else {}
+        workspace_id = (config.get('input') or {}).get('workspaceId')
+        if workspace_id:
+            return workspace_id
+        return RailwaySettings.objects.for_user(self.user).railway_workspace_id
 
 
 class TemplateService(models.Model):
@@ -167,7 +403,7 @@ class TemplateService(models.Model):
         default=8,
         help_text="Memory in GB"
     )
-    variables = models.JSONField(
+    variables = CompressedJSONField(
         default=dict,
         help_text="Environment variables"
     )
@@ -186,6 +422,10 @@ class TemplateService(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    tenant_field = 'template__organization'
+    
     class Meta:
         verbose_name = "Template Service"
         verbose_name_plural = "Template Services"
@@ -211,10 +451,16 @@ class Project(models.Model):
         ('stopped', 'Stopped'),
     ]
     
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        related_name='projects'
+    )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='projects'
+        related_name='projects',
+        help_text="User who created the project"
     )
     source_template = models.ForeignKey(
         Template,
@@ -261,17 +507,35 @@ class Project(models.Model):
         blank=True,
         help_text="When the project was deployed"
     )
+    deleted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the project was soft-deleted"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    tenant_field = 'organization'
+    
     class Meta:
         verbose_name = "Project"
         verbose_name_plural = "Projects"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_active'], name='project_user_active_idx'),
+            models.Index(fields=['organization', 'is_active'], name='project_org_active_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.user.email}"
     
+    def save(self, *args, **kwargs):
+        if self.organization_id is None:
+            self.organization = default_organization(self.user)
+        super().save(*args, **kwargs)
+    
     @property
     def services_count(self):
         return self.services.count()
@@ -351,7 +615,7 @@ class ProjectService(models.Model):
         default=8,
         help_text="Memory in GB"
     )
-    variables = models.JSONField(
+    variables = CompressedJSONField(
         default=dict,
         help_text="Environment variables"
     )
@@ -385,9 +649,21 @@ class ProjectService(models.Model):
         blank=True,
         help_text="When the service was deployed"
     )
+    next_status_check = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="When core.reconciler checks the service's status next (empty: not polled)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TenantManager()
+    unscoped = models.Manager()
+    tenant_field = 'project__organization'
+    # Attributes core.search indexes a service by
+    search_fields = ('name', 'image', 'project_id')
+    
     class Meta:
         verbose_name = "Project Service"
         verbose_name_plural = "Project Services"
@@ -396,6 +672,346 @@ class ProjectService(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.project.name})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The allocation accounts.usage has counted for this row, so a save
+        # can add just the difference
+        instance._counted_usage = (instance.__dict__.get('cpu'), instance.__dict__.get('memory'))
+        # What the search index has for this row, so saves that leave it
+        # alone are not re-indexed
+        instance._indexed = instance.indexed_values()
+        return instance
+    
+    def indexed_values(self):
+        # Deferred fields that were never set cannot have changed: read as None
+        return tuple(self.__dict__.get(field) for field in self.search_fields)
+
+
+class ServiceDependency(models.Model):
+    """Edge on the project canvas: ``service`` needs ``depends_on`` running first"""
+    service = models.ForeignKey(
+        ProjectService,
+        on_delete=models.CASCADE,
+        related_name='dependencies'
+    )
+    depends_on = models.ForeignKey(
+        ProjectService,
+        on_delete=models.CASCADE,
+        related_name='dependents'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Service Dependency"
+        verbose_name_plural = "Service Dependencies"
+        unique_together = ['service', 'depends_on']
+        constraints = [
+            models.CheckConstraint(
+                check=~models.Q(service=models.F('depends_on')),
+                name='service_dependency_not_self'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.service.name} -> {self.depends_on.name}"
+
+
+class DeployedServiceState(models.Model):
+    """
+    What was last pushed to Railway for one service of a project.
+
+    Keyed by ``service_id`` rather than a FK so that a service deleted from
+    the canvas is still known to be deployed (and planned for deletion).
+    """
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='deployed_states'
+    )
+    service_id = models.CharField(
+        max_length=255,
+        help_text="Service identifier (e.g., service_1)"
+    )
+    railway_service_id = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text="Railway Service ID"
+    )
+    config_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the deployed service configuration"
+    )
+    deployed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Deployed Service State"
+        verbose_name_plural = "Deployed Service States"
+        unique_together = ['project', 'service_id']
+    
+    def __str__(self):
+        return f"{self.service_id} @ {self.config_hash[:12]}"
+
+
+# =============================================================================
+# USAGE - Resources allocated by project services (see accounts.usage)
+# =============================================================================
+
+class ProjectUsage(models.Model):
+    """Services, CPU and memory allocated in one project"""
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+    services = models.IntegerField(
+        default=0,
+        help_text="Number of services"
+    )
+    cpu = models.IntegerField(
+        default=0,
+        help_text="Total CPU allocation"
+    )
+    memory = models.IntegerField(
+        default=0,
+        help_text="Total memory in GB"
+    )
+    
+    objects = TenantManager()
+    unscoped = models.Manager()
+    tenant_field = 'project__organization'
+    
+    class Meta:
+        verbose_name = "Project Usage"
+        verbose_name_plural = "Project Usage"
+    
+    def __str__(self):
+        return f"{self.services} service(s), {self.cpu} CPU, {self.memory} GB"
+
+
+class UserUsage(models.Model):
+    """Services, CPU and memory allocated across the projects a user created"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+    services = models.IntegerField(
+        default=0,
+        help_text="Number of services"
+    )
+    cpu = models.IntegerField(
+        default=0,
+        help_text="Total CPU allocation"
+    )
+    memory = models.IntegerField(
+        default=0,
+        help_text="Total memory in GB"
+    )
+    
+    class Meta:
+        verbose_name = "User Usage"
+        verbose_name_plural = "User Usage"
+    
+    def __str__(self):
+        return f"{self.services} service(s), {self.cpu} CPU, {self.memory} GB"
+
+
+# =============================================================================
+# ARCHIVE - Soft-deleted Templates/Projects moved out of the hot tables
+# =============================================================================
+
+class ArchivedTemplate(models.Model):
+    """Snapshot of a soft-deleted Template and its services"""
+    original_id = models.BigIntegerField(
+        db_index=True,
+        help_text="ID the template had before archival"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_templates'
+    )
+    name = models.CharField(
+        max_length=255,
+        help_text="Template name"
+    )
+    data = models.JSONField(
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        help_text="Template fields and its services"
+    )
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Archived Template"
+        verbose_name_plural = "Archived Templates"
+        ordering = ['-archived_at']
+    
+    def __str__(self):
+        return f"{self.name} (archived)"
+
+
+class ArchivedProject(models.Model):
+    """Snapshot of a soft-deleted Project and its services"""
+    original_id = models.BigIntegerField(
+        db_index=True,
+        help_text="ID the project had before archival"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_projects'
+    )
+    name = models.CharField(
+        max_length=255,
+        help_text="Project name"
+    )
+    data = models.JSONField(
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        help_text="Project fields and its services"
+    )
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Archived Project"
+        verbose_name_plural = "Archived Projects"
+        ordering = ['-archived_at']
+    
+    def __str__(self):
+        return f"{self.name} (archived)"
+
+
+# =============================================================================
+# BACKGROUND TASKS - Progress of work run outside the request
+# =============================================================================
+
+class BackgroundTask(models.Model):
+    """
+    A job in the background queue (accounts.tasks) and its progress.
+    
+    Workers claim pending jobs by taking a lease, keep it alive with
+    heartbeats while the job runs, and put failed jobs back as pending with
+    a later ``run_after`` until ``max_attempts`` is reached.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(
+        max_length=255,
+        help_text="Task name"
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_tasks',
+        help_text="User who started the task"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        help_text="Task status"
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of items to process"
+    )
+    done = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of items processed"
+    )
+    message = models.TextField(
+        blank=True,
+        default='',
+        help_text="Result or error message"
+    )
+    func = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Dotted path of the function to run"
+    )
+    args = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Arguments passed to the function after the task"
+    )
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='background_tasks',
+        help_text="Organization the task runs in"
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        help_text="Higher priorities are claimed first"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of times a worker has started the task"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3,
+        help_text="Attempts before the task is marked failed"
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time a worker may start the task"
+    )
+    lease_owner = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Worker running the task"
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The task is handed to another worker if its lease is not renewed by then"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Background Task"
+        verbose_name_plural = "Background Tasks"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='task_claim_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='task_lease_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Percentage of items processed"""
+        if not self.total:
+            return 100 if self.status == 'completed' else 0
+        return min(100, round(self.done * 100 / self.total))
+    
+    def advance(self, count=1):
+        """Record ``count`` more processed items without a read-modify-write"""
+        BackgroundTask.objects.filter(pk=self.pk).update(done=models.F('done') + count)
 
 
 # =============================================================================
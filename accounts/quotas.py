@@ -0,0 +1,122 @@
+"""
+Per-plan limits on the resources users allocate: services per project, and
+CPU and memory across all the projects a user created.
+
+Limits are checked against the counters of accounts.usage, in the same
+statement that moves them: inside ``enforce(plan)`` a counter update becomes
+
+    UPDATE ... SET cpu = cpu + 8 WHERE user_id = ... AND cpu <= limit - 8
+
+and updating no row means the change does not fit. accounts.usage then
+raises QuotaExceeded, which rolls back the service write when the caller
+wraps it in a transaction (update_or_create, get_or_create and
+Template.publish do). Two concurrent autosaves cannot both take the last of
+a quota, and checking costs no COUNT or SUM: an autosave that does not grow
+cpu or memory still makes no usage query at all.
+
+Only growth is limited, so a user over a (lowered) limit can always shrink
+or delete services.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class Plan:
+    """Limits of a plan; None means unlimited"""
+
+    def __init__(self, name, services_per_project, cpu, memory):
+        self.name = name
+        self.services_per_project = services_per_project
+        self.cpu = cpu
+        self.memory = memory
+
+    def project_limits(self):
+        return {'services': self.services_per_project}
+
+    def user_limits(self):
+        return {'cpu': self.cpu, 'memory': self.memory}
+
+
+# User.plan values and their limits (cpu in vCPU, memory in GB)
+PLANS = {
+    'free': Plan('Free', services_per_project=10, cpu=64, memory=64),
+    'pro': Plan('Pro', services_per_project=50, cpu=512, memory=512),
+    'enterprise': Plan('Enterprise', services_per_project=None, cpu=None, memory=None),
+}
+
+DEFAULT_PLAN = 'free'
+
+# How each counter is named in messages
+RESOURCES = {
+    'services': ('services per project', ''),
+    'cpu': ('vCPU', ' vCPU'),
+    'memory': ('GB of memory', ' GB'),
+}
+
+
+class QuotaExceeded(ValueError):
+    """Raised when a change would take a counter past the plan's limit"""
+
+    def __init__(self, plan, resource, limit, used, requested):
+        self.plan = plan
+        self.resource = resource
+        self.limit = limit
+        self.used = used
+        self.requested = requested
+        label, unit = RESOURCES[resource]
+        super().__init__(
+            f'The {plan.name} plan allows {limit} {label}: {used}{unit} in use, '
+            f'this change needs {requested}{unit} more.'
+        )
+
+    def as_dict(self):
+        """The error for JSON responses, so the editor can point at the field"""
+        return {
+            'code': 'quota_exceeded',
+            'plan': self.plan.name,
+            'resource': self.resource,
+            'limit': self.limit,
+            'used': self.used,
+            'requested': self.requested,
+        }
+
+
+def plan_for(user):
+    return PLANS.get(user.plan, PLANS[DEFAULT_PLAN])
+
+
+def check(plan, limits, used, delta):
+    """Raise QuotaExceeded if adding ``delta`` to ``used`` goes past ``limits``"""
+    for resource, limit in limits.items():
+        if limit is not None and delta[resource] > 0 and used[resource] + delta[resource] > limit:
+            raise QuotaExceeded(plan, resource, limit, used[resource], delta[resource])
+
+
+def check_service(plan, cpu, memory, previous=(0, 0)):
+    """
+    Raise QuotaExceeded if one service, grown from its ``previous`` cpu and
+    memory, allocates more than the plan allows a user in total. Template
+    services are not counted, so this is all that can be checked before
+    Template.publish.
+    """
+    allocation = {'cpu': int(cpu or 0), 'memory': int(memory or 0)}
+    previous = dict(zip(allocation, (int(value or 0) for value in previous)))
+    grown = {resource: value if value > previous[resource] else 0 for resource, value in allocation.items()}
+    check(plan, plan.user_limits(), dict.fromkeys(allocation, 0), grown)
+
+
+_enforced_plan = ContextVar('enforced_plan', default=None)
+
+
+def enforced_plan():
+    return _enforced_plan.get()
+
+
+@contextmanager
+def enforce(plan):
+    """Apply ``plan`` (the project owner's) to the usage changes made inside the block"""
+    token = _enforced_plan.set(plan)
+    try:
+        yield plan
+    finally:
+        _enforced_plan.reset(token)
@@ -0,0 +1,150 @@
+"""
+Compile Railway's ``serializedConfig`` from service rows on the server.
+
+The payload has the same shape the editor JS used to assemble:
+
+    {"input": {"serializedConfig": {"services": {<service_id>: {...}}},
+               "workspaceId": ..., "templateId": ..., ...}}
+
+A template's compiled services are cached under its ID together with a
+version: the services' max ``updated_at`` and their count (so deletions are
+noticed too). A save that changes the version triggers an incremental
+recompile: only services whose ``updated_at`` moved are re-read and
+recompiled, the rest are reused from the cache.
+
+Compiled configs are cached, stored in ``Template.template_config`` and sent
+to the browser, so they leave registry credentials out; only the deploy call
+itself compiles them in (``compile_service(service, credentials=True)``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import TemplateService
+
+GIGABYTE = 1024 * 1024 * 1024
+
+# Columns compile_service reads
+CONFIG_FIELDS = (
+    'service_id', 'name', 'image', 'cpu', 'memory', 'variables', 'networking',
+)
+# ... and, for a deploy, these
+CREDENTIAL_FIELDS = ('registry_username', 'registry_password')
+
+
+def compile_service(service, credentials=False):
+    """
+    serializedConfig entry for a TemplateService/ProjectService (or a dict of
+    CONFIG_FIELDS); registry credentials only with ``credentials``
+    """
+    if not isinstance(service, dict):
+        fields = CONFIG_FIELDS + (CREDENTIAL_FIELDS if credentials else ())
+        service = {field: getattr(service, field) for field in fields}
+
+    config = {
+        'name': service.get('name') or 'New Service',
+        'source': {'image': service['image']} if service.get('image') else {},
+        'deploy': {
+            'limitOverride': {
+                'containers': {
+                    'cpu': service.get('cpu') or 8,
+                    'memoryBytes': (service.get('memory') or 8) * GIGABYTE
+                }
+            }
+        },
+        # The editors store only {'http': bool, 'tcp': bool}, no ports or
+        # domains, so like their JS this sends none
+        'networking': {
+            'tcpProxies': {},
+            'serviceDomains': {}
+        }
+    }
+
+    if credentials and service.get('registry_username') and service.get('registry_password'):
+        config['deploy']['registryCredentials'] = {
+            'username': service['registry_username'],
+            'password': service['registry_password']
+        }
+
+    variables = service.get('variables') or {}
+    if variables:
+        config['variables'] = {key: {'value': value} for key, value in variables.items()}
+    return config
+
+
+def cache_key(template_id):
+    # v2: compiled without registry credentials
+    return f'railway_config:v2:{template_id}'
+
+
+def _version(template):
+    version = TemplateService.objects.filter(template=template).aggregate(
+        latest=Max('updated_at'), count=Count('id')
+    )
+    return (version['latest'].isoformat() if version['latest'] else None, version['count'])
+
+
+def compile_template_services(template):
+    """
+    Return ``{service_id: config}`` for a template's services.
+
+    One aggregate query when the cached compile is current; otherwise one
+    more to list (id, updated_at) and one to load just the changed rows.
+    """
+    key = cache_key(template.pk)
+    version = _version(template)
+    cached = cache.get(key)
+    if cached is not None and cached['version'] == version:
+        return {service_id: config for service_id, (_, config) in cached['services'].items()}
+
+    previous = cached['services'] if cached is not None else {}
+    current = TemplateService.objects.filter(template=template).order_by('created_at', 'id').values_list(
+        'id', 'service_id', 'updated_at'
+    )
+
+    compiled = {}
+    stale = []
+    for pk, service_id, updated_at in current:
+        stamp = updated_at.isoformat()
+        entry = previous.get(service_id)
+        if entry is not None and entry[0] == stamp:
+            compiled[service_id] = entry
+        else:
+            compiled[service_id] = None
+            stale.append(pk)
+
+    if stale:
+        for row in TemplateService.objects.filter(pk__in=stale).values('updated_at', *CONFIG_FIELDS):
+            compiled[row['service_id']] = (row['updated_at'].isoformat(), compile_service(row))
+        # Rows deleted between the two queries
+        compiled = {service_id: entry for service_id, entry in compiled.items() if entry is not None}
+
+    cache.set(key, {'version': version, 'services': compiled}, settings.RAILWAY_CONFIG_CACHE_TIMEOUT)
+    return {service_id: config for service_id, (_, config) in compiled.items()}
+
+
+def template_input(template, workspace_id=None, services=None):
+    """The full ``{"input": ...}`` payload for a template"""
+    if services is None:
+        services = compile_template_services(template)
+    return {
+        'input': {
+            'serializedConfig': {
+                'services': services
+            },
+            'workspaceId': workspace_id,
+            'templateId': None,
+            'environmentId': None,
+            'projectId': None
+        }
+    }
+
+
+def services_with_credentials(template):
+    """``{service_id: bool}``: which services have registry credentials set"""
+    rows = TemplateService.objects.filter(template=template).values_list('service_id', *CREDENTIAL_FIELDS)
+    return {service_id: bool(username and password) for service_id, username, password in rows}
+
+
+def invalidate(template_id):
+    cache.delete(cache_key(template_id))
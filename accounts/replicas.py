@@ -0,0 +1,91 @@
+"""
+Read replicas of the default database for read-only views.
+
+Views decorated with ``replica_reads`` (and code inside ``use_replica()``)
+read tenant models from one of the DATABASE_REPLICAS aliases, chosen at
+random; accounts.routers.ReplicaRouter does the routing. Everything else,
+and every write, goes to the primary.
+
+Replicas lag behind the primary, so a user who just wrote must not be sent
+to one. ReplicaMiddleware records whether a request wrote anything and, if
+so, sets a cookie that keeps the user's reads on the primary for
+REPLICA_PIN_SECONDS. A cookie rather than the session: pinning must not
+cost another database write.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Cookie that keeps a user's reads on the primary after a write
+PIN_COOKIE = 'db_pin'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class RequestState:
+    """Whether the current request must read from the primary"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def begin_request(pinned):
+    """Start tracking writes for a request; returns a token for ``end_request``"""
+    state = RequestState(pinned)
+    return state, _request_state.set(state)
+
+
+def end_request(token):
+    _request_state.reset(token)
+
+
+def record_write():
+    state = _request_state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def reading_from_replica():
+    """True if reads should go to a replica right now"""
+    if not _replica_reads.get():
+        return False
+    state = _request_state.get()
+    return state is None or not (state.pinned or state.wrote)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def use_replica():
+    """Read tenant models from a replica (unless pinned) inside the block"""
+    if not settings.DATABASE_REPLICAS:
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view_func):
+    """Serve a read-only view (sync or async) from a replica"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            with use_replica():
+                return await view_func(request, *args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            with use_replica():
+                return view_func(request, *args, **kwargs)
+    return _wrapped_view
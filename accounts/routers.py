@@ -0,0 +1,106 @@
+"""
+Database routing for organizations placed on their own database.
+
+Users, organizations and memberships (the directory) live in ``default``.
+An organization's templates, projects and everything hanging off them live
+in the database named by ``Organization.database``; they are moved there
+with ``manage.py move_organization``, which also copies the directory rows
+they reference so foreign keys hold on every database.
+
+ReplicaRouter comes first and sends the reads of ``replica_reads`` views
+to a replica of ``default`` (see accounts.replicas).
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import replicas
+from .tenancy import get_current_organization
+
+# Models whose rows belong to an organization
+TENANT_MODELS = {
+    'template', 'templateservice', 'project', 'projectservice',
+    'servicedependency', 'deployedservicestate', 'projectusage',
+}
+DIRECTORY_MODELS = {'user', 'organization', 'membership'}
+
+
+def is_tenant_model(model):
+    return model._meta.app_label == 'accounts' and model._meta.model_name in TENANT_MODELS
+
+
+def tenant_databases():
+    """Aliases of every database holding tenant rows, ``default`` first"""
+    from .models import Organization
+
+    databases = set(Organization.objects.values_list('database', flat=True).distinct())
+    return ['default', *sorted(databases - {'default'})]
+
+
+class TenantRouter:
+    """
+    Route tenant models to the active organization's database.
+
+    Queries about a known instance stay on the database it came from;
+    without an active organization they go to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_tenant_model(model):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        organization = get_current_organization()
+        if organization is not None:
+            return organization.database
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Directory rows exist on every database a tenant lives on
+        if any(obj._meta.app_label == 'accounts' and obj._meta.model_name in DIRECTORY_MODELS
+               for obj in (obj1, obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every database gets the full schema
+        return None
+
+
+class ReplicaRouter:
+    """
+    Send tenant-model reads to a replica while accounts.replicas says so.
+
+    Only organizations on ``default`` are replicated. Reads inside a
+    transaction, and lookups through an instance (related managers), stay
+    where they are; writes always go to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replicas.reading_from_replica() or not is_tenant_model(model):
+            return None
+        if hints.get('instance') is not None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        organization = get_current_organization()
+        if organization is not None and organization.database != DEFAULT_DB_ALIAS:
+            return None
+        return replicas.choose_replica()
+
+    def db_for_write(self, model, **hints):
+        replicas.record_write()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A replica holds the same rows as the primary
+        pool = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,151 @@
+"""
+Move an organization's templates, projects and their services to another database.
+
+The target database needs the full schema (``migrate --database <alias>``).
+The directory rows the moved rows reference (the organization, its
+memberships and the users involved) are copied along, so foreign keys hold
+on the target. Rows keep their primary keys; if one is already taken on the
+target (rows created there since an earlier move) the move is rolled back.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import (
+    DeployedServiceState, Membership, Organization, Project, ProjectService,
+    ServiceDependency, Template, TemplateService,
+)
+from .signals import rows_bulk_created
+
+# (record type, model, lookup to the organization), in insert order
+TENANT_TABLES = [
+    ('template', Template, 'organization'),
+    ('template_service', TemplateService, 'template__organization'),
+    ('project', Project, 'organization'),
+    ('project_service', ProjectService, 'project__organization'),
+    ('service_dependency', ServiceDependency, 'service__project__organization'),
+    ('deployed_state', DeployedServiceState, 'project__organization'),
+]
+
+
+# Links to rows of another organization (a template shared with it) are
+# dropped: record type -> (foreign key, linked model, lookup to the organization)
+OPTIONAL_LINKS = {
+    'project': ('source_template', Template, 'organization'),
+    'project_service': ('source_service', TemplateService, 'template__organization'),
+}
+
+
+class ShardingError(ValueError):
+    """Raised when an organization cannot be moved"""
+
+
+def _upsert(model, target, objs):
+    """Insert ``objs`` on ``target``, refreshing rows that already have their pk"""
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    model._base_manager.using(target).bulk_create(
+        objs, update_conflicts=True, unique_fields=['pk'], update_fields=fields
+    )
+
+
+def _batches(queryset, batch_size):
+    """Yield the rows of ``queryset`` in primary-key order, ``batch_size`` at a time"""
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def _drop_unmoved_links(record_type, batch, organization, source):
+    if record_type not in OPTIONAL_LINKS:
+        return
+    field, model, lookup = OPTIONAL_LINKS[record_type]
+    attname = f'{field}_id'
+    linked = {getattr(obj, attname) for obj in batch} - {None}
+    moved = set(
+        model._base_manager.using(source).filter(pk__in=linked, **{lookup: organization}).values_list('pk', flat=True)
+    )
+    for obj in batch:
+        if getattr(obj, attname) not in moved:
+            setattr(obj, attname, None)
+
+
+def _copy_directory(organization, target, user_ids):
+    User = get_user_model()
+    user_ids = set(user_ids) | {organization.owner_id}
+    memberships = list(Membership.objects.using('default').filter(organization=organization))
+    user_ids |= {membership.user_id for membership in memberships}
+    users = list(User.objects.using('default').filter(pk__in=user_ids))
+
+    # A row left on the target by a since-deleted user or organization would
+    # block the copy through a unique column (username, slug)
+    stale = User.objects.using(target).filter(
+        Q(username__in=[user.username for user in users]) | Q(email__in=[user.email for user in users if user.email])
+    ).exclude(pk__in=user_ids)
+    stale_orgs = Organization.objects.using(target).filter(slug=organization.slug).exclude(pk=organization.pk)
+    if stale.exists() or stale_orgs.exists():
+        raise ShardingError(
+            f'{target!r} has stale users or organizations clashing with {organization}: '
+            f'{", ".join(map(str, list(stale) + list(stale_orgs)))}'
+        )
+
+    _upsert(User, target, users)
+    _upsert(Organization, target, [organization])
+    Membership.objects.using(target).bulk_create(memberships, ignore_conflicts=True)
+
+
+def move_organization(organization, target, batch_size=500):
+    """
+    Copy ``organization``'s rows to the ``target`` database alias, delete them
+    from the current one and point ``organization.database`` at ``target``.
+
+    Every table is copied and deleted ``batch_size`` rows at a time, so memory
+    use does not grow with the size of the organization.
+
+    Returns a dict of moved row counts per record type.
+    """
+    source = organization.database
+    if target not in connections.databases:
+        raise ShardingError(f'Unknown database {target!r}; add it to TENANT_DATABASES')
+    if target == source:
+        raise ShardingError(f'{organization} is already on {target!r}')
+
+    counts = {}
+    with transaction.atomic(using=target), transaction.atomic(using=source):
+        user_ids = set()
+        for model in (Template, Project):
+            user_ids.update(
+                model.unscoped.using(source).filter(organization=organization)
+                .values_list('user_id', flat=True).distinct()
+            )
+        _copy_directory(organization, target, user_ids)
+
+        for record_type, model, lookup in TENANT_TABLES:
+            counts[record_type] = 0
+            rows = model._base_manager.using(source).filter(**{lookup: organization})
+            for batch in _batches(rows, batch_size):
+                _drop_unmoved_links(record_type, batch, organization, source)
+                model._base_manager.using(target).bulk_create(batch)
+                counts[record_type] += len(batch)
+
+        # Services, dependencies and deploy states cascade
+        for model in (Project, Template):
+            rows = model.unscoped.using(source).filter(organization=organization)
+            while True:
+                batch_ids = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not batch_ids:
+                    break
+                model.unscoped.using(source).filter(pk__in=batch_ids).delete()
+
+        organization.database = target
+        organization.save(using='default', update_fields=['database'])
+
+        # The deletes above fired post_delete; re-announce the rows on their new database
+        for record_type, model, lookup in TENANT_TABLES:
+            rows = model._base_manager.using(target).filter(**{lookup: organization})
+            for batch in _batches(rows, batch_size):
+                rows_bulk_created.send(sender=model, instances=batch)
+    return counts
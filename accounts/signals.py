@@ -0,0 +1,66 @@
+"""
+Signal handlers for the accounts app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import tenancy, usage
+from .image_catalog import record_image
+from .models import Organization, ProjectService, RailwaySettings, TemplateService, User
+
+# Sent after rows are inserted with bulk_create, which skips post_save.
+# Arguments: sender (the model class), instances (the created objects)
+rows_bulk_created = Signal()
+
+
+@receiver(post_save, sender=User)
+def create_personal_organization(sender, instance, created, raw=False, **kwargs):
+    """Give every new user their personal organization before their first request"""
+    if created and not raw:
+        Organization.objects.personal_for(instance)
+
+
+@receiver(post_save, sender=RailwaySettings)
+@receiver(post_delete, sender=RailwaySettings)
+def invalidate_railway_settings_cache(sender, instance, **kwargs):
+    """Drop the cached settings so the next lookup sees the saved row"""
+    RailwaySettings.objects.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=TemplateService)
+@receiver(post_save, sender=ProjectService)
+def add_image_to_catalog(sender, instance, created, raw=False, **kwargs):
+    """New images become suggestions in this process right away"""
+    if not raw:
+        record_image(instance.image, created, _active_organization_id())
+
+
+@receiver(rows_bulk_created, sender=TemplateService)
+@receiver(rows_bulk_created, sender=ProjectService)
+def add_bulk_images_to_catalog(sender, instances, **kwargs):
+    organization_id = _active_organization_id()
+    for instance in instances:
+        record_image(instance.image, True, organization_id)
+
+
+def _active_organization_id():
+    # Saves outside a request or task leave private images to the next reload
+    organization = tenancy.get_current_organization()
+    return organization.pk if organization is not None else None
+
+
+@receiver(post_save, sender=ProjectService)
+def count_saved_service(sender, instance, created, raw=False, **kwargs):
+    """Keep ProjectUsage/UserUsage in step with the service's allocation"""
+    if not raw:
+        usage.service_saved(instance, created)
+
+
+@receiver(post_delete, sender=ProjectService)
+def uncount_deleted_service(sender, instance, **kwargs):
+    usage.service_deleted(instance)
+
+
+@receiver(rows_bulk_created, sender=ProjectService)
+def count_bulk_services(sender, instances, **kwargs):
+    usage.services_created(instances)
@@ -0,0 +1,356 @@
+"""
+Database-backed queue for slow work; jobs and their progress are BackgroundTask rows.
+
+``enqueue`` stores a job: the dotted path of a function, its JSON
+arguments, a priority and the organization it runs in. Workers claim jobs
+with a lease: the BACKGROUND_TASK_WORKERS threads of each web process, and
+any number of ``python manage.py run_worker`` processes on other nodes.
+
+* Claiming: on Postgres the candidates are read with ``SELECT ... FOR
+  UPDATE SKIP LOCKED`` so workers never wait on each other. Every database
+  then confirms the claim with a conditional UPDATE (still pending, same
+  attempt count), which is what keeps two SQLite workers from taking the
+  same job.
+* Leases: a worker renews the leases of its running jobs three times per
+  BACKGROUND_TASK_LEASE_SECONDS. When a lease runs out (the worker died)
+  the job goes back to the queue, or fails if it is out of attempts.
+* Retries: a job that raises runs again after an exponential backoff
+  until it has had ``max_attempts`` attempts.
+* Order: higher priorities first; within a priority, users with fewer
+  running jobs first. No user has more than BACKGROUND_TASK_USER_CONCURRENCY
+  jobs running at once, so one user's bulk action cannot hold every worker.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.logstore import compact_logs
+
+from . import tenancy
+from .archival import archive_batch
+from .models import BackgroundTask, Template
+from .quotas import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+# Queued jobs considered per claim; fairness reorders within this window
+CLAIM_WINDOW = 20
+
+
+def task_path(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(name, func, *args, total=0, user=None, organization=None, priority=0, max_attempts=None):
+    """
+    Queue ``func(task, *args)`` as a BackgroundTask and return the task.
+
+    ``func`` must be a module-level function and ``args`` JSON-serializable.
+    It reports progress with ``task.advance()`` and may return a result
+    message. Workers see the job once the current transaction commits. With
+    ``organization`` it runs with that organization active (accounts.tenancy),
+    so its queries are scoped and routed like the request's were. Jobs that
+    are not safe to run twice should pass ``max_attempts=1``.
+    """
+    task = BackgroundTask.objects.create(
+        name=name,
+        total=total,
+        user=user,
+        organization=organization,
+        func=task_path(func),
+        args=list(args),
+        priority=priority,
+        max_attempts=max_attempts or settings.BACKGROUND_TASK_MAX_ATTEMPTS
+    )
+    transaction.on_commit(wake_local_worker)
+    return task
+
+
+# =============================================================================
+# CLAIMING AND LEASES
+# =============================================================================
+
+def _lease_expiry(now):
+    return now + timedelta(seconds=settings.BACKGROUND_TASK_LEASE_SECONDS)
+
+
+def _running_jobs():
+    """Jobs running for the user of the row being filtered or updated"""
+    return Coalesce(Subquery(
+        BackgroundTask.objects.filter(status='running', user=OuterRef('user'))
+        .values('user').annotate(jobs=Count('pk')).values('jobs')
+    ), 0)
+
+
+def _under_user_limit():
+    return Q(user__isnull=True) | LessThan(_running_jobs(), settings.BACKGROUND_TASK_USER_CONCURRENCY)
+
+
+def _take(worker_id, candidates, now):
+    # Stable sort: within a priority, least busy users first, then queue order
+    for task in sorted(candidates, key=lambda task: (-task.priority, task.running_jobs)):
+        # Checking the user's running jobs again here keeps two workers from
+        # both taking a user's last free slot
+        claimed = BackgroundTask.objects.filter(
+            _under_user_limit(), pk=task.pk, status='pending', attempts=task.attempts
+        ).update(
+            status='running',
+            attempts=F('attempts') + 1,
+            lease_owner=worker_id,
+            lease_expires_at=_lease_expiry(now),
+            started_at=now
+        )
+        if claimed:
+            return task.pk
+    return None
+
+
+def claim(worker_id):
+    """Lease the next runnable job to ``worker_id``; returns it or None"""
+    now = timezone.now()
+    # Running jobs are counted per candidate, so only their users' are read
+    candidates = (
+        BackgroundTask.objects.filter(status='pending', run_after__lte=now)
+        .annotate(running_jobs=_running_jobs())
+        .filter(Q(user__isnull=True) | Q(running_jobs__lt=settings.BACKGROUND_TASK_USER_CONCURRENCY))
+        .order_by('-priority', 'run_after', 'pk')
+        .only('pk', 'user_id', 'priority', 'attempts')
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task_id = _take(worker_id, candidates.select_for_update(skip_locked=True)[:CLAIM_WINDOW], now)
+    else:
+        # SQLite: no row locks; the conditional UPDATE alone decides the race
+        task_id = _take(worker_id, candidates[:CLAIM_WINDOW], now)
+
+    if task_id is None:
+        return None
+    return BackgroundTask.objects.select_related('organization').get(pk=task_id)
+
+
+def renew_leases(worker_id):
+    """Heartbeat: extend the leases of every job ``worker_id`` is running"""
+    return BackgroundTask.objects.filter(status='running', lease_owner=worker_id).update(
+        lease_expires_at=_lease_expiry(timezone.now())
+    )
+
+
+def requeue_expired():
+    """Hand jobs whose worker stopped heartbeating back to the queue (or fail them)"""
+    now = timezone.now()
+    expired = BackgroundTask.objects.filter(status='running', lease_expires_at__lt=now)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', message='The worker running this task stopped responding.',
+        finished_at=now, lease_owner='', lease_expires_at=None
+    )
+    requeued = expired.filter(attempts__lt=F('max_attempts')).update(
+        status='pending', run_after=now, done=0, lease_owner='', lease_expires_at=None
+    )
+    return failed, requeued
+
+
+def retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: exponential, capped, with jitter"""
+    delay = min(
+        settings.BACKGROUND_TASK_RETRY_MAX_DELAY,
+        settings.BACKGROUND_TASK_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+    # Jitter spreads out the retries of jobs that failed together
+    return delay * random.uniform(0.5, 1)
+
+
+def run_task(task, worker_id):
+    """Run a claimed job and record the outcome, if ``worker_id`` still holds it"""
+    close_old_connections()
+    token = tenancy.activate(task.organization)
+    # Updates only apply while the lease is ours: a job handed to another
+    # worker after an expired lease is that worker's to finish
+    owned = BackgroundTask.objects.filter(pk=task.pk, status='running', lease_owner=worker_id)
+    try:
+        message = import_string(task.func)(task, *task.args) or ''
+    except Exception as e:
+        now = timezone.now()
+        if task.attempts < task.max_attempts:
+            logger.warning('Background task %s failed (attempt %s), retrying', task.pk, task.attempts, exc_info=True)
+            owned.update(
+                status='pending', message=f'Attempt {task.attempts} failed: {e}', done=0,
+                run_after=now + timedelta(seconds=retry_delay(task.attempts)),
+                lease_owner='', lease_expires_at=None
+            )
+        else:
+            logger.exception('Background task %s failed', task.pk)
+            owned.update(status='failed', message=str(e), finished_at=now, lease_owner='', lease_expires_at=None)
+    else:
+        owned.update(
+            status='completed', message=message, finished_at=timezone.now(),
+            lease_owner='', lease_expires_at=None
+        )
+    finally:
+        tenancy.deactivate(token)
+        close_old_connections()
+
+
+# =============================================================================
+# WORKERS
+# =============================================================================
+
+class Worker:
+    """
+    Claims and runs jobs on ``threads`` threads until stopped.
+
+    A heartbeat thread renews the leases of the jobs being run, requeues
+    the jobs of workers that died and queues periodic jobs that are due.
+    With ``burst`` each thread exits once the queue has nothing for it.
+    """
+
+    def __init__(self, threads=1, name=None, burst=False):
+        self.threads = threads
+        self.burst = burst
+        self.id = f'{name or socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event()
+        self.workers = []
+
+    def start(self):
+        for index in range(self.threads):
+            thread = threading.Thread(target=self.work, name=f'background-task-{index}', daemon=True)
+            thread.start()
+            self.workers.append(thread)
+        threading.Thread(target=self.heartbeat, name='background-task-heartbeat', daemon=True).start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self):
+        """Let running jobs finish, then stop"""
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.workers:
+            thread.join()
+        self.stopped.set()
+
+    def run(self):
+        """Work in the foreground until SIGINT/SIGTERM (or, in burst mode, an empty queue)"""
+        global _local_worker
+        with _local_worker_lock:
+            # Jobs this process queues (e.g. periodic ones) wake these threads
+            if _local_worker is None:
+                _local_worker = self
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stopping.set())
+        self.start()
+        while not self.stopping.is_set() and any(thread.is_alive() for thread in self.workers):
+            self.stopping.wait(1)
+        self.stop()
+
+    def work(self):
+        while not self.stopping.is_set():
+            try:
+                task = claim(self.id)
+            except Exception:
+                logger.exception('Claiming a background task failed')
+                task = None
+            if task is not None:
+                run_task(task, self.id)
+                continue
+            close_old_connections()
+            if self.burst:
+                return
+            self.wakeup.wait(settings.BACKGROUND_TASK_POLL_INTERVAL)
+            self.wakeup.clear()
+
+    def heartbeat(self):
+        interval = settings.BACKGROUND_TASK_LEASE_SECONDS / 3
+        while not self.stopped.wait(interval):
+            try:
+                renew_leases(self.id)
+                requeue_expired()
+                schedule_periodic()
+            except Exception:
+                logger.exception('Background task heartbeat failed')
+            finally:
+                close_old_connections()
+
+
+_local_worker = None
+_local_worker_lock = threading.Lock()
+
+
+def wake_local_worker():
+    """Start this process's worker threads on first use and nudge them"""
+    global _local_worker
+    if settings.BACKGROUND_TASK_WORKERS <= 0:
+        return
+    with _local_worker_lock:
+        if _local_worker is None:
+            _local_worker = Worker(threads=settings.BACKGROUND_TASK_WORKERS, name='web')
+            _local_worker.start()
+    _local_worker.wake()
+
+
+# =============================================================================
+# PERIODIC JOBS
+# =============================================================================
+
+def schedule_periodic():
+    """Queue deployment log retention unless it ran or was queued in the last DEPLOY_LOG_COMPACT_INTERVAL"""
+    recent = timezone.now() - timedelta(seconds=settings.DEPLOY_LOG_COMPACT_INTERVAL)
+    due = not BackgroundTask.objects.filter(
+        Q(status__in=('pending', 'running')) | Q(created_at__gte=recent),
+        func=task_path(compact_deploy_logs)
+    ).exists()
+    if due:
+        # Heartbeats of several workers may race here; a second run finds nothing to do
+        return enqueue('Compact deployment logs', compact_deploy_logs, priority=-1, max_attempts=1)
+    return None
+
+
+# =============================================================================
+# TASKS
+# =============================================================================
+
+def publish_templates(task, template_ids):
+    """Publish each unpublished template, one transaction per template"""
+    published = 0
+    over_quota = []
+    for template in Template.objects.filter(pk__in=template_ids).select_related('user').iterator():
+        if not template.is_published:
+            try:
+                template.publish()
+                published += 1
+            except QuotaExceeded as e:
+                over_quota.append(f"{template.name}: {e}")
+        task.advance()
+    message = f"{published} template(s) published."
+    if over_quota:
+        message += f" Not published, over quota: {'; '.join(over_quota)}"
+    return message
+
+
+def archive_templates(task, template_ids):
+    """Archive soft-deleted templates (and cascade to their services)"""
+    archived = archive_batch('template', batch_size=len(template_ids), ids=template_ids)
+    task.advance(archived)
+    return f"{archived} template(s) archived."
+
+
+def compact_deploy_logs(task):
+    """Apply deployment log retention (core.logstore.compact_logs)"""
+    deleted, freed = compact_logs()
+    return f"Deleted {deleted} log(s), freed {freed / 1024 / 1024:.1f} MB."
@@ -0,0 +1,75 @@
+"""
+Organization (tenant) scoping for templates, projects and their services.
+
+The active organization lives in a context variable set per request by
+accounts.middleware.OrganizationMiddleware (and by ``use_organization`` in
+commands and tasks). While one is active:
+
+* the ``objects`` manager of every tenant model only returns that
+  organization's rows (``unscoped`` bypasses it, e.g. for admin and
+  maintenance jobs);
+* accounts.routers.TenantRouter sends the queries to the organization's
+  database.
+
+With none active (management commands, background tasks, migrations)
+``objects`` is not filtered, so existing maintenance code sees every row.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+
+_current_organization = ContextVar('current_organization', default=None)
+
+
+def get_current_organization():
+    return _current_organization.get()
+
+
+def activate(organization):
+    """Make ``organization`` the active tenant; returns a token for ``deactivate``"""
+    return _current_organization.set(organization)
+
+
+def deactivate(token):
+    _current_organization.reset(token)
+
+
+@contextmanager
+def use_organization(organization):
+    token = activate(organization)
+    try:
+        yield organization
+    finally:
+        deactivate(token)
+
+
+def iterate_in_organization(organization, iterable):
+    """
+    Iterate ``iterable`` with ``organization`` active, for streaming
+    responses whose body is produced after the middleware has returned
+    """
+    with use_organization(organization):
+        yield from iterable
+
+
+class TenantQuerySet(models.QuerySet):
+    def for_organization(self, organization):
+        """Rows owned by ``organization`` (an Organization or its pk)"""
+        return self.filter(**{self.model.tenant_field: organization})
+
+
+class TenantManager(models.Manager.from_queryset(TenantQuerySet)):
+    """
+    Default manager of tenant models: scoped to the active organization.
+
+    The model names the path to its organization in ``tenant_field``
+    (``'organization'`` or e.g. ``'project__organization'``).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        organization = get_current_organization()
+        if organization is not None:
+            queryset = queryset.for_organization(organization)
+        return queryset
@@ -0,0 +1,206 @@
+"""
+NDJSON export and import of a user's Template/Project graph.
+
+The export is one JSON object per line, parents before children:
+
+    {"type": "template", "id": 1, "name": ...}
+    {"type": "template_service", "id": 7, "template_id": 1, ...}
+    {"type": "project", "id": 3, "source_template_id": 1, ...}
+    {"type": "project_service", "id": 9, "project_id": 3, "source_service_id": 7, ...}
+    {"type": "service_dependency", "id": 2, "service_id": 9, "depends_on_id": 10}
+
+Both directions stream: rows are read with ``.iterator(chunk_size=...)`` and
+written as lines, and the importer consumes lines one at a time, inserting
+with batched ``bulk_create`` and remapping the exported IDs to the new ones.
+
+Registry passwords are never exported (nor read from an import), so they
+have to be entered again after importing. Imported services count towards
+the user's plan like any others: the import fails with QuotaExceeded, and
+creates nothing, if they do not fit (accounts.quotas).
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+
+from .config_schema import TemplateConfigError, validate_template_config
+from .models import Project, ProjectService, ServiceDependency, Template, TemplateService, default_organization
+from .quotas import check_service, enforce, plan_for
+from .signals import rows_bulk_created
+
+TEMPLATE_FIELDS = ('name', 'description', 'template_config', 'is_active', 'is_published')
+SERVICE_FIELDS = (
+    'service_id', 'name', 'image', 'registry_username', 'registry_password',
+    'cpu', 'memory', 'variables', 'networking', 'position_x', 'position_y',
+)
+PROJECT_FIELDS = (
+    'name', 'description', 'railway_project_id', 'railway_environment_id',
+    'status', 'is_active', 'deployed_at',
+)
+PROJECT_SERVICE_FIELDS = SERVICE_FIELDS + (
+    'railway_service_id', 'railway_deployment_id', 'status', 'public_url', 'deployed_at',
+)
+
+# Kept by accounts.archival, but left out of exports and imports
+REDACTED_FIELDS = ('registry_password',)
+
+
+def _exported(fields):
+    return tuple(field for field in fields if field not in REDACTED_FIELDS)
+
+
+# (record type, model, foreign keys exported as "<name>_id", exported fields)
+RECORD_TYPES = (
+    ('template', Template, (), TEMPLATE_FIELDS),
+    ('template_service', TemplateService, ('template',), _exported(SERVICE_FIELDS)),
+    ('project', Project, ('source_template',), PROJECT_FIELDS),
+    ('project_service', ProjectService, ('project', 'source_service'), _exported(PROJECT_SERVICE_FIELDS)),
+    ('service_dependency', ServiceDependency, ('service', 'depends_on'), ()),
+)
+
+# Which record type each foreign key points at
+FOREIGN_KEY_TYPES = {
+    'template': 'template',
+    'source_template': 'template',
+    'project': 'project',
+    'source_service': 'template_service',
+    'service': 'project_service',
+    'depends_on': 'project_service',
+}
+
+# Foreign keys a record cannot exist without
+REQUIRED_FOREIGN_KEYS = {'template', 'project', 'service', 'depends_on'}
+
+
+class TransferError(ValueError):
+    """Raised for malformed or inconsistent import data"""
+
+
+def _owned_rows(model, user):
+    if model is Template or model is Project:
+        return model.objects.filter(user=user)
+    if model is TemplateService:
+        return model.objects.filter(template__user=user)
+    if model is ServiceDependency:
+        return model.objects.filter(service__project__user=user)
+    return model.objects.filter(project__user=user)
+
+
+def export_user_data(user, chunk_size=2000):
+    """Yield the user's templates, projects and their services as NDJSON lines"""
+    encoder = DjangoJSONEncoder()
+    for record_type, model, foreign_keys, fields in RECORD_TYPES:
+        columns = ('id',) + tuple(f'{fk}_id' for fk in foreign_keys) + fields
+        rows = _owned_rows(model, user).order_by('id').values(*columns)
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield encoder.encode({'type': record_type, **row}) + '\n'
+
+
+class AccountImporter:
+    """
+    Incrementally import exported records for ``user`` into ``organization``
+    (default: the active organization, else the user's personal one).
+
+    Records are buffered per type and flushed with ``bulk_create`` once a
+    buffer reaches ``batch_size`` (and before any dependent type is flushed),
+    so memory is bounded by the batch size plus the old-to-new ID maps.
+    """
+
+    def __init__(self, user, batch_size=1000, organization=None):
+        self.user = user
+        self.plan = plan_for(user)
+        self.organization = organization or default_organization(user)
+        self.batch_size = batch_size
+        self.buffers = {record_type: [] for record_type, *_ in RECORD_TYPES}
+        self.id_maps = {record_type: {} for record_type, *_ in RECORD_TYPES}
+        self.counts = {record_type: 0 for record_type, *_ in RECORD_TYPES}
+        self.specs = {spec[0]: spec for spec in RECORD_TYPES}
+
+    def feed_line(self, line, line_number=None):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise TransferError(f'Line {line_number}: invalid JSON ({e})')
+        self.feed(record, line_number)
+
+    def feed(self, record, line_number=None):
+        record_type = record.get('type') if isinstance(record, dict) else None
+        if record_type not in self.specs:
+            raise TransferError(f'Line {line_number}: unknown record type {record_type!r}')
+        if 'id' not in record:
+            raise TransferError(f'Line {line_number}: {record_type} record has no id')
+
+        if record_type == 'template':
+            try:
+                validate_template_config(record.get('template_config', {}))
+            except TemplateConfigError as e:
+                raise TransferError(f'Line {line_number}: template {record["id"]} has an invalid config at {e}')
+        elif record_type in ('template_service', 'project_service'):
+            # Project services are also counted as they are created; template
+            # services only have this check, as in the editor
+            check_service(self.plan, record.get('cpu'), record.get('memory'))
+
+        buffer = self.buffers[record_type]
+        buffer.append(record)
+        if len(buffer) >= self.batch_size:
+            self.flush(record_type)
+
+    def flush(self, record_type):
+        buffer = self.buffers[record_type]
+        if not buffer:
+            return
+        _, model, foreign_keys, fields = self.specs[record_type]
+
+        # Parents must have their new IDs before children reference them
+        for fk in foreign_keys:
+            self.flush(FOREIGN_KEY_TYPES[fk])
+
+        objects = []
+        for record in buffer:
+            values = {field: record[field] for field in fields if field in record}
+            if model is Template or model is Project:
+                values['user'] = self.user
+                values['organization'] = self.organization
+            for fk in foreign_keys:
+                old_id = record.get(f'{fk}_id')
+                new_id = self.id_maps[FOREIGN_KEY_TYPES[fk]].get(old_id)
+                if new_id is None and fk in REQUIRED_FOREIGN_KEYS:
+                    raise TransferError(
+                        f'{record_type} {record["id"]} references unknown {fk} {old_id}'
+                    )
+                # Optional links to rows outside the import are dropped
+                values[f'{fk}_id'] = new_id
+            objects.append(model(**values))
+
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        rows_bulk_created.send(sender=model, instances=created)
+        id_map = self.id_maps[record_type]
+        for record, obj in zip(buffer, created):
+            id_map[record['id']] = obj.pk
+        self.counts[record_type] += len(created)
+        buffer.clear()
+
+    def finish(self):
+        for record_type, *_ in RECORD_TYPES:
+            self.flush(record_type)
+        return dict(self.counts)
+
+
+def import_user_data(user, lines, batch_size=1000):
+    """
+    Import NDJSON ``lines`` (any iterable of str/bytes) for ``user`` atomically.
+
+    Returns a dict of created row counts per record type. Raises
+    TransferError for bad data and QuotaExceeded if the services do not fit
+    the user's plan; either way nothing is imported.
+    """
+    importer = AccountImporter(user, batch_size=batch_size)
+    with transaction.atomic(using=router.db_for_write(Template)), enforce(importer.plan):
+        for line_number, line in enumerate(lines, start=1):
+            importer.feed_line(line, line_number)
+        return importer.finish()
@@ -14,6 +14,11 @@ urlpatterns = [
     path('service/create/', views.create_service, name='create_service'),
     path('service/update/', views.update_service, name='update_service'),
     path('service/validate-image/', views.validate_docker_image, name='validate_docker_image'),
+    path('service/images/', views.suggest_images, name='suggest_images'),
     path('template/<int:template_id>/services/', views.get_services, name='get_services'),
+    path('template/<int:template_id>/config/', views.get_template_config, name='get_template_config'),
+    path('organization/<int:organization_id>/switch/', views.switch_organization, name='switch_organization'),
+    path('account/export/', views.export_data, name='export_data'),
+    path('account/import/', views.import_data, name='import_data'),
 ]
 
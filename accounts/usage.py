@@ -0,0 +1,189 @@
+"""
+Materialized resource usage: the services, CPU and memory allocated in each
+project (ProjectUsage) and by each user across the projects they created
+(UserUsage).
+
+accounts.signals keeps the counters up to date from every ProjectService
+write: a new service adds its allocation, an edit adds the difference to
+what was loaded (ProjectService.from_db remembers it), a delete subtracts
+it, and ``rows_bulk_created`` covers publish and imports. Each change is an
+``UPDATE ... SET cpu = cpu + delta`` of one row per table, so reading usage
+is a primary-key lookup instead of a SUM over the services; an edit that
+leaves cpu and memory alone (most autosaves) costs nothing.
+
+Counter updates also enforce plan limits; see accounts.quotas.
+
+Writes that bypass the model (``QuerySet.update`` of cpu/memory, raw SQL)
+are not seen; ``python manage.py repair_usage`` recomputes every counter
+from the service tables.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Sum
+
+from . import quotas
+from .models import Project, ProjectService, ProjectUsage, UserUsage
+from .routers import tenant_databases
+
+COUNTERS = ('services', 'cpu', 'memory')
+
+
+def _project_owner(service):
+    # Views load services with select_related('project'); the rest cost a lookup
+    if ProjectService.project.is_cached(service) and service.project is not None:
+        return service.project.user_id
+    return (
+        Project.unscoped.using(service._state.db)
+        .filter(pk=service.project_id).values_list('user_id', flat=True).first()
+    )
+
+
+def _add(model, database, key, delta, create, plan=None, limits=None):
+    """
+    Add ``delta`` to a counter row; with ``create`` the row is created if
+    missing. Counters given in ``limits`` may only grow up to them: the
+    update is conditional, and QuotaExceeded is raised if it does not fit.
+    """
+    manager = model._base_manager.db_manager(database)
+    changes = {counter: F(counter) + value for counter, value in delta.items()}
+    limits = {
+        counter: limit for counter, limit in (limits or {}).items()
+        if limit is not None and delta[counter] > 0
+    }
+    conditions = {f'{counter}__lte': limit - delta[counter] for counter, limit in limits.items()}
+    while True:
+        if manager.filter(pk=key, **conditions).update(**changes):
+            return
+        if not (create or limits):
+            return
+        used = manager.filter(pk=key).values(*COUNTERS).first()
+        if used is not None:
+            # Either over the limit, or freed up since the update: try again
+            quotas.check(plan, limits, used, delta)
+            continue
+        if not create:
+            return
+        quotas.check(plan, limits, dict.fromkeys(COUNTERS, 0), delta)
+        try:
+            with transaction.atomic(using=database):
+                manager.create(**{model._meta.pk.attname: key}, **delta)
+            return
+        except IntegrityError:
+            # Created by a concurrent write in the meantime
+            continue
+
+
+def add_usage(database, project_id, user_id, services, cpu, memory):
+    """
+    Add a change in allocation to the project's and the user's counters,
+    within the limits of the plan being enforced (see accounts.quotas)
+    """
+    if not (services or cpu or memory):
+        return
+    delta = dict(zip(COUNTERS, (services, cpu, memory)))
+    plan = quotas.enforced_plan()
+    # Decrements never create rows: a cascade may already have deleted them
+    create = services > 0 or cpu > 0 or memory > 0
+    # The project row lives on the service's database, so it goes first: a
+    # user over quota rolls it back along with the service write
+    _add(ProjectUsage, database, project_id, delta, create, plan, plan and plan.project_limits())
+    if user_id is not None:
+        _add(UserUsage, router.db_for_write(UserUsage), user_id, delta, create, plan, plan and plan.user_limits())
+
+
+def _allocation(service):
+    return int(service.cpu or 0), int(service.memory or 0)
+
+
+def service_saved(service, created):
+    """post_save of a ProjectService"""
+    database = service._state.db
+    cpu, memory = _allocation(service)
+    counted = getattr(service, '_counted_usage', None)
+    if created:
+        delta = (1, cpu, memory)
+    elif counted and None not in counted:
+        delta = (0, cpu - int(counted[0]), memory - int(counted[1]))
+    else:
+        # cpu/memory were deferred when the row was loaded; repair_usage catches up
+        service._counted_usage = (cpu, memory)
+        return
+    if any(delta):
+        add_usage(database, service.project_id, _project_owner(service), *delta)
+    service._counted_usage = (cpu, memory)
+
+
+def service_deleted(service):
+    """post_delete of a ProjectService"""
+    database = service._state.db
+    cpu, memory = _allocation(service)
+    add_usage(database, service.project_id, _project_owner(service), -1, -cpu, -memory)
+
+
+def services_created(services):
+    """rows_bulk_created of ProjectServices: one update per project and per user"""
+    by_database = defaultdict(lambda: defaultdict(lambda: dict.fromkeys(COUNTERS, 0)))
+    for service in services:
+        cpu, memory = _allocation(service)
+        totals = by_database[service._state.db][service.project_id]
+        totals['services'] += 1
+        totals['cpu'] += cpu
+        totals['memory'] += memory
+
+    plan = quotas.enforced_plan()
+    for database, projects in by_database.items():
+        owners = dict(Project.unscoped.using(database).filter(pk__in=projects).values_list('pk', 'user_id'))
+        users = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        for project_id, totals in projects.items():
+            _add(ProjectUsage, database, project_id, totals, True, plan, plan and plan.project_limits())
+            if owners.get(project_id) is not None:
+                for counter, value in totals.items():
+                    users[owners[project_id]][counter] += value
+        for user_id, totals in users.items():
+            _add(UserUsage, router.db_for_write(UserUsage), user_id, totals, True, plan, plan and plan.user_limits())
+    for service in services:
+        service._counted_usage = _allocation(service)
+
+
+def usage_for_user(user):
+    """The user's counters (zeros before their first service)"""
+    usage = UserUsage.objects.filter(user=user).first()
+    return usage or UserUsage(user=user)
+
+
+def recompute_usage():
+    """
+    Rebuild every counter from the service tables; returns the number of
+    project and user rows written.
+
+    Writes made while it runs may be lost, so run it at a quiet time.
+    """
+    users = defaultdict(lambda: [0, 0, 0])
+    project_count = 0
+    for database in tenant_databases():
+        rows = (
+            ProjectService._base_manager.using(database)
+            .values('project_id', 'project__user_id')
+            .annotate(services=Count('pk'), cpu=Sum('cpu'), memory=Sum('memory'))
+            .order_by()
+        )
+        projects = []
+        for row in rows:
+            totals = [row['services'], row['cpu'] or 0, row['memory'] or 0]
+            projects.append(ProjectUsage(project_id=row['project_id'], **dict(zip(COUNTERS, totals))))
+            for index, value in enumerate(totals):
+                users[row['project__user_id']][index] += value
+        with transaction.atomic(using=database):
+            ProjectUsage._base_manager.using(database).all().delete()
+            ProjectUsage._base_manager.using(database).bulk_create(projects, batch_size=1000)
+        project_count += len(projects)
+
+    database = router.db_for_write(UserUsage)
+    with transaction.atomic(using=database):
+        UserUsage.objects.using(database).all().delete()
+        UserUsage.objects.using(database).bulk_create(
+            [UserUsage(user_id=user_id, **dict(zip(COUNTERS, totals))) for user_id, totals in users.items()],
+            batch_size=1000
+        )
+    return project_count, len(users)
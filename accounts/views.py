@@ -1,14 +1,26 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from . import tasks
+from .decorators import async_login_required
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, RailwaySettingsForm, TemplateCreationForm
-from .models import RailwaySettings, Template, Service
+from .image_catalog import aget_catalog, asuggest
+from .middleware import ORGANIZATION_SESSION_KEY
+from .models import Organization, Template, Service
+from .quotas import QuotaExceeded, check_service, plan_for
+from .railway_config import services_with_credentials, template_input
+from .replicas import replica_reads
+from .tenancy import iterate_in_organization
+from .transfer import export_user_data, import_user_data
+from saas_platform.partials import LazyValue, Partial, PartialRenderer
 import random
 import json
 
@@ -148,6 +160,7 @@ def quick_create_template(request):
     
     # Create the template with minimal configuration
     template = Template.objects.create(
+        organization=request.organization,
         user=request.user,
         name=template_name,
         description=f"Template created on {request.user.email}",
@@ -179,27 +192,52 @@ def quick_create_template(request):
     return redirect(f'{reverse("accounts:settings")}?tab=template&action=create&template_id={template.id}')
 
 
-@login_required
+def serialize_template_service(service):
+    """Serialize a TemplateService for the editor canvas"""
+    return {
+        'id': service.id,
+        'service_id': service.service_id,
+        'name': service.name,
+        'image': service.image or '',
+        'cpu': service.cpu,
+        'memory': service.memory,
+        'variables': service.variables,
+        'networking': service.networking,
+        'position': {
+            'x': service.position_x,
+            'y': service.position_y
+        },
+        'has_credentials': bool(service.registry_username and service.registry_password),
+        'registry_username': service.registry_username or ''
+    }
+
+
+@async_login_required
 @require_http_methods(["POST"])
-def create_service(request):
+async def create_service(request):
     """Create a new service for a template"""
     try:
         data = json.loads(request.body)
         template_id = data.get('template_id')
         service_id = data.get('service_id')
         
-        # Get the template
-        template = get_object_or_404(Template, id=template_id, user=request.user)
+        # Get the template (and its owner, whose plan limits the services)
+        template = await aget_object_or_404(
+            Template.objects.select_related('user'), id=template_id, organization=request.organization
+        )
+        cpu = data.get('cpu', 8)
+        memory = data.get('memory', 8)
+        check_service(plan_for(template.user), cpu, memory)
         
         # Check if service already exists
-        service, created = Service.objects.get_or_create(
+        service, created = await Service.objects.aget_or_create(
             template=template,
             service_id=service_id,
             defaults={
                 'name': data.get('name', 'New Service'),
                 'image': data.get('image', ''),
-                'cpu': data.get('cpu', 8),
-                'memory': data.get('memory', 8),
+                'cpu': cpu,
+                'memory': memory,
                 'variables': data.get('variables', {}),
                 'networking': data.get('networking', {'http': False, 'tcp': False}),
                 'position_x': data.get('position', {}).get('x', 0),
@@ -215,6 +253,12 @@ def create_service(request):
             'message': 'Service created successfully' if created else 'Service already exists'
         })
         
+    except QuotaExceeded as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'quota': e.as_dict()
+        }, status=403)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -222,9 +266,9 @@ def create_service(request):
         }, status=400)
 
 
-@login_required
+@async_login_required
 @require_http_methods(["POST"])
-def update_service(request):
+async def update_service(request):
     """Update an existing service"""
     try:
         data = json.loads(request.body)
@@ -232,8 +276,11 @@ def update_service(request):
         service_id = data.get('service_id')
         
         # Get the template and service
-        template = get_object_or_404(Template, id=template_id, user=request.user)
-        service = get_object_or_404(Service, template=template, service_id=service_id)
+        template = await aget_object_or_404(
+            Template.objects.select_related('user'), id=template_id, organization=request.organization
+        )
+        service = await aget_object_or_404(Service, template=template, service_id=service_id)
+        allocation = (service.cpu, service.memory)
         
         # Update service fields
         if 'name' in data:
@@ -257,7 +304,8 @@ def update_service(request):
         if 'registry_password' in data and data['registry_password']:
             service.registry_password = data['registry_password']
         
-        service.save()
+        check_service(plan_for(template.user), service.cpu, service.memory, previous=allocation)
+        await service.asave()
         
         return JsonResponse({
             'success': True,
@@ -265,6 +313,12 @@ def update_service(request):
             'message': 'Service updated successfully'
         })
         
+    except QuotaExceeded as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'quota': e.as_dict()
+        }, status=403)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -272,9 +326,9 @@ def update_service(request):
         }, status=400)
 
 
-@login_required
+@async_login_required
 @require_http_methods(["POST"])
-def validate_docker_image(request):
+async def validate_docker_image(request):
     """Validate if a Docker image exists on Docker Hub"""
     try:
         data = json.loads(request.body)
@@ -286,6 +340,15 @@ def validate_docker_image(request):
                 'error': 'No image name provided'
             }, status=400)
         
+        # Images already known to exist need no Docker Hub round trip
+        catalog = await aget_catalog()
+        if catalog.is_verified(image_name):
+            return JsonResponse({
+                'success': True,
+                'exists': True,
+                'message': 'Image found on Docker Hub'
+            })
+        
         # Parse image name (handle formats like: image:tag, user/image:tag, registry.com/user/image:tag)
         import requests
         
@@ -307,9 +370,11 @@ def validate_docker_image(request):
             api_url = f'https://hub.docker.com/v2/repositories/{repository}/tags/{tag}'
             
             try:
-                response = requests.get(api_url, timeout=5)
+                # Run the blocking HTTP call off the event loop
+                response = await sync_to_async(requests.get, thread_sensitive=False)(api_url, timeout=5)
                 
                 if response.status_code == 200:
+                    catalog.mark_verified(image_name)
                     return JsonResponse({
                         'success': True,
                         'exists': True,
@@ -348,36 +413,39 @@ def validate_docker_image(request):
         }, status=400)
 
 
-@login_required
+@async_login_required
+@require_http_methods(["GET"])
+async def suggest_images(request):
+    """Image autocomplete from the in-memory catalogs (no Docker Hub call)"""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+        images = await asuggest(request.organization, request.GET.get('q', ''), limit=limit)
+        return JsonResponse({
+            'success': True,
+            'images': images
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@async_login_required
 @require_http_methods(["GET"])
-def get_services(request, template_id):
+@replica_reads
+async def get_services(request, template_id):
     """Get all services for a template"""
     try:
         # Get the template
-        template = get_object_or_404(Template, id=template_id, user=request.user)
+        template = await aget_object_or_404(Template, id=template_id, organization=request.organization)
         
         # Get all services for this template
-        services = Service.objects.filter(template=template)
-        
-        # Serialize services
-        services_data = []
-        for service in services:
-            services_data.append({
-                'id': service.id,
-                'service_id': service.service_id,
-                'name': service.name,
-                'image': service.image or '',
-                'cpu': service.cpu,
-                'memory': service.memory,
-                'variables': service.variables,
-                'networking': service.networking,
-                'position': {
-                    'x': service.position_x,
-                    'y': service.position_y
-                },
-                'has_credentials': bool(service.registry_username and service.registry_password),
-                'registry_username': service.registry_username or ''
-            })
+        services_data = [
+            serialize_template_service(service)
+            async for service in Service.objects.filter(template=template)
+        ]
         
         return JsonResponse({
             'success': True,
@@ -391,13 +459,36 @@ def get_services(request, template_id):
         }, status=400)
 
 
+@async_login_required
+@require_http_methods(["GET"])
+async def get_template_config(request, template_id):
+    """Railway serializedConfig compiled from the template's services (cached)"""
+    try:
+        template = await aget_object_or_404(Template, id=template_id, organization=request.organization)
+        config = await sync_to_async(lambda: template_input(
+            template,
+            workspace_id=getattr(request.railway_settings, 'railway_workspace_id', None)
+        ))()
+        # Credentials stay on the server, as in get_services
+        has_credentials = await sync_to_async(services_with_credentials)(template)
+        
+        return JsonResponse({
+            'success': True,
+            'template_config': config,
+            'has_credentials': has_credentials
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
 @login_required
 def view_template(request, template_id):
     """View/Edit an existing template"""
-    template = get_object_or_404(Template, id=template_id, user=request.user, is_active=True)
-    
-    # Get user's railway settings
-    railway_settings, _ = RailwaySettings.objects.get_or_create(user=request.user)
+    template = get_object_or_404(Template, id=template_id, organization=request.organization, is_active=True)
     
     context = {
         'template_action': 'create',  # Using 'create' action to show editor
@@ -405,7 +496,7 @@ def view_template(request, template_id):
         'active_tab': 'template',
         'template_name': template.name,
         'template_description': template.description or '',
-        'settings': railway_settings,
+        'settings': request.railway_settings,
     }
     
     # For HTMX requests, return the template editor
@@ -425,21 +516,26 @@ def view_template(request, template_id):
 @require_http_methods(["POST", "DELETE"])
 def delete_template(request, template_id):
     """Delete a template (soft delete by setting is_active=False)"""
-    template = get_object_or_404(Template, id=template_id, user=request.user)
+    template = get_object_or_404(Template, id=template_id, organization=request.organization)
     
     template_name = template.name
     
-    # Soft delete - set is_active to False
-    template.is_active = False
-    template.save()
-    
-    # Delete associated services (hard delete since template is soft-deleted)
-    Service.objects.filter(template=template).delete()
+    # Soft delete is a single flag flip; the template and its services are
+    # moved to the archive tables in the background
+    Template.objects.filter(pk=template.pk).update(is_active=False, deleted_at=timezone.now())
+    tasks.enqueue(
+        'Archive deleted template',
+        tasks.archive_templates,
+        [template.pk],
+        total=1,
+        user=request.user,
+        organization=request.organization
+    )
     
     messages.success(request, f'Template "{template_name}" deleted successfully!')
     
     # Get updated templates list for response
-    user_templates = Template.objects.filter(user=request.user, is_active=True)
+    user_templates = Template.objects.filter(organization=request.organization, is_active=True).defer('template_config')
     
     context = {
         'templates': user_templates,
@@ -459,14 +555,37 @@ def delete_template(request, template_id):
     return redirect(f'{reverse("accounts:settings")}?tab=template')
 
 
+# Partials rendered by settings_view, keyed by HX-Target. Each partial lists
+# the lazily-provided context it reads so other tabs' work is skipped.
+SETTINGS_TAB_PARTIAL = Partial(
+    'accounts/partials/settings_tab_content.html',
+    needs=('settings', 'templates', 'settings_form')
+)
+SETTINGS_FORM_PARTIAL = Partial(
+    'accounts/partials/settings_form.html',
+    needs=('settings', 'settings_form')
+)
+TEMPLATE_FORM_PARTIAL = Partial(
+    'accounts/partials/template_form.html',
+    needs=('settings', 'template_form')
+)
+SETTINGS_PARTIALS = PartialRenderer(
+    targets={
+        'settings-main-content': SETTINGS_TAB_PARTIAL,
+        'template-content': SETTINGS_TAB_PARTIAL,
+        'settings-form-container': SETTINGS_FORM_PARTIAL,
+        'template-form-container': TEMPLATE_FORM_PARTIAL,
+    },
+    default=Partial(
+        'accounts/partials/settings_content.html',
+        needs=('settings', 'templates', 'settings_form', 'template_form')
+    )
+)
+
+
 @login_required
 def settings_view(request):
     """Railway settings view with HTMX support and tabs"""
-    # Get or create RailwaySettings for the user
-    railway_settings, created = RailwaySettings.objects.get_or_create(
-        user=request.user
-    )
-    
     # Get active tab from request (default to 'config')
     active_tab = request.GET.get('tab', 'config')
     if active_tab not in ['config', 'template']:
@@ -475,72 +594,64 @@ def settings_view(request):
     # Get action for templates (create, view, etc.)
     template_action = request.GET.get('action', None)
     
-    # Get user's templates
-    user_templates = Template.objects.filter(user=request.user, is_active=True)
-    
     context = {
-        'settings': railway_settings,
         'active_tab': active_tab,
-        'templates': user_templates,
         'template_action': template_action,
     }
     
+    # Everything else is computed only if the rendered partial asks for it.
+    # request.railway_settings is cached and unsaved until the form saves it.
+    railway_settings = LazyValue(lambda: request.railway_settings)
+    providers = {
+        'settings': railway_settings,
+        'templates': lambda: Template.objects.filter(organization=request.organization, is_active=True).defer('template_config'),
+        'settings_form': lambda: RailwaySettingsForm(instance=railway_settings()),
+        'template_form': lambda: TemplateCreationForm(user=request.user),
+    }
+    
     if request.method == 'POST':
         form_type = request.POST.get('form_type', 'config')
+        is_htmx = hasattr(request, 'htmx') and request.htmx
         
         if form_type == 'config':
             # Handle Railway Settings form
-            form = RailwaySettingsForm(request.POST, instance=railway_settings)
+            form = RailwaySettingsForm(request.POST, instance=railway_settings())
             context['settings_form'] = form
             context['active_tab'] = 'config'  # Ensure we stay on config tab
             if form.is_valid():
-                form.save()
-                # Refresh the instance to get updated data
-                railway_settings.refresh_from_db()
+                saved_settings = form.save()
                 # Re-initialize form with saved data to preserve input values
-                form = RailwaySettingsForm(instance=railway_settings)
-                context['settings_form'] = form
+                context['settings_form'] = RailwaySettingsForm(instance=saved_settings)
                 messages.success(request, 'Railway settings saved successfully!')
-                
-                # If HTMX request, return the form with success message
-                if hasattr(request, 'htmx') and request.htmx:
-                    if hasattr(request, 'htmx_target') and request.htmx_target == 'settings-form-container':
-                        return HttpResponse(
-                            render_to_string('accounts/partials/settings_form.html', 
-                                           context, 
-                                           request=request)
-                        )
-                    return HttpResponse(
-                        render_to_string('accounts/partials/settings_tab_content.html', 
-                                       context, 
-                                       request=request)
-                    )
-                return redirect('accounts:settings?tab=config')
-            else:
-                # Form has errors
-                if hasattr(request, 'htmx') and request.htmx:
-                    if hasattr(request, 'htmx_target') and request.htmx_target == 'settings-form-container':
-                        return HttpResponse(
-                            render_to_string('accounts/partials/settings_form.html', 
-                                           context, 
-                                           request=request)
-                        )
-                    return HttpResponse(
-                        render_to_string('accounts/partials/settings_tab_content.html', 
-                                       context, 
-                                       request=request)
-                    )
+                if not is_htmx:
+                    return redirect('accounts:settings?tab=config')
+            
+            # HTMX: return the form (with success message or errors)
+            if is_htmx:
+                if request.htmx.target == 'settings-form-container':
+                    partial = SETTINGS_FORM_PARTIAL
+                else:
+                    partial = SETTINGS_TAB_PARTIAL
+                return SETTINGS_PARTIALS.render(request, context, providers, partial)
         
         elif form_type == 'template':
             # Handle Template Creation form
             # Get template_config from POST data (sent as JSON string)
             template_config_str = request.POST.get('template_config', '{}')
-            import json
+            # Templates edited on the canvas are compiled from their service rows
+            source_template = None
+            if request.POST.get('template_id', '').isdigit():
+                source_template = Template.objects.filter(
+                    pk=request.POST['template_id'], organization=request.organization
+                ).first()
+            if source_template is not None:
+                template_config_str = json.dumps(template_input(
+                    source_template,
+                    workspace_id=getattr(railway_settings(), 'railway_workspace_id', None)
+                ))
             try:
                 # Parse the JSON to validate it
-                template_config = json.loads(template_config_str)
-                # Create a mutable copy of POST data and convert to JSON string for form
-                post_data = request.POST.copy()
+                json.loads(template_config_str)
                 # The form expects template_config as a JSON string
                 template_form = TemplateCreationForm({
                     'name': request.POST.get('name', ''),
@@ -559,69 +670,91 @@ def settings_view(request):
             if template_form.is_valid():
                 template = template_form.save()
                 messages.success(request, f'Template "{template.name}" created successfully!')
-                context['templates'] = Template.objects.filter(user=request.user, is_active=True)
                 # Reset form after successful submission
                 context['template_form'] = TemplateCreationForm(user=request.user)
-                
-                # If HTMX request, return the form with success message
-                if hasattr(request, 'htmx') and request.htmx:
-                    if hasattr(request, 'htmx_target') and request.htmx_target == 'template-form-container':
-                        return HttpResponse(
-                            render_to_string('accounts/partials/template_form.html', 
-                                           context, 
-                                           request=request)
-                        )
-                    # Return template tab content to refresh template list
-                    return HttpResponse(
-                        render_to_string('accounts/partials/settings_tab_content.html', 
-                                       context, 
-                                       request=request)
-                    )
-                return redirect('accounts:settings?tab=template')
-            else:
-                # Form has errors
-                if hasattr(request, 'htmx') and request.htmx:
-                    if hasattr(request, 'htmx_target') and request.htmx_target == 'template-form-container':
-                        return HttpResponse(
-                            render_to_string('accounts/partials/template_form.html', 
-                                           context, 
-                                           request=request)
-                        )
-                    return HttpResponse(
-                        render_to_string('accounts/partials/settings_tab_content.html', 
-                                       context, 
-                                       request=request)
-                    )
-    else:
-        # GET request - initialize forms
-        if 'settings_form' not in context:
-            context['settings_form'] = RailwaySettingsForm(instance=railway_settings)
-        if 'template_form' not in context:
-            context['template_form'] = TemplateCreationForm(user=request.user)
+                if not is_htmx:
+                    return redirect('accounts:settings?tab=template')
+            
+            # HTMX: return the form (with success message or errors), or the
+            # template tab content to refresh the template list
+            if is_htmx:
+                if request.htmx.target == 'template-form-container':
+                    partial = TEMPLATE_FORM_PARTIAL
+                else:
+                    partial = SETTINGS_TAB_PARTIAL
+                return SETTINGS_PARTIALS.render(request, context, providers, partial)
     
-    # If HTMX request, check what to return
+    # If HTMX request, render the partial for the requested target
+    # (settings-main-content / template-content get only the tab content)
     if hasattr(request, 'htmx') and request.htmx:
-        # If target is settings-main-content, return only tab content
-        if hasattr(request, 'htmx_target') and request.htmx_target == 'settings-main-content':
-            return HttpResponse(
-                render_to_string('accounts/partials/settings_tab_content.html', 
-                               context, 
-                               request=request)
-            )
-        # If target is template-content, return template content
-        if hasattr(request, 'htmx_target') and request.htmx_target == 'template-content':
-            return HttpResponse(
-                render_to_string('accounts/partials/settings_tab_content.html', 
-                               context, 
-                               request=request)
-            )
-        # Otherwise return full settings content
-        return HttpResponse(
-            render_to_string('accounts/partials/settings_content.html', 
-                           context, 
-                           request=request)
-        )
+        return SETTINGS_PARTIALS.render(request, context, providers)
     
     # Full page render
-    return render(request, 'accounts/settings.html', context)
+    full_page = Partial('accounts/settings.html', needs=SETTINGS_PARTIALS.default.needs)
+    return render(
+        request,
+        full_page.template_name,
+        SETTINGS_PARTIALS.build_context(full_page, context, providers)
+    )
+
 
+# =============================================================================
+# ORGANIZATIONS
+# =============================================================================
+
+@login_required
+@require_http_methods(["POST"])
+def switch_organization(request, organization_id):
+    """Make another of the user's organizations the active one for this session"""
+    organization = get_object_or_404(Organization.objects.for_member(request.user), pk=organization_id)
+    request.session[ORGANIZATION_SESSION_KEY] = organization.pk
+    
+    if hasattr(request, 'htmx') and request.htmx:
+        response = HttpResponse(status=204)
+        response['HX-Redirect'] = reverse('core:dashboard')
+        return response
+    return redirect('core:dashboard')
+
+
+# =============================================================================
+# ACCOUNT EXPORT / IMPORT (NDJSON)
+# =============================================================================
+
+@login_required
+@require_http_methods(["GET"])
+def export_data(request):
+    """Stream the user's templates, projects and services as NDJSON"""
+    response = StreamingHttpResponse(
+        iterate_in_organization(request.organization, export_user_data(request.user)),
+        content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = 'attachment; filename="saas-platform-export.ndjson"'
+    return response
+
+
+@login_required
+@require_http_methods(["POST"])
+def import_data(request):
+    """Import an NDJSON export, from an uploaded ``file`` or the raw request body"""
+    try:
+        upload = request.FILES.get('file')
+        # Both are read line by line, never loaded whole
+        lines = upload if upload is not None else request
+        counts = import_user_data(request.user, lines)
+        
+        return JsonResponse({
+            'success': True,
+            'imported': counts
+        })
+        
+    except QuotaExceeded as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'quota': e.as_dict()
+        }, status=403)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
@@ -0,0 +1,62 @@
+"""
+Shared helpers for the ``bench_*`` management commands
+"""
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+
+
+@contextmanager
+def bench_user():
+    """Create a throwaway user for a benchmark run and delete it (cascading) afterwards"""
+    User = get_user_model()
+    suffix = uuid.uuid4().hex[:12]
+    user = User.objects.create_user(
+        username=f'bench-{suffix}',
+        email=f'bench-{suffix}@example.invalid',
+        password=uuid.uuid4().hex,
+        # Benchmarks measure the endpoints, not the plan limits
+        plan='enterprise'
+    )
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+class Timings:
+    """Collects per-call latencies (in seconds) and summarizes them"""
+
+    def __init__(self, label):
+        self.label = label
+        self.samples = []
+        self.errors = 0
+        self.wall = 0.0
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self):
+        count = len(self.samples)
+        mean = statistics.fmean(self.samples) if count else 0.0
+        rate = count / self.wall if self.wall else 0.0
+        return (
+            f'{self.label:<32} n={count:<6} err={self.errors:<4} '
+            f'mean={mean * 1000:8.2f}ms p50={self.percentile(50) * 1000:8.2f}ms '
+            f'p95={self.percentile(95) * 1000:8.2f}ms rps={rate:9.1f}'
+        )
@@ -0,0 +1,306 @@
+"""
+Build/deploy log storage keyed by ``ProjectService.railway_deployment_id``.
+
+Each deployment gets a directory under ``DEPLOY_LOG_ROOT``:
+
+    <first_line>.seg   sealed segment: zlib blocks of BLOCK_LINES lines each
+    <first_line>.idx   end offset (uint64) of every block in the segment
+    <first_line>.tail  the open block, uncompressed, one line per line
+
+Lines are numbered from 0 for the life of the deployment. A range read
+finds the segment by bisecting the segment start lines, seeks to the blocks
+that hold the range and decompresses only those, so it costs O(range) rather
+than O(log size). Retention drops whole segments (oldest first) once a
+deployment exceeds its byte cap, or the whole directory once it is too old.
+"""
+import asyncio
+import bisect
+import fcntl
+import os
+import re
+import shutil
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+BLOCK_LINES = 256
+SEGMENT_BLOCKS = 64
+
+_SAFE_ID = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def _name(first_line, suffix):
+    return f'{first_line:012d}.{suffix}'
+
+
+class DeploymentLog:
+    """Append-only, block-compressed log of one deployment"""
+
+    def __init__(self, deployment_id, root=None):
+        self.deployment_id = str(deployment_id)
+        root = Path(root or settings.DEPLOY_LOG_ROOT)
+        self.path = root / _SAFE_ID.sub('_', self.deployment_id)
+
+    # -------------------------------------------------------------------------
+    # Layout helpers
+    # -------------------------------------------------------------------------
+
+    def _files(self, suffix):
+        """Sorted start lines of the files with ``suffix``"""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name.split('.')[0]) for name in names if name.endswith('.' + suffix))
+
+    def _offsets(self, first_line):
+        offsets = array('Q')
+        try:
+            with open(self.path / _name(first_line, 'idx'), 'rb') as f:
+                offsets.frombytes(f.read())
+        except FileNotFoundError:
+            pass
+        return offsets
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive lock for writers (appends and retention), across processes"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _sealed_end(self, segments):
+        """Line number just past the last sealed block"""
+        if not segments:
+            return 0
+        return segments[-1] + len(self._offsets(segments[-1])) * BLOCK_LINES
+
+    def _read_tail(self, tail_first):
+        try:
+            with open(self.path / _name(tail_first, 'tail'), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # A concurrent append may have written a partial last line
+        return data.decode('utf-8', 'replace').split('\n')[:-1]
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+
+    def append(self, lines):
+        """Append lines (a str is split on newlines); returns the new line count"""
+        if isinstance(lines, str):
+            lines = lines.split('\n')
+        lines = [line.replace('\n', ' ') for line in lines]
+
+        with self._lock():
+            segments = self._files('seg')
+            end = self._sealed_end(segments)
+            tails = self._files('tail')
+            tail_first = tails[-1] if tails else end
+            pending = self._read_tail(tail_first)[max(0, end - tail_first):]
+            if tail_first != end:
+                # A writer died between sealing a block and removing its tail
+                with open(self.path / _name(end, 'tail'), 'wb') as f:
+                    f.write(''.join(line + '\n' for line in pending).encode('utf-8'))
+                for stale in tails:
+                    if stale != end:
+                        (self.path / _name(stale, 'tail')).unlink(missing_ok=True)
+
+            while lines:
+                room = BLOCK_LINES - len(pending)
+                chunk, lines = lines[:room], lines[room:]
+                if len(pending) + len(chunk) < BLOCK_LINES:
+                    with open(self.path / _name(end, 'tail'), 'ab') as f:
+                        f.write(''.join(line + '\n' for line in chunk).encode('utf-8'))
+                    pending += chunk
+                    break
+
+                # The open block is full: compress it into the current segment
+                block = zlib.compress(''.join(line + '\n' for line in pending + chunk).encode('utf-8'))
+                if not segments or len(self._offsets(segments[-1])) >= SEGMENT_BLOCKS:
+                    segments.append(end)
+                segment = segments[-1]
+                with open(self.path / _name(segment, 'seg'), 'ab') as f:
+                    f.write(block)
+                    offset = f.tell()
+                # Index last, so readers never see a block that is not fully written
+                with open(self.path / _name(segment, 'idx'), 'ab') as f:
+                    f.write(array('Q', [offset]).tobytes())
+
+                old_tail = self.path / _name(end, 'tail')
+                end += BLOCK_LINES
+                pending = []
+                if old_tail.exists():
+                    old_tail.unlink()
+            return end + len(pending)
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def bounds(self):
+        """``(first retained line, line count)``"""
+        segments = self._files('seg')
+        end = self._sealed_end(segments)
+        tails = self._files('tail')
+        if tails:
+            tail_first = tails[-1]
+            end = max(end, tail_first + len(self._read_tail(tail_first)))
+        first = segments[0] if segments else (tails[0] if tails else 0)
+        return first, end
+
+    def read(self, start, stop):
+        """Lines ``start`` (inclusive) to ``stop`` (exclusive) as ``[(number, line)]``"""
+        segments = self._files('seg')
+        start = max(start, segments[0] if segments else 0)
+        result = []
+
+        position = max(0, bisect.bisect_right(segments, start) - 1)
+        while start < stop and position < len(segments):
+            first = segments[position]
+            offsets = self._offsets(first)
+            block = (start - first) // BLOCK_LINES
+            if block >= len(offsets):
+                position += 1
+                continue
+            last_block = min(len(offsets) - 1, (stop - 1 - first) // BLOCK_LINES)
+            begin = offsets[block - 1] if block else 0
+            with open(self.path / _name(first, 'seg'), 'rb') as f:
+                f.seek(begin)
+                for index in range(block, last_block + 1):
+                    length = offsets[index] - (offsets[index - 1] if index else 0)
+                    block_lines = zlib.decompress(f.read(length)).decode('utf-8').split('\n')[:-1]
+                    block_first = first + index * BLOCK_LINES
+                    for number, line in enumerate(block_lines, start=block_first):
+                        if start <= number < stop:
+                            result.append((number, line))
+            start = max(start, first + (last_block + 1) * BLOCK_LINES)
+            position += 1
+
+        if start < stop:
+            tails = self._files('tail')
+            if tails:
+                tail_first = tails[-1]
+                for number, line in enumerate(self._read_tail(tail_first), start=tail_first):
+                    if start <= number < stop:
+                        result.append((number, line))
+        return result
+
+    def follow(self, start=0, poll_interval=0.5, idle_timeout=None, max_duration=None):
+        """Yield ``(number, line)`` from ``start`` on, waiting for new lines like ``tail -f``"""
+        deadline = time.monotonic() + max_duration if max_duration is not None else None
+        idle = 0.0
+        while deadline is None or time.monotonic() < deadline:
+            _, end = self.bounds()
+            if start < end:
+                for number, line in self.read(start, end):
+                    yield number, line
+                    start = number + 1
+                idle = 0.0
+                continue
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            time.sleep(poll_interval)
+            idle += poll_interval
+
+    async def afollow(self, start=0, poll_interval=0.5, idle_timeout=None, max_duration=None):
+        """``follow`` for async views: reads run in a thread and waits do not block the event loop"""
+        deadline = time.monotonic() + max_duration if max_duration is not None else None
+        idle = 0.0
+        while deadline is None or time.monotonic() < deadline:
+            lines = await sync_to_async(self._read_from, thread_sensitive=False)(start)
+            if lines:
+                for number, line in lines:
+                    yield number, line
+                start = lines[-1][0] + 1
+                idle = 0.0
+                continue
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            await asyncio.sleep(poll_interval)
+            idle += poll_interval
+
+    def _read_from(self, start):
+        _, end = self.bounds()
+        return self.read(start, end) if start < end else []
+
+    # -------------------------------------------------------------------------
+    # Retention
+    # -------------------------------------------------------------------------
+
+    def size(self):
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+        except FileNotFoundError:
+            return 0
+
+    def last_modified(self):
+        try:
+            return max(entry.stat().st_mtime for entry in os.scandir(self.path) if entry.is_file())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def enforce_cap(self, max_bytes):
+        """Drop the oldest sealed segments until the log fits ``max_bytes``; returns bytes freed"""
+        freed = 0
+        with self._lock():
+            segments = self._files('seg')
+            size = self.size()
+            # The newest segment keeps accepting blocks, so it is never dropped
+            for first in segments[:-1]:
+                if size <= max_bytes:
+                    break
+                for suffix in ('seg', 'idx'):
+                    file = self.path / _name(first, suffix)
+                    removed = file.stat().st_size
+                    file.unlink()
+                    size -= removed
+                    freed += removed
+        return freed
+
+    def delete(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def get_log(deployment_id):
+    return DeploymentLog(deployment_id)
+
+
+def compact_logs(max_bytes=None, max_age_days=None, root=None):
+    """
+    Apply retention to every deployment log under ``root``.
+
+    Logs untouched for ``max_age_days`` are deleted; the rest are capped at
+    ``max_bytes`` each. Returns ``(logs deleted, bytes freed)``.
+    """
+    root = Path(root or settings.DEPLOY_LOG_ROOT)
+    max_bytes = max_bytes if max_bytes is not None else settings.DEPLOY_LOG_MAX_BYTES
+    max_age_days = max_age_days if max_age_days is not None else settings.DEPLOY_LOG_RETENTION_DAYS
+    cutoff = time.time() - max_age_days * 86400
+
+    deleted = freed = 0
+    try:
+        entries = [entry for entry in os.scandir(root) if entry.is_dir()]
+    except FileNotFoundError:
+        return deleted, freed
+
+    for entry in entries:
+        log = DeploymentLog(entry.name, root=root)
+        if log.last_modified() < cutoff:
+            freed += log.size()
+            log.delete()
+            deleted += 1
+        else:
+            freed += log.enforce_cap(max_bytes)
+    return deleted, freed
@@ -0,0 +1,180 @@
+"""
+Benchmark the editor JSON API under sync-WSGI, sync-ASGI and native async.
+
+Usage:
+    python manage.py bench_api --requests 2000 --concurrency 100
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.decorators import login_required
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import path
+from django.views.decorators.http import require_http_methods
+
+from accounts.models import Project, ProjectService, Template, TemplateService
+from accounts.views import get_services, serialize_template_service
+from core.benchmarks import Timings, bench_user
+from core.views import create_project_service, get_project_services, serialize_project_service
+
+
+# -----------------------------------------------------------------------------
+# Sync reference implementations (the pre-async views) used as the baseline
+# -----------------------------------------------------------------------------
+
+@login_required
+@require_http_methods(["GET"])
+def sync_get_project_services(request, project_id):
+    project = get_object_or_404(Project, id=project_id, user=request.user)
+    services = ProjectService.objects.filter(project=project)
+    return JsonResponse({
+        'success': True,
+        'services': [serialize_project_service(service) for service in services]
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def sync_get_services(request, template_id):
+    template = get_object_or_404(Template, id=template_id, user=request.user)
+    services = TemplateService.objects.filter(template=template)
+    return JsonResponse({
+        'success': True,
+        'services': [serialize_template_service(service) for service in services]
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def sync_create_project_service(request):
+    data = json.loads(request.body)
+    project = get_object_or_404(Project, id=data.get('project_id'), user=request.user)
+    service, created = ProjectService.objects.update_or_create(
+        project=project,
+        service_id=data.get('service_id'),
+        defaults={'name': data.get('name', 'New Service')}
+    )
+    return JsonResponse({'success': True, 'id': service.id, 'created': created})
+
+
+urlpatterns = [
+    path('sync/project/<int:project_id>/services/', sync_get_project_services),
+    path('sync/template/<int:template_id>/services/', sync_get_services),
+    path('sync/project/service/create/', sync_create_project_service),
+    path('async/project/<int:project_id>/services/', get_project_services),
+    path('async/template/<int:template_id>/services/', get_services),
+    path('async/project/service/create/', create_project_service),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare sync-under-WSGI, sync-under-ASGI and native async JSON API views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent in-flight requests')
+        parser.add_argument('--services', type=int, default=20, help='Services per project/template')
+        parser.add_argument('--writes', action='store_true', help='Also benchmark the create endpoint')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Failed writes (e.g. SQLite "database is locked") are counted, not logged
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        with bench_user() as user, override_settings(ROOT_URLCONF=__name__):
+            project = Project.objects.create(user=user, name='Bench Project')
+            template = Template.objects.create(user=user, name='Bench Template')
+            ProjectService.objects.bulk_create([
+                ProjectService(project=project, service_id=f'service_{i}', name=f'Service {i}')
+                for i in range(options['services'])
+            ])
+            TemplateService.objects.bulk_create([
+                TemplateService(template=template, service_id=f'service_{i}', name=f'Service {i}')
+                for i in range(options['services'])
+            ])
+
+            login_client = Client()
+            login_client.force_login(user)
+            cookies = login_client.cookies
+
+            endpoints = [
+                ('get_project_services', 'GET', f'project/{project.id}/services/', None),
+                ('get_services', 'GET', f'template/{template.id}/services/', None),
+            ]
+            if options['writes']:
+                endpoints.append((
+                    'create_project_service', 'POST', 'project/service/create/',
+                    {'project_id': project.id, 'service_id': 'bench_upsert', 'name': 'Upsert'}
+                ))
+
+            self.stdout.write(f'{total} requests per run, concurrency {concurrency}\n')
+            for name, method, url, payload in endpoints:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                runs = [
+                    self.run_wsgi('sync / WSGI', cookies, method, f'/sync/{url}', payload, total, concurrency),
+                    self.run_asgi('sync / ASGI', cookies, method, f'/sync/{url}', payload, total, concurrency),
+                    self.run_asgi('native async / ASGI', cookies, method, f'/async/{url}', payload, total, concurrency),
+                ]
+                for timings in runs:
+                    self.stdout.write('  ' + timings.summary())
+
+    def _send(self, client, method, url, payload):
+        if method == 'POST':
+            return client.post(url, data=json.dumps(payload), content_type='application/json')
+        return client.get(url)
+
+    def run_wsgi(self, label, cookies, method, url, payload, total, concurrency):
+        """Threaded WSGI server stand-in: one sync client per worker thread"""
+        timings = Timings(label)
+
+        def worker(count):
+            client = Client(raise_request_exception=False)
+            client.cookies = cookies
+            for _ in range(count):
+                with timings.measure():
+                    response = self._send(client, method, url, payload)
+                if response.status_code != 200:
+                    timings.errors += 1
+            close_old_connections()
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, shares))
+        timings.wall = time.perf_counter() - start
+        return timings
+
+    def run_asgi(self, label, cookies, method, url, payload, total, concurrency):
+        """ASGI event loop with ``concurrency`` requests in flight"""
+        timings = Timings(label)
+
+        async def one(client, semaphore):
+            async with semaphore:
+                with timings.measure():
+                    if method == 'POST':
+                        response = await client.post(url, data=json.dumps(payload), content_type='application/json')
+                    else:
+                        response = await client.get(url)
+                if response.status_code != 200:
+                    timings.errors += 1
+
+        async def main():
+            client = AsyncClient(raise_request_exception=False)
+            client.cookies = cookies
+            semaphore = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            await asyncio.gather(*(one(client, semaphore) for _ in range(total)))
+            timings.wall = time.perf_counter() - start
+
+        asyncio.run(main())
+        return timings
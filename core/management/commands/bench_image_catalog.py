@@ -0,0 +1,73 @@
+"""
+Benchmark image autocomplete lookups (accounts.image_catalog).
+
+Builds a catalog from the seed list plus ``--images`` synthetic names with
+skewed popularity and times ``suggest`` for typed prefixes of real names.
+
+Usage:
+    python manage.py bench_image_catalog
+    python manage.py bench_image_catalog --images 500000 --lookups 20000
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.image_catalog import SEED_IMAGES, SEED_WEIGHT, ImageCatalog, load_counts
+from core.benchmarks import Timings
+
+NAMESPACES = ['', 'library/', 'bitnami/', 'acme/', 'ghcr.io/acme/', 'registry.gitlab.com/team/']
+NAMES = ['postgres', 'redis', 'nginx', 'node', 'python', 'api', 'worker', 'web', 'frontend', 'minio']
+TAGS = ['latest', 'alpine', '1', '1.2', '1.2.3', '16', '7', 'slim', 'main', 'v2']
+
+
+class Command(BaseCommand):
+    help = 'Measure image catalog build time and prefix lookup latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=100000, help='Synthetic images in the catalog')
+        parser.add_argument('--lookups', type=int, default=10000, help='Timed lookups')
+        parser.add_argument('--from-db', action='store_true', help='Also time loading the catalog from the database')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        counts = {image: SEED_WEIGHT for image in SEED_IMAGES}
+        while len(counts) < options['images'] + len(SEED_IMAGES):
+            image = f'{rng.choice(NAMESPACES)}{rng.choice(NAMES)}-{rng.randrange(options["images"])}:{rng.choice(TAGS)}'
+            counts[image] = int(rng.paretovariate(1.2))
+
+        start = time.perf_counter()
+        catalog = ImageCatalog(counts)
+        self.stdout.write(f'Built a catalog of {len(catalog)} images in {(time.perf_counter() - start) * 1000:.0f}ms')
+
+        if options['from_db']:
+            start = time.perf_counter()
+            loaded = load_counts()
+            self.stdout.write(
+                f'Loaded {len(loaded)} images from the database in {(time.perf_counter() - start) * 1000:.0f}ms'
+            )
+
+        images = list(counts)
+        prefixes = []
+        for _ in range(options['lookups']):
+            image = rng.choice(images)
+            prefixes.append(image[:rng.randint(1, len(image))])
+
+        for label, memo in (('suggest (memoized)', True), ('suggest (no memo)', False)):
+            timings = Timings(label)
+            wall_start = time.perf_counter()
+            for prefix in prefixes:
+                if not memo:
+                    catalog.memo.clear()
+                with timings.measure():
+                    catalog.suggest(prefix)
+            timings.wall = time.perf_counter() - wall_start
+            self.stdout.write(timings.summary())
+
+        timings = Timings('add (incremental insert)')
+        wall_start = time.perf_counter()
+        for i in range(1000):
+            with timings.measure():
+                catalog.add(f'bench/new-image-{i}:latest')
+        timings.wall = time.perf_counter() - wall_start
+        self.stdout.write(timings.summary())
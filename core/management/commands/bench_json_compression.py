@@ -0,0 +1,126 @@
+"""
+Benchmark CompressedJSONField storage: size and encode/decode latency.
+
+Usage:
+    python manage.py bench_json_compression
+    python manage.py bench_json_compression --from-db --train
+"""
+import json
+import random
+import time
+import zlib
+
+from django.core.management.base import BaseCommand
+
+from accounts import compression
+from accounts.models import ProjectService, Template, TemplateService
+from accounts.railway_config import compile_service
+
+ENV_KEYS = [
+    'DATABASE_URL', 'REDIS_URL', 'NODE_ENV', 'PORT', 'SECRET_KEY', 'API_KEY', 'LOG_LEVEL',
+    'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'S3_BUCKET', 'SENTRY_DSN', 'SMTP_HOST',
+]
+
+
+def synthetic_variables(rng, count):
+    variables = {}
+    for i in range(count):
+        key = ENV_KEYS[i] if i < len(ENV_KEYS) else f'FEATURE_FLAG_{i}'
+        variables[key] = rng.choice([
+            'production', '8080', 'true',
+            f'postgresql://postgres:{rng.getrandbits(64):x}@postgres.railway.internal:5432/railway',
+            f'{rng.getrandbits(128):032x}',
+        ])
+    return variables
+
+
+def synthetic_config(rng, services):
+    return {'input': {
+        'serializedConfig': {'services': {
+            f'service_{i}': compile_service({
+                'name': f'Service {i}', 'image': rng.choice(['nginx:latest', 'postgres:16', 'redis:7']),
+                'cpu': 8, 'memory': 8, 'variables': synthetic_variables(rng, 12), 'networking': {},
+            })
+            for i in range(services)
+        }},
+        'workspaceId': 'ws', 'templateId': None, 'environmentId': None, 'projectId': None,
+    }}
+
+
+class Command(BaseCommand):
+    help = 'Compare plain JSON, zlib and zlib+dictionary storage of template_config/variables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help='Encode/decode iterations per payload')
+        parser.add_argument('--from-db', action='store_true', help='Also measure the rows in the database')
+        parser.add_argument('--train', action='store_true', help='Train a dictionary on the database rows')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        payloads = [
+            ('variables, 5 keys', synthetic_variables(rng, 5)),
+            ('variables, 40 keys', synthetic_variables(rng, 40)),
+            ('template_config, 10 services', synthetic_config(rng, 10)),
+            ('template_config, 200 services', synthetic_config(rng, 200)),
+        ]
+        self.report(payloads, options['repeat'])
+
+        if options['from_db']:
+            samples = [t.template_config for t in Template.objects.only('template_config').iterator()]
+            samples += [s.variables for s in TemplateService.objects.only('variables').iterator()]
+            samples += [s.variables for s in ProjectService.objects.only('variables').iterator()]
+            samples = [sample for sample in samples if sample]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{len(samples)} non-empty rows in the database'))
+            self.report([('database rows', samples)], max(1, options['repeat'] // 20), each=True)
+
+            if options['train'] and samples:
+                encoded = [json.dumps(sample, separators=(',', ':')).encode('utf-8') for sample in samples]
+                trained = compression.train_dictionary(encoded)
+                raw = sum(len(data) for data in encoded)
+                with_default = sum(len(self.deflate(data, compression.DEFAULT_DICTIONARY)) for data in encoded)
+                with_trained = sum(len(self.deflate(data, trained)) for data in encoded)
+                self.stdout.write(
+                    f'  trained dictionary: {len(trained)} bytes; rows {raw} -> {with_default} bytes '
+                    f'(default dictionary) vs {with_trained} bytes (trained)'
+                )
+
+    def deflate(self, data, dictionary=None):
+        kwargs = {'zdict': dictionary} if dictionary else {}
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15, **kwargs)
+        return compressor.compress(data) + compressor.flush()
+
+    def report(self, payloads, repeat, each=False):
+        self.stdout.write(
+            f'{"payload":<32} {"json":>9} {"zlib":>9} {"zlib+dict":>9} {"ratio":>6} '
+            f'{"encode":>10} {"decode":>10} {"json.loads":>10}'
+        )
+        for label, payload in payloads:
+            values = payload if each else [payload]
+            encoded = [json.dumps(value, separators=(',', ':')).encode('utf-8') for value in values]
+            plain = sum(len(data) for data in encoded)
+            zlib_only = sum(len(self.deflate(data)) for data in encoded)
+            stored = [compression.dumps(value, min_size=0) for value in values]
+            with_dict = sum(len(data) for data in stored)
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for value in values:
+                    compression.dumps(value, min_size=0)
+            encode = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for data in stored:
+                    compression.loads(data)
+            decode = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for data in encoded:
+                    json.loads(data)
+            baseline = (time.perf_counter() - start) / repeat
+
+            self.stdout.write(
+                f'{label:<32} {plain:>9} {zlib_only:>9} {with_dict:>9} {plain / max(with_dict, 1):>5.1f}x '
+                f'{encode * 1e6:>8.0f}us {decode * 1e6:>8.0f}us {baseline * 1e6:>8.0f}us'
+            )
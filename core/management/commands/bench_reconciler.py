@@ -0,0 +1,83 @@
+"""
+Benchmark status reconciliation (core.reconciler) over many deployed services.
+
+Creates ``--services`` deployed services spread over projects, makes them
+all due and runs passes with a client that reports a share of them as
+changed, counting API calls and timing each pass.
+
+Usage:
+    python manage.py bench_reconciler
+    python manage.py bench_reconciler --services 100000 --calls 200 --changed 0.05
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import Organization, Project, ProjectService
+from core.benchmarks import Timings, bench_user
+from core.reconciler import RecordingStatusClient, Reconciler
+
+
+class Command(BaseCommand):
+    help = 'Measure API calls and database time of status reconciliation passes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=20000, help='Deployed services')
+        parser.add_argument('--per-project', type=int, default=20, help='Services per project')
+        parser.add_argument('--calls', type=int, default=120, help='Call budget per pass')
+        parser.add_argument('--changed', type=float, default=0.05, help='Share of checked services that changed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        share = options['changed']
+
+        class ChangingClient(RecordingStatusClient):
+            calls = 0
+
+            def fetch(self, services):
+                ChangingClient.calls += 1
+                return {
+                    service['pk']: {'status': rng.choice(['building', 'running', 'failed']), 'public_url': None}
+                    for service in services if rng.random() < share
+                }
+
+        with bench_user() as user:
+            organization = Organization.objects.personal_for(user)
+            now = timezone.now()
+            start = time.perf_counter()
+            projects = Project.objects.bulk_create([
+                Project(user=user, organization=organization, name=f'bench-{index}', status='deployed')
+                for index in range(-(-options['services'] // options['per_project']))
+            ])
+            ProjectService.objects.bulk_create([
+                ProjectService(
+                    project=projects[index // options['per_project']], service_id=f's{index}',
+                    name=f'service {index}', status='running', deployed_at=now, next_status_check=now
+                )
+                for index in range(options['services'])
+            ], batch_size=2000)
+            self.stdout.write(
+                f'Created {options["services"]} deployed services in {time.perf_counter() - start:.1f}s'
+            )
+
+            reconciler = Reconciler(options['calls'], client_class=ChangingClient)
+            timings = Timings('reconcile pass')
+            checked = changed = 0
+            wall_start = time.perf_counter()
+            while checked < options['services']:
+                with timings.measure():
+                    stats = reconciler.run_once()
+                if not stats['checked']:
+                    break
+                checked += stats['checked']
+                changed += stats['changed']
+            timings.wall = time.perf_counter() - wall_start
+            self.stdout.write(timings.summary())
+            self.stdout.write(
+                f'{ChangingClient.calls} call(s) for {checked} service(s) '
+                f'({checked / max(1, ChangingClient.calls):.0f} per call, at most {options["calls"]} per pass); '
+                f'{changed} changed row(s) written'
+            )
+
@@ -0,0 +1,119 @@
+"""
+Benchmark search latency against a large index.
+
+Fills the index with ``--noise`` synthetic documents owned by other organizations
+(sharing the same vocabulary, so the owner filter is what narrows a query),
+creates ``--projects`` real projects with services for a throwaway user's
+organization,
+then times typeahead queries through SEARCH_BACKEND and through
+LikeBackend. The synthetic documents and the user are removed afterwards.
+
+Usage:
+    python manage.py bench_search
+    python manage.py bench_search --noise 1000000 --projects 500 --queries 500
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.models import Organization, Project, ProjectService
+from accounts.signals import rows_bulk_created
+from core.benchmarks import Timings, bench_user
+from core.search import LikeBackend, SQLiteFTSBackend, get_backend, search
+
+WORDS = [
+    'postgres', 'redis', 'nginx', 'worker', 'api', 'frontend', 'backend', 'cache', 'queue',
+    'analytics', 'billing', 'auth', 'gateway', 'search', 'mailer', 'cron', 'metrics', 'storage',
+    'staging', 'production', 'preview', 'node', 'python', 'django', 'rails', 'minio', 'mongo',
+]
+IMAGES = ['postgres:16', 'redis:7', 'nginx:latest', 'node:20-alpine', 'python:3.12-slim', 'minio/minio']
+
+# Synthetic documents use object IDs far above any real row
+NOISE_ID_BASE = 10 ** 12
+
+
+class Command(BaseCommand):
+    help = 'Measure search query latency with a large index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--noise', type=int, default=200000, help='Synthetic documents of other organizations')
+        parser.add_argument('--projects', type=int, default=200, help='Projects for the benchmark user')
+        parser.add_argument('--services', type=int, default=5, help='Services per project')
+        parser.add_argument('--queries', type=int, default=300, help='Queries per backend')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not isinstance(backend, SQLiteFTSBackend):
+            raise CommandError('bench_search needs SEARCH_BACKEND = core.search.SQLiteFTSBackend')
+        rng = random.Random(42)
+
+        start = time.perf_counter()
+        self.add_noise(backend, rng, options['noise'])
+        self.stdout.write(f'Indexed {options["noise"]} synthetic documents in {time.perf_counter() - start:.1f}s')
+
+        try:
+            with bench_user() as user:
+                start = time.perf_counter()
+                organization = Organization.objects.personal_for(user)
+                self.add_projects(organization, user, rng, options['projects'], options['services'])
+                self.stdout.write(
+                    f'Created {options["projects"]} projects x {options["services"]} services '
+                    f'(indexed via signals) in {time.perf_counter() - start:.1f}s'
+                )
+
+                queries = [self.query(rng) for _ in range(options['queries'])]
+                fts = Timings(f'fts5 ({options["noise"]} docs)')
+                like = Timings('like (model tables)')
+                hits = 0
+                for timings, run in ((fts, lambda q: search(organization, q)),
+                                     (like, lambda q: LikeBackend().query(organization.pk, q, 10))):
+                    wall_start = time.perf_counter()
+                    for query in queries:
+                        with timings.measure():
+                            hits += len(run(query))
+                    timings.wall = time.perf_counter() - wall_start
+                self.stdout.write(fts.summary())
+                self.stdout.write(like.summary())
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {backend.table} WHERE rowid >= %s', [NOISE_ID_BASE * 4])
+
+    def query(self, rng):
+        words = rng.sample(WORDS, rng.choice([1, 1, 2]))
+        # Typeahead: the last word is usually half-typed
+        words[-1] = words[-1][:rng.randint(2, len(words[-1]))]
+        return ' '.join(words)
+
+    def add_noise(self, backend, rng, count, batch_size=10000):
+        for offset in range(0, count, batch_size):
+            backend.index([
+                (
+                    'service', NOISE_ID_BASE + i, 1000000 + i % 5000,
+                    f'{rng.choice(WORDS)} {rng.choice(WORDS)}', rng.choice(IMAGES), None
+                )
+                for i in range(offset, min(count, offset + batch_size))
+            ])
+        # Merge the segments the batches left behind, as rebuild_search_index does
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {backend.table} ({backend.table}) VALUES ('optimize')")
+
+    def add_projects(self, organization, user, rng, projects, services):
+        created = Project.objects.bulk_create([
+            Project(
+                organization=organization, user=user, name=f'{rng.choice(WORDS)} {i}',
+                description=f'{rng.choice(WORDS)} stack'
+            )
+            for i in range(projects)
+        ])
+        rows_bulk_created.send(sender=Project, instances=created)
+        created = ProjectService.objects.bulk_create([
+            ProjectService(
+                project=project, service_id=f'service_{i}', name=f'{rng.choice(WORDS)}-{i}',
+                image=rng.choice(IMAGES)
+            )
+            for project in created
+            for i in range(services)
+        ])
+        rows_bulk_created.send(sender=ProjectService, instances=created)
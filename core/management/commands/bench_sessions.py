@@ -0,0 +1,103 @@
+"""
+Benchmark per-request queries of each session backend under concurrent load.
+
+Usage:
+    python manage.py bench_sessions --requests 1000 --concurrency 20
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+
+from accounts.models import Project, ProjectService
+from core.benchmarks import Timings, bench_user
+
+SESSION_BACKENDS = ['db', 'cached_db', 'cache', 'signed_cookies']
+
+
+class QueryCounter:
+    """Counts queries (and those touching django_session) across worker threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.total += 1
+            if 'django_session' in sql:
+                self.session += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compare session backends by queries per request on dashboard_view and get_project_services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and backend')
+        parser.add_argument('--concurrency', type=int, default=10, help='Concurrent client threads')
+        parser.add_argument(
+            '--backends', nargs='+', default=SESSION_BACKENDS, choices=SESSION_BACKENDS,
+            help='Session backends to compare'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        with bench_user() as user:
+            project = Project.objects.create(user=user, name='Bench Project')
+            ProjectService.objects.bulk_create([
+                ProjectService(project=project, service_id=f'service_{i}', name=f'Service {i}')
+                for i in range(10)
+            ])
+            endpoints = [
+                ('dashboard_view', '/dashboard/', {'HTTP_HX_REQUEST': 'true'}),
+                ('get_project_services', f'/project/{project.id}/services/', {}),
+            ]
+
+            for backend in options['backends']:
+                engine = f'django.contrib.sessions.backends.{backend}'
+                with override_settings(SESSION_ENGINE=engine):
+                    login_client = Client()
+                    login_client.force_login(user)
+                    self.stdout.write(self.style.MIGRATE_HEADING(backend))
+                    for name, url, headers in endpoints:
+                        timings, counter = self.run(
+                            login_client.cookies, url, headers,
+                            options['requests'], options['concurrency']
+                        )
+                        count = len(timings.samples) or 1
+                        self.stdout.write(
+                            f'  {name:<22} queries/req={counter.total / count:5.2f} '
+                            f'session queries/req={counter.session / count:5.2f}'
+                        )
+                        self.stdout.write('    ' + timings.summary())
+
+    def run(self, cookies, url, headers, total, concurrency):
+        timings = Timings(url)
+        counter = QueryCounter()
+
+        def worker(count):
+            client = Client(raise_request_exception=False)
+            client.cookies = cookies
+            with connection.execute_wrapper(counter):
+                for _ in range(count):
+                    with timings.measure():
+                        response = client.get(url, **headers)
+                    if response.status_code != 200:
+                        timings.errors += 1
+            close_old_connections()
+
+        shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, shares))
+        timings.wall = time.perf_counter() - start
+        return timings, counter
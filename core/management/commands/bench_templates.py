@@ -0,0 +1,101 @@
+"""
+Benchmark rendering the editor and dashboard partials from a cold and a warm
+template cache.
+
+Cold renders clear the template loaders first, so every render reads and
+compiles the template (and those it extends or includes) again, as the
+first requests of a worker without warm-up do. Warm renders reuse the
+compiled templates. Also times saas_platform.warmup.warm_templates.
+
+Run with DEBUG=False for the production template profile.
+
+Usage:
+    python manage.py bench_templates
+    python manage.py bench_templates --renders 200 --projects 50
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.autoreload import reset_loaders
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from accounts.models import Project, ProjectService, RailwaySettings, Template
+from accounts.signals import rows_bulk_created
+from accounts.usage import usage_for_user
+from core.benchmarks import Timings, bench_user
+from saas_platform.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = 'Measure cold and warm render times of the editor and dashboard partials'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=100, help='Timed renders per partial and cache state')
+        parser.add_argument('--projects', type=int, default=20, help='Projects on the dashboard')
+
+    def handle(self, *args, **options):
+        loaders = [type(loader).__module__ for loader in engines['django'].engine.template_loaders]
+        self.stdout.write(f'Template loaders: {", ".join(loaders)}')
+
+        with bench_user() as user:
+            projects = [
+                Project.objects.create(user=user, name=f'Bench Project {i}') for i in range(options['projects'])
+            ]
+            services = ProjectService.objects.bulk_create([
+                ProjectService(project=project, service_id=f'service_{i}', name=f'Service {i}')
+                for project in projects
+                for i in range(3)
+            ])
+            rows_bulk_created.send(sender=ProjectService, instances=services)
+            template = Template.objects.create(user=user, name='Bench Template')
+
+            request = RequestFactory().get('/')
+            request.user = user
+            project = projects[0]
+            cases = [
+                ('dashboard_content', 'core/partials/dashboard_content.html', {
+                    'user': user,
+                    'projects': list(Project.objects.filter(user=user).select_related('usage')),
+                    'usage': usage_for_user(user),
+                }),
+                ('project_editor', 'core/partials/project_editor.html', {
+                    'project': project,
+                    'project_id': project.id,
+                    'project_name': project.name,
+                    'project_description': project.description or '',
+                    'settings': RailwaySettings.objects.for_user(user),
+                    'is_project': True,
+                }),
+                ('template_editor', 'accounts/partials/template_editor.html', {
+                    'template_action': 'create',
+                    'template_id': template.id,
+                    'active_tab': 'template',
+                    'template_name': template.name,
+                    'template_description': '',
+                    'settings': RailwaySettings.objects.for_user(user),
+                }),
+            ]
+
+            for label, template_name, context in cases:
+                cold = Timings(f'{label} (cold)')
+                warm = Timings(f'{label} (warm)')
+                for _ in range(options['renders']):
+                    reset_loaders()
+                    with cold.measure():
+                        render_to_string(template_name, context, request=request)
+                render_to_string(template_name, context, request=request)
+                for _ in range(options['renders']):
+                    with warm.measure():
+                        render_to_string(template_name, context, request=request)
+                for timings in (cold, warm):
+                    timings.wall = sum(timings.samples)
+                    self.stdout.write(timings.summary())
+
+            reset_loaders()
+            start = time.perf_counter()
+            compiled = warm_templates()
+            self.stdout.write(
+                f'warm_templates compiled {compiled} template(s) in {(time.perf_counter() - start) * 1000:.1f}ms'
+            )
@@ -0,0 +1,32 @@
+"""
+Apply retention to deployment logs: delete stale logs, cap the rest.
+
+Background task workers already queue this every DEPLOY_LOG_COMPACT_INTERVAL
+seconds (accounts.tasks.schedule_periodic); run it by hand to apply other
+limits or when no worker is running.
+
+Usage:
+    python manage.py compact_deploy_logs
+    python manage.py compact_deploy_logs --max-mb 20 --max-age-days 7
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.logstore import compact_logs
+
+
+class Command(BaseCommand):
+    help = 'Delete deployment logs past retention and cap each remaining log at its byte limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-mb', type=float, default=None,
+                            help='Per-deployment cap (default: DEPLOY_LOG_MAX_BYTES)')
+        parser.add_argument('--max-age-days', type=int, default=None,
+                            help='Delete logs untouched this long (default: DEPLOY_LOG_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        max_bytes = int(options['max_mb'] * 1024 * 1024) if options['max_mb'] is not None else None
+        deleted, freed = compact_logs(max_bytes=max_bytes, max_age_days=options['max_age_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} log(s), freed {freed / 1024 / 1024:.1f} MB in {settings.DEPLOY_LOG_ROOT}'
+        ))
@@ -0,0 +1,40 @@
+"""
+Show (and optionally execute) the deploy plan of a project.
+
+Usage:
+    python manage.py deploy_plan 42
+    python manage.py deploy_plan 42 --apply
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Project
+from core.planner import NOOP, build_plan, execute_plan
+
+
+class Command(BaseCommand):
+    help = 'Print which services a deploy would create, update or delete; --apply executes it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int)
+        parser.add_argument('--apply', action='store_true', help='Execute the pending changes')
+        parser.add_argument('--all', action='store_true', help='Also list unchanged services')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project_id'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project {options['project_id']} does not exist")
+
+        plan = build_plan(project)
+        for change in plan.changes:
+            if change['action'] != NOOP or options['all']:
+                self.stdout.write(f"  {change['action']:<7} {change['service_id']:<24} {change['name']}")
+        summary = ', '.join(f'{count} {action}' for action, count in plan.summary().items())
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{project.name}: {summary}'))
+
+        if options['apply'] and plan.pending:
+            results = execute_plan(plan)
+            failed = [service_id for service_id, result in results.items() if result != 'succeeded']
+            if failed:
+                raise CommandError(f"Deploy incomplete: {', '.join(sorted(failed))}")
+            self.stdout.write(self.style.SUCCESS(f'Deployed {len(results)} service change(s)'))
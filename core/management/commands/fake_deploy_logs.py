@@ -0,0 +1,70 @@
+"""
+Write synthetic build/deploy output into a deployment log.
+
+Drives the log endpoints without Railway: point a ProjectService's
+railway_deployment_id at the same ID and open its logs/stream/ URL.
+
+Usage:
+    python manage.py fake_deploy_logs dep-123 --lines 100000
+    python manage.py fake_deploy_logs dep-123 --lines 600 --rate 20
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.logstore import get_log
+
+STEPS = [
+    'Pulling image layer {hash}',
+    'Step {step}/24 : RUN pip install -r requirements.txt',
+    'Collecting package-{step}==1.{step}.0',
+    'Successfully built {hash}',
+    'Healthcheck GET /health -> 200 ({ms}ms)',
+    'Starting worker pid={pid}',
+    'INFO  request completed status=200 duration={ms}ms',
+]
+
+
+def fake_lines(count, seed=None):
+    """Yield ``count`` plausible, timestamped log lines"""
+    rng = random.Random(seed)
+    for number in range(count):
+        template = STEPS[min(number * len(STEPS) // max(count, 1), len(STEPS) - 1)]
+        message = template.format(
+            hash=f'{rng.getrandbits(48):012x}', step=rng.randint(1, 24),
+            ms=rng.randint(2, 900), pid=rng.randint(100, 9999)
+        )
+        yield f'{time.strftime("%Y-%m-%dT%H:%M:%S")} {message}'
+
+
+class Command(BaseCommand):
+    help = 'Append fake log lines to a deployment log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deployment_id')
+        parser.add_argument('--lines', type=int, default=1000, help='Lines to write')
+        parser.add_argument('--rate', type=float, default=0, help='Lines per second (0: as fast as possible)')
+        parser.add_argument('--batch', type=int, default=500, help='Lines per append when not rate-limited')
+
+    def handle(self, *args, **options):
+        log = get_log(options['deployment_id'])
+        start = time.perf_counter()
+        batch = []
+        for line in fake_lines(options['lines']):
+            if options['rate']:
+                log.append([line])
+                time.sleep(1 / options['rate'])
+                continue
+            batch.append(line)
+            if len(batch) >= options['batch']:
+                log.append(batch)
+                batch = []
+        if batch:
+            log.append(batch)
+
+        first, end = log.bounds()
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["lines"]} line(s) in {time.perf_counter() - start:.2f}s; '
+            f'log holds lines {first}-{end - 1}, {log.size() / 1024:.0f} KB on disk'
+        ))
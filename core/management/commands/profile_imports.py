@@ -0,0 +1,133 @@
+"""
+Report where a cold process spends its start-up time.
+
+Starts fresh interpreters that load WSGI_APPLICATION and serve it one
+request, the way a new worker does. One runs under ``python -X importtime``
+and its imports are printed as a tree (cumulative milliseconds, children
+under their parents); the others only time the phases, and their medians
+are reported.
+
+Usage:
+    python manage.py profile_imports
+    python manage.py profile_imports --path /accounts/login/ --min-ms 2 --depth 6
+    python manage.py profile_imports --runs 10 --module accounts --module core
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in the child: the phases a worker goes through before its first response
+CHILD = '''
+import io, json, os, sys, time
+start = time.perf_counter()
+os.environ['DJANGO_SETTINGS_MODULE'] = {settings_module!r}
+from django.utils.module_loading import import_string
+application = import_string({wsgi_application!r})
+ready = time.perf_counter()
+sys.stderr.write({marker!r} + '\\n')
+environ = {{
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': {path!r}, 'QUERY_STRING': '',
+    'SERVER_NAME': {host!r}, 'SERVER_PORT': '80', 'HTTP_HOST': {host!r},
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+}}
+status = []
+response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+b''.join(response)
+done = time.perf_counter()
+print(json.dumps({{'startup': ready - start, 'first_request': done - ready, 'status': status[0]}}))
+'''
+
+MARKER = '--- first request'
+
+
+class ImportNode:
+    """One line of ``-X importtime`` output and the imports it triggered"""
+
+    def __init__(self, name, self_us, cumulative_us):
+        self.name = name
+        self.self_ms = self_us / 1000
+        self.cumulative_ms = cumulative_us / 1000
+        self.children = []
+
+
+def import_lines(lines):
+    return [line for line in lines if line.startswith('import time:') and 'self [us]' not in line]
+
+
+def parse_importtime(lines):
+    """Build import trees from ``-X importtime`` lines (children come before their parent)"""
+    pending = {}
+    for line in lines:
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        node = ImportNode(name.strip(), int(self_us), int(cumulative_us))
+        node.children = pending.pop(depth + 1, [])
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+class Command(BaseCommand):
+    help = 'Show the import-time tree and start-up phases of a cold worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Path of the first request')
+        parser.add_argument('--runs', type=int, default=5, help='Cold processes timed for the medians')
+        parser.add_argument('--min-ms', type=float, default=5.0, help='Hide imports cheaper than this (cumulative)')
+        parser.add_argument('--depth', type=int, default=4, help='Levels of the tree to show')
+        parser.add_argument(
+            '--module', action='append', default=[],
+            help='Only show trees of these top-level packages (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost').lstrip('.')
+        code = CHILD.format(
+            settings_module=os.environ['DJANGO_SETTINGS_MODULE'], wsgi_application=settings.WSGI_APPLICATION,
+            marker=MARKER, path=options['path'], host=host
+        )
+
+        startup, first_request = [], []
+        for _ in range(options['runs']):
+            result = self.run_child(code)
+            startup.append(result['startup'])
+            first_request.append(result['first_request'])
+        result, stderr = self.run_child(code, importtime=True)
+
+        self.stdout.write(
+            f"Cold process, median of {options['runs']}: start-up {statistics.median(startup) * 1000:.0f}ms, "
+            f"first request to {options['path']} {statistics.median(first_request) * 1000:.0f}ms "
+            f"({result['status']})"
+        )
+        lines = stderr.splitlines()
+        split = lines.index(MARKER) if MARKER in lines else len(lines)
+        for title, phase in (('Start-up', lines[:split]), ('First request', lines[split + 1:])):
+            phase = import_lines(phase)
+            roots = parse_importtime(phase)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{title}: {len(phase)} modules imported, {sum(node.cumulative_ms for node in roots):.0f}ms'
+            ))
+            if options['module']:
+                roots = [node for node in roots if node.name.split('.')[0] in options['module']]
+            self.write_tree(roots, options['min_ms'], options['depth'], 1)
+
+    def run_child(self, code, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code]
+        process = subprocess.run(command, capture_output=True, text=True, cwd=settings.BASE_DIR)
+        if process.returncode:
+            raise CommandError(f'The child process failed:\n{process.stderr[-2000:]}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        return (result, process.stderr) if importtime else result
+
+    def write_tree(self, nodes, min_ms, depth, level):
+        if level > depth:
+            return
+        for node in sorted(nodes, key=lambda node: node.cumulative_ms, reverse=True):
+            if node.cumulative_ms < min_ms:
+                continue
+            self.stdout.write(f'{"  " * level}{node.cumulative_ms:8.1f}ms  {node.name}  (self {node.self_ms:.1f}ms)')
+            self.write_tree(node.children, min_ms, depth, level + 1)
@@ -0,0 +1,23 @@
+"""
+Rebuild the search index (core.search) from the projects, services and
+templates tables, on every tenant database.
+
+Only needed after writes that bypass the model signals (raw SQL, loaddata
+--raw) or to compact the index; normal saves and deletes keep it in sync.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Re-index every project, service and template for search'
+
+    def handle(self, *args, **options):
+        # One transaction per tenant database
+        get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index ({settings.SEARCH_BACKEND})'))
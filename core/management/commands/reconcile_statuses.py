@@ -0,0 +1,41 @@
+"""
+Poll Railway for the state of deployed services (core.reconciler).
+
+Runs a pass every ``--interval`` seconds, each making at most its share of
+RAILWAY_STATUS_CALLS_PER_MINUTE calls.
+
+Usage:
+    python manage.py reconcile_statuses
+    python manage.py reconcile_statuses --interval 5
+    python manage.py reconcile_statuses --once
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.reconciler import Reconciler
+
+
+class Command(BaseCommand):
+    help = "Sync deployed services' status/public_url and their projects' status from Railway"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between passes')
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        max_calls = max(1, int(settings.RAILWAY_STATUS_CALLS_PER_MINUTE * interval / 60))
+        reconciler = Reconciler(max_calls)
+        while True:
+            started = time.monotonic()
+            stats = reconciler.run_once()
+            if options['verbosity'] > 1 or options['once']:
+                self.stdout.write(
+                    f"{stats['calls']} call(s): {stats['checked']} service(s) checked, "
+                    f"{stats['changed']} changed, {stats['projects']} project(s) updated"
+                )
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
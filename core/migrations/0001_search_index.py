@@ -0,0 +1,60 @@
+# FTS5 table behind core.search.SQLiteFTSBackend, filled from the existing
+# projects, services and templates. Other databases use
+# SEARCH_BACKEND='core.search.LikeBackend' and skip it.
+
+from django.db import migrations
+
+TABLE = 'search_index'
+
+
+def populate(apps, cursor, owner):
+    # Frozen copy of core.search.populate_fts_index at the time of this
+    # migration: rowid is obj_id * 4 + type code (1 project, 2 service, 3 template)
+    projects = apps.get_model('accounts', 'Project')._meta.db_table
+    services = apps.get_model('accounts', 'ProjectService')._meta.db_table
+    templates = apps.get_model('accounts', 'Template')._meta.db_table
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + 1, '{owner[0]}' || {owner}_id, name, COALESCE(description, ''), NULL "
+        f"FROM {projects}"
+    )
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT s.id * 4 + 2, '{owner[0]}' || p.{owner}_id, s.name, COALESCE(s.image, ''), s.project_id "
+        f"FROM {services} s JOIN {projects} p ON p.id = s.project_id"
+    )
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + 3, '{owner[0]}' || {owner}_id, name, COALESCE(description, ''), NULL "
+        f"FROM {templates}"
+    )
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"owner, title, body, parent_id UNINDEXED, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        populate(apps, cursor, owner='user')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_compress_json_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,50 @@
+# Documents are owned by organizations now: re-index with organization tokens
+
+from django.db import migrations
+
+TABLE = 'search_index'
+
+
+def populate(apps, cursor, owner):
+    # Frozen copy of core.search.populate_fts_index at the time of this
+    # migration: rowid is obj_id * 4 + type code (1 project, 2 service, 3 template)
+    projects = apps.get_model('accounts', 'Project')._meta.db_table
+    services = apps.get_model('accounts', 'ProjectService')._meta.db_table
+    templates = apps.get_model('accounts', 'Template')._meta.db_table
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + 1, '{owner[0]}' || {owner}_id, name, COALESCE(description, ''), NULL "
+        f"FROM {projects}"
+    )
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT s.id * 4 + 2, '{owner[0]}' || p.{owner}_id, s.name, COALESCE(s.image, ''), s.project_id "
+        f"FROM {services} s JOIN {projects} p ON p.id = s.project_id"
+    )
+    cursor.execute(
+        f"INSERT INTO {TABLE} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + 3, '{owner[0]}' || {owner}_id, name, COALESCE(description, ''), NULL "
+        f"FROM {templates}"
+    )
+
+
+def reindex(owner):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            populate(apps, cursor, owner)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_search_index'),
+        ('accounts', '0012_organization'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex('organization'), reindex('user')),
+    ]
@@ -0,0 +1,297 @@
+"""
+Desired-state deploy planning for a project's services.
+
+Each deploy records a content hash of every service's deployable config in
+DeployedServiceState. A plan compares the current ProjectService rows with
+those hashes and yields one action per service:
+
+    create  - no deployed state yet
+    update  - config hash differs from the deployed one
+    delete  - deployed, but the service is gone from the canvas
+    noop    - unchanged
+
+Only create/update/delete actions are executed, so changing one variable in
+a 50-service project redeploys one service.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import DeployedServiceState, Project, ProjectService, RailwaySettings
+from accounts.railway_config import compile_service
+
+from .dependencies import DeploymentScheduler, project_edges
+from .reconciler import SERVICE_FIELDS, next_check
+
+# Fields whose change requires redeploying the service
+DEPLOY_FIELDS = (
+    'image', 'cpu', 'memory', 'variables', 'networking',
+    'registry_username', 'registry_password',
+)
+
+CREATE, UPDATE, DELETE, NOOP = 'create', 'update', 'delete', 'noop'
+
+
+def config_hash(values):
+    """SHA-256 of the canonical JSON of a service's DEPLOY_FIELDS"""
+    config = {field: values.get(field) for field in DEPLOY_FIELDS}
+    payload = json.dumps(config, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DeployPlan:
+    """The actions needed to bring a project's deployment up to date"""
+
+    def __init__(self, project, changes):
+        self.project = project
+        self.changes = changes
+
+    @property
+    def pending(self):
+        return [change for change in self.changes if change['action'] != NOOP]
+
+    def summary(self):
+        counts = {CREATE: 0, UPDATE: 0, DELETE: 0, NOOP: 0}
+        for change in self.changes:
+            counts[change['action']] += 1
+        return counts
+
+    def to_dict(self):
+        return {
+            'project_id': self.project.id,
+            'summary': self.summary(),
+            'changes': self.changes,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a plan from ``to_dict()`` output, e.g. in a background task"""
+        return cls(Project.objects.get(pk=data['project_id']), data['changes'])
+
+
+def build_plan(project):
+    """Diff the project's services against their last deployed state (two queries)"""
+    deployed = {
+        state.service_id: state
+        for state in DeployedServiceState.objects.filter(project=project)
+    }
+    rows = ProjectService.objects.filter(project=project).values(
+        'service_id', 'name', *DEPLOY_FIELDS
+    )
+
+    changes = []
+    for row in rows:
+        digest = config_hash(row)
+        state = deployed.pop(row['service_id'], None)
+        if state is None:
+            action = CREATE
+        elif state.config_hash != digest:
+            action = UPDATE
+        else:
+            action = NOOP
+        changes.append({
+            'service_id': row['service_id'],
+            'name': row['name'],
+            'action': action,
+            'config_hash': digest,
+        })
+
+    for service_id, state in deployed.items():
+        changes.append({
+            'service_id': service_id,
+            'name': service_id,
+            'action': DELETE,
+            'config_hash': state.config_hash,
+            'railway_service_id': state.railway_service_id,
+        })
+    return DeployPlan(project, changes)
+
+
+# =============================================================================
+# EXECUTION
+# =============================================================================
+
+class RecordingDeployer:
+    """
+    Default deployer: accepts every change without calling Railway.
+
+    Swap in a real client with the ``RAILWAY_DEPLOYER`` setting (a dotted path
+    to a class taking the project). ``deploy(service, config)`` gets the
+    service's compiled serializedConfig entry and returns the Railway service ID
+    (or True) once Railway accepted it and a falsy value on failure; the
+    service is then still deploying (see wait_until_running). ``destroy``
+    removes a service that is no longer on the canvas. Both run on scheduler
+    threads and should not write to the database; execute_plan records the
+    outcome.
+    """
+
+    def __init__(self, project):
+        self.project = project
+
+    def deploy(self, service, config):
+        return service.railway_service_id or True
+
+    def destroy(self, service_id, railway_service_id):
+        return True
+
+
+def get_deployer(project):
+    return import_string(settings.RAILWAY_DEPLOYER)(project)
+
+
+def get_status_client(project):
+    """The RAILWAY_STATUS_CLIENT (core.reconciler) for the project owner's workspace"""
+    workspace_id, token = RailwaySettings.objects.filter(user_id=project.user_id).values_list(
+        'railway_workspace_id', 'railway_token'
+    ).first() or (None, None)
+    return import_string(settings.RAILWAY_STATUS_CLIENT)(workspace_id, token)
+
+
+def wait_until_running(client, service, railway_service_id):
+    """
+    Poll ``client`` until the just-deployed ``service`` runs, fails or
+    DEPLOY_HEALTH_TIMEOUT passes. Returns the last state seen
+    (``{'status': ..., 'public_url': ...}``) or None.
+    """
+    row = {field: getattr(service, field) for field in SERVICE_FIELDS}
+    row.update(status='deploying', railway_service_id=railway_service_id or service.railway_service_id)
+    deadline = time.monotonic() + settings.DEPLOY_HEALTH_TIMEOUT
+    state = None
+    while True:
+        try:
+            state = client.fetch([row]).get(service.pk) or state
+        except Exception:
+            pass
+        if state and state['status'] in ('running', 'failed', 'stopped'):
+            return state
+        if time.monotonic() >= deadline:
+            return state
+        time.sleep(settings.DEPLOY_HEALTH_POLL_INTERVAL)
+
+
+def execute_plan(plan, deployer=None, max_workers=8, on_change=None):
+    """
+    Execute the pending actions of ``plan``.
+
+    Creates and updates run through DeploymentScheduler in dependency order.
+    A service others depend on only counts as succeeded once the status
+    client reports it running, so its dependents start on a healthy service
+    rather than one Railway merely accepted; the rest are left deploying for
+    core.reconciler. The hash recorded for each service is the one it was
+    planned with, so an edit made while deploying shows up in the next plan.
+    Returns
+    ``{service_id: 'succeeded'|'failed'|'skipped'}`` for every pending action.
+    """
+    project = plan.project
+    deployer = deployer or get_deployer(project)
+    planned = {change['service_id']: change for change in plan.pending}
+    results = {}
+
+    deletes = [change for change in planned.values() if change['action'] == DELETE]
+    for change in deletes:
+        try:
+            ok = deployer.destroy(change['service_id'], change.get('railway_service_id'))
+        except Exception:
+            ok = False
+        if ok:
+            DeployedServiceState.objects.filter(project=project, service_id=change['service_id']).delete()
+        results[change['service_id']] = 'succeeded' if ok else 'failed'
+        if on_change:
+            on_change(change, results[change['service_id']])
+
+    upserts = [service_id for service_id, change in planned.items() if change['action'] != DELETE]
+    services = {
+        service.service_id: service
+        for service in ProjectService.objects.filter(project=project, service_id__in=upserts)
+    }
+    deployed = {}
+    observed = {}
+    edges = project_edges(project)
+    prerequisites = {depends_on for deps in edges.values() for depends_on in deps}
+    status_client = get_status_client(project) if prerequisites & set(services) else None
+
+    def deploy(service_id):
+        try:
+            service = services[service_id]
+            railway_service_id = deployer.deploy(service, compile_service(service, credentials=True))
+        finally:
+            # Scheduler threads open their own connections
+            connection.close()
+        if not railway_service_id:
+            return False
+        deployed[service_id] = railway_service_id if isinstance(railway_service_id, str) else None
+        if service_id not in prerequisites:
+            return True
+        state = wait_until_running(status_client, service, deployed[service_id])
+        if state:
+            observed[service_id] = state
+        return bool(state) and state['status'] == 'running'
+
+    scheduled = DeploymentScheduler(deploy, max_workers=max_workers).run(
+        [service_id for service_id in upserts if service_id in services],
+        edges
+    )
+
+    # Record outcomes from this thread in bulk (SQLite rejects concurrent writers)
+    if deployed:
+        now = timezone.now()
+        DeployedServiceState.objects.bulk_create(
+            [
+                DeployedServiceState(
+                    project=project,
+                    service_id=service_id,
+                    railway_service_id=railway_service_id,
+                    config_hash=planned[service_id]['config_hash'],
+                    deployed_at=now
+                )
+                for service_id, railway_service_id in deployed.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['project', 'service_id'],
+            update_fields=['railway_service_id', 'config_hash', 'deployed_at']
+        )
+        # Railway builds and starts the services from here; core.reconciler
+        # picks up their status from the next pass on (or from the state
+        # seen while their dependents waited)
+        for service_id, railway_service_id in deployed.items():
+            service = services[service_id]
+            service.deployed_at = now
+            if service_id in observed:
+                service.status = observed[service_id]['status']
+                service.public_url = observed[service_id].get('public_url')
+                service.next_status_check = next_check(service.status, now)
+            else:
+                service.status = 'deploying'
+                service.next_status_check = now
+            if railway_service_id:
+                service.railway_service_id = railway_service_id
+        ProjectService.objects.bulk_update(
+            [services[service_id] for service_id in deployed],
+            ['deployed_at', 'status', 'public_url', 'next_status_check', 'railway_service_id']
+        )
+
+    for service_id in upserts:
+        results[service_id] = scheduled.get(service_id, 'failed')
+        if on_change:
+            on_change(planned[service_id], results[service_id])
+
+    if results:
+        failed = any(result != 'succeeded' for result in results.values())
+        Project.objects.filter(pk=project.pk).update(
+            status='failed' if failed else 'deployed',
+            deployed_at=timezone.now()
+        )
+    return results
+
+
+def deploy_task(task, plan_data):
+    """BackgroundTask body for accounts.tasks.enqueue: execute a viewed plan (as ``to_dict()``)"""
+    plan = DeployPlan.from_dict(plan_data)
+    results = execute_plan(plan, on_change=lambda change, result: task.advance())
+    failed = sum(1 for result in results.values() if result != 'succeeded')
+    return f"{len(results) - failed} of {len(results)} service change(s) deployed."
@@ -0,0 +1,203 @@
+"""
+Keep deployed services' status and public_url, and their projects' status,
+in sync with Railway.
+
+Every deployed ProjectService has a ``next_status_check``. A reconciler pass
+takes the services that are due, most overdue first, groups them by the
+Railway workspace and token of their project's owner and asks the status
+client about up to ``batch_size`` of them per call. Rows whose status or URL
+changed are written with one bulk_update; the others only have their next
+check moved, with one UPDATE per status. How soon that next check is depends
+on the status (POLL_INTERVALS): seconds while a service builds or deploys,
+minutes once it runs, never once it failed or stopped (until it is
+deployed again).
+
+A pass makes at most ``max_calls`` calls, so the API load is bounded however
+many services there are: RAILWAY_STATUS_CALLS_PER_MINUTE x batch_size
+services per minute. When more are due, the most overdue go first and the
+rest wait for the next pass.
+"""
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import Project, ProjectService, RailwaySettings
+from accounts.routers import tenant_databases
+
+logger = logging.getLogger(__name__)
+
+# Seconds until a service is checked again, by the status it was last seen
+# in. Statuses not listed are final: the next deploy resumes polling.
+POLL_INTERVALS = {
+    'pending': 15,
+    'building': 10,
+    'deploying': 10,
+    'running': 300,
+}
+
+# Railway deployment statuses as ProjectService statuses, for clients
+RAILWAY_STATUSES = {
+    'QUEUED': 'pending',
+    'WAITING': 'pending',
+    'INITIALIZING': 'building',
+    'BUILDING': 'building',
+    'DEPLOYING': 'deploying',
+    'SUCCESS': 'running',
+    'SLEEPING': 'running',
+    'FAILED': 'failed',
+    'CRASHED': 'failed',
+    'REMOVED': 'stopped',
+    'SKIPPED': 'stopped',
+}
+
+# Columns the status client gets for each service
+SERVICE_FIELDS = ('pk', 'project_id', 'service_id', 'railway_service_id', 'status', 'public_url')
+
+
+class RecordingStatusClient:
+    """
+    Default status client: reports every deployed service as running
+    without calling Railway (the counterpart of planner.RecordingDeployer).
+
+    Swap in a real client with the ``RAILWAY_STATUS_CLIENT`` setting (a
+    dotted path to a class taking the workspace ID and token).
+    ``fetch(services)`` gets up to ``batch_size`` dicts of SERVICE_FIELDS
+    and returns ``{pk: {'status': ..., 'public_url': ...}}``; services it
+    leaves out are taken as unchanged.
+    """
+    batch_size = 100
+
+    def __init__(self, workspace_id, token):
+        self.workspace_id = workspace_id
+        self.token = token
+
+    def fetch(self, services):
+        return {
+            service['pk']: {'status': 'running', 'public_url': service['public_url']}
+            for service in services
+        }
+
+
+def next_check(status, now):
+    """When a service last seen in ``status`` is due again (None: not polled)"""
+    interval = POLL_INTERVALS.get(status)
+    if interval is None:
+        return None
+    # Jitter keeps services deployed together from staying due together
+    return now + timedelta(seconds=interval * random.uniform(0.9, 1.1))
+
+
+def project_status(statuses):
+    """A project's status from the statuses of its deployed services"""
+    statuses = set(statuses)
+    if 'failed' in statuses:
+        return 'failed'
+    if statuses & {'pending', 'building', 'deploying'}:
+        return 'deploying'
+    if statuses == {'stopped'}:
+        return 'stopped'
+    return 'deployed'
+
+
+class Reconciler:
+    """One or more passes over the due services of every tenant database"""
+
+    def __init__(self, max_calls, client_class=None):
+        self.max_calls = max_calls
+        self.client_class = client_class or import_string(settings.RAILWAY_STATUS_CLIENT)
+
+    def run_once(self, now=None):
+        """One pass; returns counts of calls made and services checked/changed"""
+        now = now or timezone.now()
+        stats = {'calls': 0, 'checked': 0, 'changed': 0, 'projects': 0}
+        for database in tenant_databases():
+            if stats['calls'] >= self.max_calls:
+                break
+            self.reconcile(database, now, stats)
+        return stats
+
+    def reconcile(self, database, now, stats):
+        batch_size = self.client_class.batch_size
+        due = list(
+            ProjectService.unscoped.using(database)
+            .filter(next_status_check__lte=now)
+            .order_by('next_status_check')
+            .values(*SERVICE_FIELDS, 'project__user_id')[:(self.max_calls - stats['calls']) * batch_size]
+        )
+        if not due:
+            return
+
+        # Tokens live with the users on the default database
+        credentials = {
+            user_id: (workspace_id, token)
+            for user_id, workspace_id, token in RailwaySettings.objects.filter(
+                user_id__in={service['project__user_id'] for service in due}
+            ).values_list('user_id', 'railway_workspace_id', 'railway_token')
+        }
+        groups = defaultdict(list)
+        for service in due:
+            groups[credentials.get(service['project__user_id'], (None, None))].append(service)
+
+        changed = []
+        unchanged = defaultdict(list)
+        for (workspace_id, token), services in groups.items():
+            client = self.client_class(workspace_id, token)
+            for start in range(0, len(services), batch_size):
+                if stats['calls'] >= self.max_calls:
+                    # Still due; the next pass takes them first
+                    break
+                batch = services[start:start + batch_size]
+                stats['calls'] += 1
+                try:
+                    found = client.fetch(batch)
+                except Exception:
+                    logger.exception('Fetching service statuses for workspace %s failed', workspace_id)
+                    found = {}
+                stats['checked'] += len(batch)
+                for service in batch:
+                    state = found.get(service['pk'])
+                    if state and (state['status'], state.get('public_url')) != (service['status'], service['public_url']):
+                        changed.append(ProjectService(
+                            pk=service['pk'],
+                            project_id=service['project_id'],
+                            status=state['status'],
+                            public_url=state.get('public_url'),
+                            next_status_check=next_check(state['status'], now)
+                        ))
+                    else:
+                        unchanged[service['status']].append(service['pk'])
+
+        if changed:
+            ProjectService.unscoped.using(database).bulk_update(
+                changed, ['status', 'public_url', 'next_status_check'], batch_size=500
+            )
+            stats['changed'] += len(changed)
+            stats['projects'] += self.roll_up(database, {service.project_id for service in changed})
+        for status, pks in unchanged.items():
+            for start in range(0, len(pks), 500):
+                ProjectService.unscoped.using(database).filter(pk__in=pks[start:start + 500]).update(
+                    next_status_check=next_check(status, now)
+                )
+
+    def roll_up(self, database, project_ids):
+        """Recompute the status of ``project_ids``; returns how many changed"""
+        statuses = defaultdict(list)
+        rows = ProjectService.unscoped.using(database).filter(
+            project_id__in=project_ids, deployed_at__isnull=False
+        ).values_list('project_id', 'status')
+        for project_id, status in rows:
+            statuses[project_id].append(status)
+
+        projects = []
+        for project in Project.unscoped.using(database).filter(pk__in=statuses).only('pk', 'status'):
+            status = project_status(statuses[project.pk])
+            if project.status != status:
+                project.status = status
+                projects.append(project)
+        Project.unscoped.using(database).bulk_update(projects, ['status'], batch_size=500)
+        return len(projects)
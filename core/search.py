@@ -0,0 +1,287 @@
+"""
+Search over an organization's projects, project services and templates.
+
+Each document is a ``(doc_type, obj_id)`` with an owner, a title and a body:
+
+    project   name / description
+    service   name / image            (parent_id: the project)
+    template  name / description
+
+The backend is chosen by the ``SEARCH_BACKEND`` setting. SQLiteFTSBackend
+keeps an FTS5 table (created by core's 0001 migration) with the owning
+organization as an indexed token, so a query only walks the postings of
+that organization's matching terms; every term is a prefix match for typeahead. LikeBackend
+queries the model tables directly and works on any database.
+
+Every tenant database (accounts.routers) has its own index, next to the
+rows it describes: primary keys are only unique within a database, and an
+organization's documents move with it. The index is kept in sync by
+core.signals. Rows it may still hold after a soft delete (a bare UPDATE) are
+dropped by ``search()``, which re-checks the hits against the live tables.
+"""
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from accounts.models import Project, ProjectService, Template
+from accounts.routers import tenant_databases
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# The FTS rowid is ``obj_id * 4 + type code`` (unique within the index of
+# one database), so replacing or removing a document is a rowid lookup
+# rather than a scan of the unindexed columns
+DOC_TYPES = {'project': 1, 'service': 2, 'template': 3}
+DOC_TYPE_NAMES = {code: name for name, code in DOC_TYPES.items()}
+
+
+def doc_rowid(doc_type, obj_id):
+    return obj_id * 4 + DOC_TYPES[doc_type]
+
+
+def owner_token(organization_id):
+    return f'o{int(organization_id)}'
+
+
+def populate_fts_index(cursor, table, project_model, service_model, template_model, owner='organization'):
+    """
+    Fill ``table`` with every project, service and template in three
+    INSERT ... SELECTs (core/migrations keep frozen copies of it).
+
+    ``owner`` is the column documents are owned by: 'organization', or
+    'user' for the index as it was before organizations existed.
+    """
+    projects = project_model._meta.db_table
+
+    def token(alias=''):
+        # e.g. 'o' || organization_id, the SQL twin of owner_token()
+        return f"'{owner[0]}' || {alias}{owner}_id"
+
+    cursor.execute(
+        f"INSERT INTO {table} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + {DOC_TYPES['project']}, {token()}, name, COALESCE(description, ''), NULL "
+        f"FROM {projects}"
+    )
+    cursor.execute(
+        f"INSERT INTO {table} (rowid, owner, title, body, parent_id) "
+        f"SELECT s.id * 4 + {DOC_TYPES['service']}, {token('p.')}, s.name, COALESCE(s.image, ''), "
+        f"s.project_id "
+        f"FROM {service_model._meta.db_table} s JOIN {projects} p ON p.id = s.project_id"
+    )
+    cursor.execute(
+        f"INSERT INTO {table} (rowid, owner, title, body, parent_id) "
+        f"SELECT id * 4 + {DOC_TYPES['template']}, {token()}, name, COALESCE(description, ''), NULL "
+        f"FROM {template_model._meta.db_table}"
+    )
+
+
+class SearchHit:
+    """One ranked result"""
+
+    def __init__(self, doc_type, obj_id, title, subtitle='', parent_id=None):
+        self.doc_type = doc_type
+        self.obj_id = obj_id
+        self.title = title
+        self.subtitle = subtitle
+        self.parent_id = parent_id
+
+    @property
+    def project_id(self):
+        """Project to open for this hit (None for templates)"""
+        if self.doc_type == 'project':
+            return self.obj_id
+        return self.parent_id
+
+    def __repr__(self):
+        return f'<SearchHit {self.doc_type}:{self.obj_id} {self.title!r}>'
+
+
+def document_for(instance):
+    """``(doc_type, obj_id, organization_id, title, body, parent_id)`` for a model instance"""
+    if isinstance(instance, Project):
+        return ('project', instance.pk, instance.organization_id, instance.name, instance.description or '', None)
+    if isinstance(instance, ProjectService):
+        return (
+            'service', instance.pk, instance.project.organization_id, instance.name, instance.image or '',
+            instance.project_id
+        )
+    if isinstance(instance, Template):
+        return ('template', instance.pk, instance.organization_id, instance.name, instance.description or '', None)
+    return None
+
+
+def _live_ids(hits, database):
+    """IDs per doc type that still exist and are active"""
+    wanted = {}
+    for hit in hits:
+        wanted.setdefault(hit.doc_type, []).append(hit.obj_id)
+    live = {}
+    if 'project' in wanted:
+        live['project'] = set(
+            Project.objects.using(database)
+            .filter(pk__in=wanted['project'], is_active=True).values_list('pk', flat=True)
+        )
+    if 'service' in wanted:
+        live['service'] = set(
+            ProjectService.objects.using(database).filter(
+                pk__in=wanted['service'], project__is_active=True
+            ).values_list('pk', flat=True)
+        )
+    if 'template' in wanted:
+        live['template'] = set(
+            Template.objects.using(database)
+            .filter(pk__in=wanted['template'], is_active=True).values_list('pk', flat=True)
+        )
+    return live
+
+
+class SearchBackend:
+    """Interface every backend implements; ``database`` is the tenant database the documents live on"""
+
+    def index(self, documents, database=DEFAULT_DB_ALIAS):
+        """Add or replace documents (tuples from document_for)"""
+        raise NotImplementedError
+
+    def remove(self, doc_type, obj_ids, database=DEFAULT_DB_ALIAS):
+        raise NotImplementedError
+
+    def query(self, organization_id, text, limit, database=DEFAULT_DB_ALIAS):
+        """Ranked SearchHits for ``text`` among the organization's documents"""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Re-index every project, service and template, on every tenant database"""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """FTS5 index in the ``search_index`` virtual table, ranked by bm25"""
+
+    table = 'search_index'
+    # bm25 weights in column order: owner, title, body
+    weights = (0.0, 10.0, 2.0)
+
+    def index(self, documents, database=DEFAULT_DB_ALIAS):
+        documents = list(documents)
+        if not documents:
+            return
+        # One transaction: in autocommit mode every row would be its own commit
+        with transaction.atomic(using=database), connections[database].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(doc_rowid(doc[0], doc[1]),) for doc in documents]
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, owner, title, body, parent_id) VALUES (%s, %s, %s, %s, %s)',
+                [(doc_rowid(doc_type, obj_id), owner_token(organization_id), title, body, parent_id)
+                 for doc_type, obj_id, organization_id, title, body, parent_id in documents]
+            )
+
+    def remove(self, doc_type, obj_ids, database=DEFAULT_DB_ALIAS):
+        obj_ids = list(obj_ids)
+        if not obj_ids:
+            return
+        with transaction.atomic(using=database), connections[database].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(doc_rowid(doc_type, obj_id),) for obj_id in obj_ids]
+            )
+
+    def match_expression(self, organization_id, text):
+        terms = TOKEN.findall(text.lower())
+        if not terms:
+            return None
+        prefixes = ' AND '.join(f'"{term}"*' for term in terms)
+        return f'owner : {owner_token(organization_id)} AND {{title body}} : ({prefixes})'
+
+    def query(self, organization_id, text, limit, database=DEFAULT_DB_ALIAS):
+        expression = self.match_expression(organization_id, text)
+        if expression is None:
+            return []
+        with connections[database].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, title, body, parent_id FROM {self.table} '
+                f'WHERE {self.table} MATCH %s ORDER BY bm25({self.table}, %s, %s, %s) LIMIT %s',
+                [expression, *self.weights, limit]
+            )
+            return [
+                SearchHit(DOC_TYPE_NAMES[rowid % 4], rowid // 4, title, body, parent_id)
+                for rowid, title, body, parent_id in cursor.fetchall()
+            ]
+
+    def rebuild(self):
+        for database in tenant_databases():
+            with transaction.atomic(using=database), connections[database].cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table}')
+                populate_fts_index(cursor, self.table, Project, ProjectService, Template)
+                cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+
+class LikeBackend(SearchBackend):
+    """Index-free fallback: case-insensitive substring queries on the model tables"""
+
+    def index(self, documents, database=DEFAULT_DB_ALIAS):
+        pass
+
+    def remove(self, doc_type, obj_ids, database=DEFAULT_DB_ALIAS):
+        pass
+
+    def query(self, organization_id, text, limit, database=DEFAULT_DB_ALIAS):
+        terms = TOKEN.findall(text)
+        if not terms:
+            return []
+
+        def matching(fields):
+            condition = Q()
+            for term in terms:
+                term_q = Q()
+                for field in fields:
+                    term_q |= Q(**{f'{field}__icontains': term})
+                condition &= term_q
+            return condition
+
+        hits = []
+        projects = Project.objects.using(database).filter(
+            matching(['name', 'description']), organization_id=organization_id
+        )[:limit]
+        for project in projects:
+            hits.append(SearchHit('project', project.pk, project.name, project.description or ''))
+        services = ProjectService.objects.using(database).filter(
+            matching(['name', 'image']), project__organization_id=organization_id
+        ).only('pk', 'name', 'image', 'project_id')[:limit]
+        for service in services:
+            hits.append(SearchHit('service', service.pk, service.name, service.image or '', service.project_id))
+        templates = Template.objects.using(database).filter(
+            matching(['name', 'description']), organization_id=organization_id
+        ).defer('template_config')[:limit]
+        for template in templates:
+            hits.append(SearchHit('template', template.pk, template.name, template.description or ''))
+
+        # Names that start with the query rank first
+        lowered = text.lower()
+        hits.sort(key=lambda hit: (not hit.title.lower().startswith(lowered), hit.title.lower()))
+        return hits[:limit]
+
+    def rebuild(self):
+        pass
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.SEARCH_BACKEND)()
+    return _backend
+
+
+def search(organization, text, limit=10):
+    """Ranked, live hits for ``text`` among ``organization``'s projects, services and templates"""
+    # Over-fetch a little so hits dropped as stale don't shorten the list
+    hits = get_backend().query(organization.pk, text, limit * 2, database=organization.database)
+    live = _live_ids(hits, organization.database)
+    return [hit for hit in hits if hit.obj_id in live.get(hit.doc_type, ())][:limit]
@@ -0,0 +1,74 @@
+"""
+Keep the search index (core.search) in step with projects, services and templates
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Project, ProjectService, Template
+from accounts.signals import rows_bulk_created
+
+from .search import document_for, get_backend
+
+DOC_TYPES = {Project: 'project', ProjectService: 'service', Template: 'template'}
+
+# update_fields that can change a service's document
+SERVICE_INDEXED_FIELDS = {*ProjectService.search_fields, 'project'}
+
+
+def _documents(sender, instances, database):
+    if sender is ProjectService:
+        # Services created with only project_id set: look the owners up at once
+        missing = {obj.project_id for obj in instances if not ProjectService.project.is_cached(obj)}
+        owners = dict(
+            Project.unscoped.using(database).filter(pk__in=missing).values_list('pk', 'organization_id')
+        ) if missing else {}
+        return [
+            ('service', obj.pk, owners.get(obj.project_id) or obj.project.organization_id,
+             obj.name, obj.image or '', obj.project_id)
+            for obj in instances
+        ]
+    return [document_for(obj) for obj in instances]
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=ProjectService)
+@receiver(post_save, sender=Template)
+def index_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if sender is ProjectService:
+        # Autosaves of a service's config or canvas position: nothing to index
+        indexed = instance.indexed_values()
+        if not created and (
+            (update_fields is not None and not update_fields & SERVICE_INDEXED_FIELDS)
+            or getattr(instance, '_indexed', None) == indexed
+        ):
+            return
+        instance._indexed = indexed
+    # Each tenant database has its own index (core.search)
+    database = instance._state.db
+    document = _documents(sender, [instance], database)
+    transaction.on_commit(lambda: get_backend().index(document, database), using=database)
+
+
+@receiver(rows_bulk_created)
+def index_bulk_created(sender, instances, **kwargs):
+    if sender not in DOC_TYPES or not instances:
+        return
+    by_database = {}
+    for instance in instances:
+        by_database.setdefault(instance._state.db, []).append(instance)
+    for database, batch in by_database.items():
+        documents = _documents(sender, batch, database)
+        transaction.on_commit(
+            lambda documents=documents, database=database: get_backend().index(documents, database), using=database
+        )
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectService)
+@receiver(post_delete, sender=Template)
+def unindex_deleted(sender, instance, **kwargs):
+    doc_type, obj_id, database = DOC_TYPES[sender], instance.pk, instance._state.db
+    transaction.on_commit(lambda: get_backend().remove(doc_type, [obj_id], database), using=database)
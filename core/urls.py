@@ -6,6 +6,8 @@ app_name = 'core'
 urlpatterns = [
     path('', views.home_view, name='home'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('search/', views.search_view, name='search'),
+    path('usage/', views.usage_view, name='usage'),
     # Project management
     path('project/create/', views.create_project, name='create_project'),
     path('project/<int:project_id>/', views.project_view, name='project_view'),
@@ -13,5 +15,15 @@ urlpatterns = [
     path('project/service/create/', views.create_project_service, name='create_project_service'),
     path('project/<int:project_id>/services/', views.get_project_services, name='get_project_services'),
     path('project/<int:project_id>/service/<str:service_id>/delete/', views.delete_project_service, name='delete_project_service'),
+    # Service dependencies
+    path('project/<int:project_id>/dependency/create/', views.create_service_dependency, name='create_service_dependency'),
+    path('project/<int:project_id>/dependency/delete/', views.delete_service_dependency, name='delete_service_dependency'),
+    path('project/<int:project_id>/deploy/waves/', views.get_deployment_waves, name='get_deployment_waves'),
+    # Deploy plan
+    path('project/<int:project_id>/deploy/plan/', views.get_deploy_plan, name='get_deploy_plan'),
+    path('project/<int:project_id>/deploy/', views.deploy_project, name='deploy_project'),
+    # Deployment logs
+    path('project/<int:project_id>/service/<str:service_id>/logs/', views.get_service_logs, name='get_service_logs'),
+    path('project/<int:project_id>/service/<str:service_id>/logs/stream/', views.stream_service_logs, name='stream_service_logs'),
 ]
 
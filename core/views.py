@@ -1,9 +1,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.urls import reverse
-from accounts.models import Project, ProjectService, Template, RailwaySettings
+from accounts.models import Project, ProjectService, Template
+from accounts.replicas import replica_reads
+from accounts.usage import usage_for_user
 import random
 
 # Breaking Bad character names for random project naming
@@ -42,14 +44,18 @@ def home_view(request):
 
 
 @login_required
+@replica_reads
 def dashboard_view(request):
     """Dashboard view - shows user's Projects (actual deployments)"""
     # Get user's projects (actual deployments)
-    projects = Project.objects.filter(user=request.user, is_active=True)
+    projects = Project.objects.filter(
+        organization=request.organization, is_active=True
+    ).select_related('usage')
     
     context = {
         'user': request.user,
         'projects': projects,
+        'usage': usage_for_user(request.user),
     }
     
     # If HTMX request, return only the content partial
@@ -70,21 +76,19 @@ def create_project(request):
     
     # Create the Project (actual deployment entity)
     project = Project.objects.create(
+        organization=request.organization,
         user=request.user,
         name=project_name,
         description=f"Project created by {request.user.email}",
         status='draft'
     )
     
-    # Get railway settings for the editor
-    railway_settings, _ = RailwaySettings.objects.get_or_create(user=request.user)
-    
     context = {
         'project': project,
         'project_id': project.id,
         'project_name': project.name,
         'project_description': project.description or '',
-        'settings': railway_settings,
+        'settings': request.railway_settings,
         'is_project': True,  # Flag to indicate this is a Project, not Template
     }
     
@@ -102,17 +106,16 @@ def create_project(request):
 
 
 @login_required
+@replica_reads
 def project_view(request, project_id):
     """View/Edit a project"""
-    project = get_object_or_404(Project, id=project_id, user=request.user, is_active=True)
-    railway_settings, _ = RailwaySettings.objects.get_or_create(user=request.user)
-    
+    project = get_object_or_404(Project, id=project_id, organization=request.organization, is_active=True)
     context = {
         'project': project,
         'project_id': project.id,
         'project_name': project.name,
         'project_description': project.description or '',
-        'settings': railway_settings,
+        'settings': request.railway_settings,
         'is_project': True,
     }
     
@@ -127,42 +130,75 @@ def project_view(request, project_id):
 
 
 # =============================================================================
-# PROJECT SERVICE API ENDPOINTS
+# PROJECT SERVICE API ENDPOINTS (native async)
 # =============================================================================
 
+from django.conf import settings
 from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
 from django.views.decorators.http import require_http_methods
+from accounts import tasks
+from accounts.decorators import async_login_required
+from accounts.models import ProjectUsage, ServiceDependency
+from accounts.quotas import QuotaExceeded, enforce, plan_for
+from asgiref.sync import sync_to_async
+from .dependencies import DependencyCycleError, add_dependency, deployment_waves, project_edges
+from .logstore import get_log
+from .planner import build_plan, deploy_task
 import json
 
 
-@login_required
+def serialize_project_service(service, depends_on=()):
+    """Serialize a ProjectService for the editor canvas"""
+    return {
+        'id': service.id,
+        'service_id': service.service_id,
+        'name': service.name,
+        'image': service.image or '',
+        'cpu': service.cpu,
+        'memory': service.memory,
+        'variables': service.variables,
+        'networking': service.networking,
+        'status': service.status,
+        'position': {
+            'x': service.position_x,
+            'y': service.position_y
+        },
+        'depends_on': sorted(depends_on)
+    }
+
+
+@async_login_required
 @require_http_methods(["POST"])
-def create_project_service(request):
+async def create_project_service(request):
     """Create or update a service in a project"""
     try:
         data = json.loads(request.body)
         project_id = data.get('project_id')
         service_id = data.get('service_id')
         
-        # Get the project
-        project = get_object_or_404(Project, id=project_id, user=request.user)
-        
-        # Create or update service
-        service, created = ProjectService.objects.update_or_create(
-            project=project,
-            service_id=service_id,
-            defaults={
-                'name': data.get('name', 'New Service'),
-                'image': data.get('image', ''),
-                'cpu': data.get('cpu', 8),
-                'memory': data.get('memory', 8),
-                'variables': data.get('variables', {}),
-                'networking': data.get('networking', {}),
-                'position_x': data.get('position', {}).get('x', 0),
-                'position_y': data.get('position', {}).get('y', 0),
-            }
+        # Get the project (and its owner, whose plan limits the services)
+        project = await aget_object_or_404(
+            Project.objects.select_related('user'), id=project_id, organization=request.organization
         )
         
+        # Create or update service; over quota, the write is rolled back
+        with enforce(plan_for(project.user)):
+            service, created = await ProjectService.objects.aupdate_or_create(
+                project=project,
+                service_id=service_id,
+                defaults={
+                    'name': data.get('name', 'New Service'),
+                    'image': data.get('image', ''),
+                    'cpu': data.get('cpu', 8),
+                    'memory': data.get('memory', 8),
+                    'variables': data.get('variables', {}),
+                    'networking': data.get('networking', {}),
+                    'position_x': data.get('position', {}).get('x', 0),
+                    'position_y': data.get('position', {}).get('y', 0),
+                }
+            )
+        
         return JsonResponse({
             'success': True,
             'service_id': service.service_id,
@@ -171,6 +207,12 @@ def create_project_service(request):
             'message': 'Service created' if created else 'Service updated'
         })
         
+    except QuotaExceeded as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'quota': e.as_dict()
+        }, status=403)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -178,31 +220,18 @@ def create_project_service(request):
         }, status=400)
 
 
-@login_required
+@async_login_required
 @require_http_methods(["GET"])
-def get_project_services(request, project_id):
+@replica_reads
+async def get_project_services(request, project_id):
     """Get all services for a project"""
     try:
-        project = get_object_or_404(Project, id=project_id, user=request.user)
-        services = ProjectService.objects.filter(project=project)
-        
-        services_data = []
-        for service in services:
-            services_data.append({
-                'id': service.id,
-                'service_id': service.service_id,
-                'name': service.name,
-                'image': service.image or '',
-                'cpu': service.cpu,
-                'memory': service.memory,
-                'variables': service.variables,
-                'networking': service.networking,
-                'status': service.status,
-                'position': {
-                    'x': service.position_x,
-                    'y': service.position_y
-                }
-            })
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        edges = await sync_to_async(project_edges)(project)
+        services_data = [
+            serialize_project_service(service, edges.get(service.service_id, ()))
+            async for service in ProjectService.objects.filter(project=project)
+        ]
         
         return JsonResponse({
             'success': True,
@@ -216,15 +245,15 @@ def get_project_services(request, project_id):
         }, status=400)
 
 
-@login_required
+@async_login_required
 @require_http_methods(["POST"])
-def delete_project_service(request, project_id, service_id):
+async def delete_project_service(request, project_id, service_id):
     """Delete a service from a project"""
     try:
-        project = get_object_or_404(Project, id=project_id, user=request.user)
-        service = get_object_or_404(ProjectService, project=project, service_id=service_id)
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        service = await aget_object_or_404(ProjectService, project=project, service_id=service_id)
         
-        service.delete()
+        await service.adelete()
         
         return JsonResponse({
             'success': True,
@@ -237,3 +266,286 @@ def delete_project_service(request, project_id, service_id):
             'error': str(e)
         }, status=400)
 
+
+# =============================================================================
+# SERVICE DEPENDENCIES (canvas edges)
+# =============================================================================
+
+@async_login_required
+@require_http_methods(["POST"])
+async def create_service_dependency(request, project_id):
+    """Add a canvas edge: ``service_id`` depends on ``depends_on``"""
+    try:
+        data = json.loads(request.body)
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        
+        await sync_to_async(add_dependency)(project, data.get('service_id'), data.get('depends_on'))
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Dependency added'
+        })
+        
+    except DependencyCycleError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=409)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def delete_service_dependency(request, project_id):
+    """Remove the canvas edge between ``service_id`` and ``depends_on``"""
+    try:
+        data = json.loads(request.body)
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        
+        await ServiceDependency.objects.filter(
+            service__project=project,
+            service__service_id=data.get('service_id'),
+            depends_on__service_id=data.get('depends_on')
+        ).adelete()
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Dependency removed'
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@async_login_required
+@require_http_methods(["GET"])
+async def get_deployment_waves(request, project_id):
+    """Deploy order: waves of services that can deploy concurrently"""
+    try:
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        edges = await sync_to_async(project_edges)(project)
+        service_ids = [
+            service_id
+            async for service_id in ProjectService.objects.filter(project=project).values_list('service_id', flat=True)
+        ]
+        
+        return JsonResponse({
+            'success': True,
+            'waves': deployment_waves(service_ids, edges)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+# =============================================================================
+# DEPLOY PLAN
+# =============================================================================
+
+@async_login_required
+@require_http_methods(["GET"])
+async def get_deploy_plan(request, project_id):
+    """Preview which services a deploy would create, update or delete"""
+    try:
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        plan = await sync_to_async(build_plan)(project)
+        
+        return JsonResponse({
+            'success': True,
+            'plan': plan.to_dict()
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@async_login_required
+@require_http_methods(["POST"])
+async def deploy_project(request, project_id):
+    """Plan the deploy and execute only its pending changes in the background"""
+    try:
+        project = await aget_object_or_404(Project, id=project_id, organization=request.organization)
+        plan = await sync_to_async(build_plan)(project)
+        
+        task_id = None
+        if plan.pending:
+            task = await sync_to_async(tasks.enqueue)(
+                f'Deploy {project.name}', deploy_task, plan.to_dict(),
+                total=len(plan.pending), user=request.user,
+                organization=request.organization,
+                # Deploys are not idempotent: a failed one is re-planned, not retried
+                max_attempts=1
+            )
+            task_id = task.id
+        
+        return JsonResponse({
+            'success': True,
+            'task_id': task_id,
+            'plan': plan.to_dict(),
+            'message': f'{len(plan.pending)} service change(s) queued' if task_id else 'Nothing to deploy'
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+# =============================================================================
+# DEPLOYMENT LOGS
+# =============================================================================
+
+def _service_log(request, project_id, service_id):
+    service = get_object_or_404(
+        ProjectService,
+        project__id=project_id,
+        project__organization=request.organization,
+        service_id=service_id
+    )
+    if not service.railway_deployment_id:
+        raise Http404('Service has not been deployed')
+    return get_log(service.railway_deployment_id)
+
+
+@login_required
+@require_http_methods(["GET"])
+def get_service_logs(request, project_id, service_id):
+    """Lines ``start`` to ``start + limit`` of the current deployment (default: the last ``limit``)"""
+    log = _service_log(request, project_id, service_id)
+    try:
+        limit = min(int(request.GET.get('limit', 500)), 5000)
+        first, end = log.bounds()
+        start = int(request.GET['start']) if 'start' in request.GET else max(first, end - limit)
+        
+        return JsonResponse({
+            'success': True,
+            'first': first,
+            'end': end,
+            'lines': [{'n': number, 'line': line} for number, line in log.read(start, start + limit)]
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@async_login_required
+@require_http_methods(["GET"])
+async def stream_service_logs(request, project_id, service_id):
+    """``tail -f`` of the current deployment as Server-Sent Events"""
+    service = await aget_object_or_404(
+        ProjectService,
+        project__id=project_id,
+        project__organization=request.organization,
+        service_id=service_id
+    )
+    if not service.railway_deployment_id:
+        raise Http404('Service has not been deployed')
+    log = get_log(service.railway_deployment_id)
+    
+    # EventSource resumes after the last line it received when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id is not None and last_event_id.isdigit():
+        start = int(last_event_id) + 1
+    elif request.GET.get('from', '').isdigit():
+        start = int(request.GET['from'])
+    else:
+        first, end = await sync_to_async(log.bounds, thread_sensitive=False)()
+        start = max(first, end - 100)
+    
+    async def events():
+        yield 'retry: 2000\n\n'
+        # Ends after a quiet spell or DEPLOY_LOG_STREAM_MAX; the client reconnects
+        async for number, line in log.afollow(
+            start,
+            idle_timeout=settings.DEPLOY_LOG_STREAM_IDLE,
+            max_duration=settings.DEPLOY_LOG_STREAM_MAX
+        ):
+            # A bare CR ends an SSE line too, and would cut the line short
+            data = line.replace('\r', ' ')
+            yield f'id: {number}\ndata: {data}\n\n'
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# =============================================================================
+# SEARCH
+# =============================================================================
+
+from .search import search
+
+
+@login_required
+@require_http_methods(["GET"])
+def search_view(request):
+    """Typeahead over the user's projects, services and templates (HTMX partial)"""
+    query = request.GET.get('q', '').strip()
+    hits = search(request.organization, query) if query else []
+    
+    if hasattr(request, 'htmx') and request.htmx:
+        return HttpResponse(
+            render_to_string('core/partials/search_results.html', {'query': query, 'hits': hits}, request=request)
+        )
+    
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {
+                'type': hit.doc_type,
+                'id': hit.obj_id,
+                'title': hit.title,
+                'subtitle': hit.subtitle,
+                'project_id': hit.project_id,
+            }
+            for hit in hits
+        ]
+    })
+
+
+# =============================================================================
+# USAGE
+# =============================================================================
+
+@login_required
+@require_http_methods(["GET"])
+def usage_view(request):
+    """Resources allocated by the user overall and per project of the organization"""
+    usage = usage_for_user(request.user)
+    projects = Project.objects.filter(
+        organization=request.organization, is_active=True
+    ).select_related('usage').only('id', 'name', 'usage__services', 'usage__cpu', 'usage__memory')
+    
+    def counters(usage):
+        return {'services': usage.services, 'cpu': usage.cpu, 'memory': usage.memory}
+    
+    return JsonResponse({
+        'success': True,
+        'user': counters(usage),
+        'projects': [
+            {
+                'project_id': project.id,
+                'name': project.name,
+                **counters(getattr(project, 'usage', None) or ProjectUsage()),
+            }
+            for project in projects
+        ]
+    })
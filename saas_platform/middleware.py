@@ -1,20 +1,99 @@
 """
 Custom middleware for HTMX support
 """
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
 
+# Headers every HTMX-dependent response varies on, so full-page and partial
+# variants of the same URL are cached separately
+HTMX_VARY_HEADERS = ('HX-Request', 'HX-Target')
 
-class HtmxMiddleware(MiddlewareMixin):
+
+class HtmxDetails:
     """
-    Middleware to add HTMX-related context to requests
+    Lazily parsed HX-* request headers.
+
+    Each header is read from ``request.META`` on first access only, and the
+    headers that were read are recorded so the middleware can set ``Vary``.
     """
-    def process_request(self, request):
-        request.htmx = request.headers.get('HX-Request', False)
-        request.htmx_boosted = request.headers.get('HX-Boosted', False)
-        request.htmx_current_url = request.headers.get('HX-Current-URL', '')
-        request.htmx_history_restore_request = request.headers.get('HX-History-Restore-Request', False)
-        request.htmx_prompt = request.headers.get('HX-Prompt', '')
-        request.htmx_target = request.headers.get('HX-Target', '')
-        request.htmx_trigger = request.headers.get('HX-Trigger', '')
-        request.htmx_trigger_name = request.headers.get('HX-Trigger-Name', '')
 
+    def __init__(self, request):
+        self.request = request
+        self.accessed_headers = set()
+
+    def _get_header(self, name, default=''):
+        self.accessed_headers.add(name)
+        meta_key = 'HTTP_' + name.upper().replace('-', '_')
+        return self.request.META.get(meta_key, default)
+
+    def __bool__(self):
+        return self.is_htmx
+
+    @cached_property
+    def is_htmx(self):
+        return self._get_header('HX-Request') == 'true'
+
+    @cached_property
+    def boosted(self):
+        return self._get_header('HX-Boosted') == 'true'
+
+    @cached_property
+    def current_url(self):
+        return self._get_header('HX-Current-URL')
+
+    @cached_property
+    def history_restore_request(self):
+        return self._get_header('HX-History-Restore-Request') == 'true'
+
+    @cached_property
+    def prompt(self):
+        return self._get_header('HX-Prompt')
+
+    @cached_property
+    def target(self):
+        return self._get_header('HX-Target')
+
+    @cached_property
+    def trigger(self):
+        return self._get_header('HX-Trigger')
+
+    @cached_property
+    def trigger_name(self):
+        return self._get_header('HX-Trigger-Name')
+
+
+class HtmxMiddleware:
+    """
+    Middleware to add HTMX-related context to requests.
+
+    Works natively under both WSGI and ASGI. Responses whose view read any
+    HX-* header get ``Vary: HX-Request, HX-Target`` (plus any other HX-*
+    header that was read).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.htmx = HtmxDetails(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        request.htmx = HtmxDetails(request)
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        accessed = request.htmx.accessed_headers
+        if accessed:
+            extra = sorted(accessed.difference(HTMX_VARY_HEADERS))
+            patch_vary_headers(response, HTMX_VARY_HEADERS + tuple(extra))
+        return response
@@ -0,0 +1,73 @@
+"""
+Target-aware partial rendering for HTMX views
+"""
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+
+class LazyValue:
+    """
+    Context value computed on first use and memoized afterwards.
+
+    Django templates call callables when resolving a variable, so the
+    provider only runs if the rendered template actually references it.
+    """
+    _unset = object()
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.value = self._unset
+
+    def __call__(self):
+        if self.value is self._unset:
+            self.value = self.provider()
+        return self.value
+
+
+class Partial:
+    """A template fragment and the lazily-provided context keys it reads"""
+
+    def __init__(self, template_name, needs=()):
+        self.template_name = template_name
+        self.needs = tuple(needs)
+
+
+class PartialRenderer:
+    """
+    Pick a partial from the request's HX-Target and render it.
+
+    ``providers`` maps context keys to zero-argument callables. Only the keys
+    declared by the chosen partial are added to the context, each wrapped in a
+    LazyValue, so queries and form construction for other targets never run.
+    """
+
+    def __init__(self, targets, default):
+        self.targets = targets
+        self.default = default
+
+    def select(self, request):
+        htmx = getattr(request, 'htmx', None)
+        target = htmx.target if htmx else ''
+        return self.targets.get(target, self.default)
+
+    def build_context(self, partial, context, providers):
+        full_context = dict(context)
+        for key in partial.needs:
+            if key in full_context or key not in providers:
+                continue
+            provider = providers[key]
+            if not isinstance(provider, LazyValue):
+                provider = LazyValue(provider)
+            full_context[key] = provider
+        return full_context
+
+    def render_to_string(self, request, context, providers, partial=None):
+        partial = partial or self.select(request)
+        return render_to_string(
+            partial.template_name,
+            self.build_context(partial, context, providers),
+            request=request
+        )
+
+    def render(self, request, context, providers, partial=None):
+        return HttpResponse(self.render_to_string(request, context, providers, partial))
@@ -3,7 +3,7 @@ Django settings for saas_platform project.
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -56,6 +56,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'saas_platform.middleware.HtmxMiddleware',
+    'accounts.middleware.RailwaySettingsMiddleware',
+    'accounts.middleware.OrganizationMiddleware',
+    'accounts.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'saas_platform.urls'
@@ -76,6 +79,23 @@ TEMPLATES = [
     },
 ]
 
+# Production template profile: compiled templates are kept in memory by the
+# cached loader, listed explicitly rather than left to Django's default
+# (APP_DIRS cannot be combined with explicit loaders). In development
+# Django caches too, and runserver clears the cache when a template changes.
+if not DEBUG:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+# Compile every template under templates/ when a server process boots
+# (saas_platform.warmup), so no request pays for parsing one
+TEMPLATE_WARMUP = config('TEMPLATE_WARMUP', default=not DEBUG, cast=bool)
+
 WSGI_APPLICATION = 'saas_platform.wsgi.application'
 
 
@@ -89,6 +109,151 @@ DATABASES = {
     }
 }
 
+# Extra databases busy organizations can be moved to with
+# `python manage.py move_organization` (accounts.routers). Each alias in
+# TENANT_DATABASES gets its own SQLite file next to db.sqlite3; run
+# `python manage.py migrate --database <alias>` before moving anyone there.
+for alias in config('TENANT_DATABASES', default='', cast=Csv()):
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+    }
+
+# Read replicas of the default database for the read-only views
+# (accounts.replicas). Each alias in DATABASE_REPLICAS gets its own SQLite
+# file standing in for a streaming replica; `python manage.py sync_replicas`
+# copies db.sqlite3 into them. Test runs mirror them to the test database.
+DATABASE_REPLICAS = config('DATABASE_REPLICAS', default='', cast=Csv())
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Seconds a user's reads stay on the primary after they wrote something
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+DATABASE_ROUTERS = ['accounts.routers.ReplicaRouter', 'accounts.routers.TenantRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Set REDIS_URL (e.g. from a Railway Redis service) to share the cache across
+# workers (requires the redis package); otherwise each process uses its own
+# local-memory cache.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a user's RailwaySettings stay cached (invalidated on save anyway);
+# only with REDIS_URL, a per-process cache could not be invalidated
+RAILWAY_SETTINGS_CACHE_TIMEOUT = config('RAILWAY_SETTINGS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds a template's compiled serializedConfig stays cached (versioned by
+# its services' updated_at, so edits never serve a stale compile)
+RAILWAY_CONFIG_CACHE_TIMEOUT = config('RAILWAY_CONFIG_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Compress large template_config/variables blobs on write (accounts.fields);
+# off by default, so they are stored as plain JSON. Reads handle both forms,
+# so this can be switched either way at any time; it applies to rows as they
+# are next saved.
+JSON_FIELD_COMPRESSION = config('JSON_FIELD_COMPRESSION', default=False, cast=bool)
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/
+# SESSION_BACKEND is one of 'cached_db', 'cache', 'db' or 'signed_cookies'.
+# cached_db serves reads from CACHES and only writes through to the
+# database; it is the default only with REDIS_URL, since a per-process cache
+# would keep a session alive in other workers after a logout there.
+# signed_cookies needs no server-side storage at all.
+# Expired rows of the db-backed engines are removed by running
+# `python manage.py clearsessions` periodically (e.g. a Railway cron job).
+
+SESSION_BACKEND = config('SESSION_BACKEND', default='cached_db' if REDIS_URL else 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+SESSION_CACHE_ALIAS = 'default'
+SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=60 * 60 * 24 * 14, cast=int)
+
+
+# Background tasks
+# Jobs are queued in the database (accounts.tasks). Every web process runs
+# BACKGROUND_TASK_WORKERS worker threads, started by its first enqueue; set
+# it to 0 and run `python manage.py run_worker` on dedicated nodes instead.
+
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=2, cast=int)
+
+# Seconds a worker's claim on a job lasts without a heartbeat
+BACKGROUND_TASK_LEASE_SECONDS = config('BACKGROUND_TASK_LEASE_SECONDS', default=60, cast=int)
+
+# Seconds an idle worker waits before looking for new jobs again
+BACKGROUND_TASK_POLL_INTERVAL = config('BACKGROUND_TASK_POLL_INTERVAL', default=2, cast=float)
+
+# Attempts per job unless enqueue() says otherwise, and the retry backoff:
+# RETRY_DELAY seconds doubling per attempt, capped at RETRY_MAX_DELAY
+BACKGROUND_TASK_MAX_ATTEMPTS = config('BACKGROUND_TASK_MAX_ATTEMPTS', default=3, cast=int)
+BACKGROUND_TASK_RETRY_DELAY = config('BACKGROUND_TASK_RETRY_DELAY', default=10, cast=int)
+BACKGROUND_TASK_RETRY_MAX_DELAY = config('BACKGROUND_TASK_RETRY_MAX_DELAY', default=600, cast=int)
+
+# Jobs of one user that may run at the same time across all workers
+BACKGROUND_TASK_USER_CONCURRENCY = config('BACKGROUND_TASK_USER_CONCURRENCY', default=2, cast=int)
+
+
+# Deployments
+# Class that pushes planned service changes to Railway (core.planner)
+
+RAILWAY_DEPLOYER = config('RAILWAY_DEPLOYER', default='core.planner.RecordingDeployer')
+
+# Class that fetches deployed services' states from Railway (core.reconciler),
+# and the most calls `python manage.py reconcile_statuses` makes per minute
+RAILWAY_STATUS_CLIENT = config('RAILWAY_STATUS_CLIENT', default='core.reconciler.RecordingStatusClient')
+RAILWAY_STATUS_CALLS_PER_MINUTE = config('RAILWAY_STATUS_CALLS_PER_MINUTE', default=120, cast=int)
+
+# A service other services depend on must report running before they are
+# deployed: seconds to wait for that, and between status checks meanwhile
+DEPLOY_HEALTH_TIMEOUT = config('DEPLOY_HEALTH_TIMEOUT', default=600, cast=int)
+DEPLOY_HEALTH_POLL_INTERVAL = config('DEPLOY_HEALTH_POLL_INTERVAL', default=5, cast=float)
+
+# Build/deploy logs (core.logstore): compressed segment files per deployment,
+# capped per deployment and removed after the retention period. Background
+# task workers queue that retention every DEPLOY_LOG_COMPACT_INTERVAL seconds.
+# A log stream ends after DEPLOY_LOG_STREAM_IDLE quiet seconds or
+# DEPLOY_LOG_STREAM_MAX seconds in all; the browser then reconnects.
+
+DEPLOY_LOG_ROOT = config('DEPLOY_LOG_ROOT', default=str(BASE_DIR / 'logs' / 'deployments'))
+DEPLOY_LOG_MAX_BYTES = config('DEPLOY_LOG_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
+DEPLOY_LOG_RETENTION_DAYS = config('DEPLOY_LOG_RETENTION_DAYS', default=14, cast=int)
+DEPLOY_LOG_COMPACT_INTERVAL = config('DEPLOY_LOG_COMPACT_INTERVAL', default=3600, cast=int)
+DEPLOY_LOG_STREAM_IDLE = config('DEPLOY_LOG_STREAM_IDLE', default=30, cast=int)
+DEPLOY_LOG_STREAM_MAX = config('DEPLOY_LOG_STREAM_MAX', default=300, cast=int)
+
+
+# Seconds before a process reloads its image autocomplete catalog
+# (accounts.image_catalog) from the database; its own saves apply immediately
+
+IMAGE_CATALOG_MAX_AGE = config('IMAGE_CATALOG_MAX_AGE', default=600, cast=int)
+
+
+# Search (core.search)
+# SQLiteFTSBackend needs the FTS5 table from core's migrations (SQLite only);
+# LikeBackend works on any database without an index
+
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='core.search.SQLiteFTSBackend')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
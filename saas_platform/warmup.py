@@ -0,0 +1,48 @@
+"""
+Work a server process does once at boot so that its first requests don't.
+
+wsgi.py and asgi.py call ``warm_up()`` right after creating the
+application: before the workers fork when the server preloads the app (so
+they share the result), in each worker otherwise. Management commands and
+tests never call it.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def warm_templates():
+    """
+    Compile every template in the DIRS of the Django template engines into
+    their cached loaders; returns how many were compiled
+    """
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for directory in backend.engine.dirs:
+            root = Path(directory)
+            for path in sorted(root.rglob('*.html')):
+                name = path.relative_to(root).as_posix()
+                try:
+                    backend.engine.get_template(name)
+                    compiled += 1
+                except (TemplateDoesNotExist, TemplateSyntaxError):
+                    logger.exception('Could not compile template %s', name)
+    return compiled
+
+
+def warm_up():
+    start = time.perf_counter()
+    # Import the URLconf, and with it the views and allauth's providers
+    # (which pull in requests and jwt)
+    get_resolver().url_patterns
+    compiled = warm_templates() if settings.TEMPLATE_WARMUP else 0
+    logger.info('Warmed up in %.0fms, %d template(s) compiled', (time.perf_counter() - start) * 1000, compiled)